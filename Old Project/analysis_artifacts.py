@@ -0,0 +1,56 @@
+import hashlib
+import json
+from pathlib import Path
+
+import pandas as pd
+
+from incremental_prep import PrepManifest
+from master_store import file_sha256
+
+# --- ANALYSIS-READY ARTIFACTS ---
+# The tables data_preparation_pipeline.py writes to data/analysis_ready/ and the
+# dashboard reads back. Each successful run records a dataset version (a hash
+# of the artifacts' content) in the manifest, so readers can key caches on a
+# 16-character string instead of hashing the data themselves.
+ANALYSIS_READY_DIR = Path("data/analysis_ready")
+ARTIFACTS = {
+    'roas': "final_roas.csv",
+    'monthly_trends': "final_monthly_trends.csv",
+    'cac': "final_cac.csv",
+    'customer_composition': "final_customer_composition.csv",
+    'new_customer_acquisition': "final_new_customer_acquisition.csv",
+    'kpis': "final_kpis.json",
+}
+
+
+def artifact_paths(output_dir=ANALYSIS_READY_DIR):
+    return {name: Path(output_dir) / file_name for name, file_name in ARTIFACTS.items()}
+
+
+def artifacts_version(output_dir=ANALYSIS_READY_DIR):
+    """Short hash of the content of every artifact."""
+    digest = hashlib.sha256()
+    for name, path in artifact_paths(output_dir).items():
+        digest.update(f"{name}:{file_sha256(path)}\n".encode())
+    return digest.hexdigest()[:16]
+
+
+def dataset_version(output_dir=ANALYSIS_READY_DIR):
+    """Version of the artifacts of the last successful preparation run, or None if there is none."""
+    version = PrepManifest(output_dir).dataset_version
+    if version is None or not all(path.exists() for path in artifact_paths(output_dir).values()):
+        return None
+    return version
+
+
+def read_analysis_ready(output_dir=ANALYSIS_READY_DIR):
+    """Every artifact, as dataframes (and a dict for the KPIs), keyed like ARTIFACTS."""
+    paths = artifact_paths(output_dir)
+    return {
+        'roas': pd.read_csv(paths['roas']),
+        'monthly_trends': pd.read_csv(paths['monthly_trends'], parse_dates=['date']),
+        'cac': pd.read_csv(paths['cac']),
+        'customer_composition': pd.read_csv(paths['customer_composition'], index_col='date', parse_dates=['date']),
+        'new_customer_acquisition': pd.read_csv(paths['new_customer_acquisition']),
+        'kpis': json.loads(paths['kpis'].read_text()),
+    }
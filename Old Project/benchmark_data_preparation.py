@@ -0,0 +1,96 @@
+import argparse
+import os
+import time
+
+os.environ.setdefault("DISABLE_PANDERA_IMPORT_WARNING", "True")
+
+import numpy as np
+import pandas as pd
+
+from data_preparation_pipeline import build_channel_panel, safe_ratio
+
+# --- DATA PREPARATION BENCHMARK ---
+# Times the monthly-trends build of data_preparation_pipeline.py (one date x
+# channel grid) against the previous merge-based build, on synthetic
+# multi-year inputs with many channels. Imputation is left out of both, as it
+# is the same step either way.
+
+
+def make_inputs(n_years, n_channels, seed=0):
+    """Synthetic media spend, TOPSHEET and new-customer tables shaped like the cleaned CSVs."""
+    rng = np.random.default_rng(seed)
+    months = pd.date_range('2000-01-01', periods=n_years * 12, freq='MS')
+    channels = [f"Channel {i}" for i in range(n_channels)]
+    grid = pd.MultiIndex.from_product([channels, months], names=['channel', 'date']).to_frame(index=False)
+    n = len(grid)
+
+    media_spend_df = pd.concat([
+        pd.DataFrame({'channel_name': grid['channel'] + ' Media', 'value': rng.uniform(0, 50_000, n), 'date': grid['date']}),
+        pd.DataFrame({'channel_name': grid['channel'] + ' Agency', 'value': rng.uniform(0, 5_000, n), 'date': grid['date']}),
+    ], ignore_index=True)
+    topsheet_df = pd.DataFrame({
+        'date': grid['date'], 'source': 'Datahub (Shopify)',
+        'metric': 'NET SALES - ' + grid['channel'], 'value': rng.uniform(0, 150_000, n),
+    })
+    new_cust_df = pd.DataFrame({'channel_name': grid['channel'], 'value': rng.integers(0, 2_000, n).astype(float), 'date': grid['date']})
+    return media_spend_df, topsheet_df, new_cust_df
+
+
+def legacy_monthly_trends(media_spend_df, topsheet_df, new_cust_df):
+    """The previous build: per-table string normalization, copies and four merges on date and mapping_key."""
+    media_spend_df = media_spend_df.copy()
+    agency_fees_df = media_spend_df[media_spend_df['channel_name'].str.contains("Agency", na=False, case=False)].copy()
+    agency_fees_df['mapping_key'] = agency_fees_df['channel_name'].str.replace(" Agency", "", regex=True, case=False).str.lower().str.strip()
+    agency_fees_df['mapping_key'] = agency_fees_df['mapping_key'].replace({'affiliate': 'affiliates'})
+    media_spend_df['channel_name'] = media_spend_df['channel_name'].str.lower().replace({'affiliate': 'affiliates'})
+    direct_media_spend_df = media_spend_df[~media_spend_df['channel_name'].str.contains("agency", na=False, case=False)].copy()
+    direct_media_spend_df['mapping_key'] = direct_media_spend_df['channel_name'].str.replace(" media", "", regex=True, case=False).str.lower().str.strip()
+    monthly_spend = pd.merge(direct_media_spend_df, agency_fees_df[['date', 'mapping_key', 'value']], on=['date', 'mapping_key'], how='left', suffixes=('_media', '_agency'))
+    monthly_spend['value_agency'] = monthly_spend['value_agency'].fillna(0)
+    monthly_spend['total_spend'] = monthly_spend['value_media'] + monthly_spend['value_agency']
+
+    monthly_revenue = topsheet_df[topsheet_df['metric'].str.contains("NET SALES -", na=False)].copy()
+    monthly_revenue['mapping_key'] = monthly_revenue['metric'].str.replace("NET SALES - ", "", regex=False).str.strip().str.lower()
+    monthly_performance = pd.merge(monthly_spend[['date', 'mapping_key', 'total_spend']], monthly_revenue[['date', 'mapping_key', 'value']], on=['date', 'mapping_key'], how='left')
+    monthly_performance.rename(columns={'value': 'net_revenue'}, inplace=True)
+    monthly_performance['monthly_roas'] = monthly_performance.apply(lambda row: row['net_revenue'] / row['total_spend'] if row['total_spend'] > 0 else 0, axis=1)
+
+    new_cust_df = new_cust_df.copy()
+    new_cust_df['mapping_key'] = new_cust_df['channel_name'].str.lower().replace({'affiliate': 'affiliates'})
+    monthly_cac_df = pd.merge(monthly_spend[['date', 'mapping_key', 'total_spend']], new_cust_df[['date', 'mapping_key', 'value']], on=['date', 'mapping_key'], how='left')
+    monthly_cac_df.rename(columns={'value': 'new_customers'}, inplace=True)
+    monthly_cac_df['monthly_cac'] = monthly_cac_df.apply(lambda row: row['total_spend'] / row['new_customers'] if row['new_customers'] > 0 else 0, axis=1)
+    return pd.merge(monthly_performance, monthly_cac_df[['date', 'mapping_key', 'monthly_cac']], on=['date', 'mapping_key'], how='left')
+
+
+def grid_monthly_trends(media_spend_df, topsheet_df, new_cust_df):
+    panel = build_channel_panel(media_spend_df, topsheet_df, new_cust_df)
+    panel['monthly_roas'] = safe_ratio(panel['net_revenue'], panel['total_spend'])
+    panel['monthly_cac'] = safe_ratio(panel['total_spend'], panel['new_customers'])
+    return panel
+
+
+def time_call(fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - started, result
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark the monthly-trends build against the merge-based one.")
+    parser.add_argument("--years", type=int, default=10)
+    parser.add_argument("--channels", type=int, default=500)
+    args = parser.parse_args()
+
+    inputs = make_inputs(args.years, args.channels)
+    legacy_seconds, legacy = time_call(legacy_monthly_trends, *inputs)
+    grid_seconds, grid = time_call(grid_monthly_trends, *inputs)
+
+    # Same rows and KPIs, whatever the row order.
+    key = ['mapping_key', 'date']
+    legacy = legacy.assign(mapping_key=legacy['mapping_key'].astype(str)).sort_values(key).reset_index(drop=True)
+    grid = grid.assign(mapping_key=grid['mapping_key'].astype(str)).sort_values(key).reset_index(drop=True)
+    matches = all(np.allclose(legacy[c], grid[c], equal_nan=True) for c in ('total_spend', 'net_revenue', 'monthly_roas', 'monthly_cac'))
+    print(f"{len(grid):,} channel-months ({args.years} years x {args.channels} channels): "
+          f"merges {legacy_seconds:.2f}s | grid {grid_seconds:.2f}s ({legacy_seconds / grid_seconds:.1f}x) | "
+          f"results match: {matches}")
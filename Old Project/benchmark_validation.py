@@ -0,0 +1,65 @@
+import argparse
+import os
+import time
+
+os.environ.setdefault("DISABLE_PANDERA_IMPORT_WARNING", "True")
+
+import numpy as np
+import pandas as pd
+from pandera.errors import SchemaError, SchemaErrors
+
+from ingestion_piplline_with_pandera import order_schema
+from schema_validation import compile_schema
+
+# --- VALIDATION BENCHMARK ---
+# Times pandera's lazy validation against the compiled validator on a synthetic
+# order-line frame, once with clean data and once with a small share of bad rows.
+
+
+def make_orders(n_rows, bad_fraction=0.0, seed=0):
+    """Synthetic order lines shaped like a raw CSV read (dates and numbers as read)."""
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        'order_id': pd.Series(rng.integers(1, n_rows, n_rows)).astype(str),
+        'customer_id': pd.Series(rng.integers(1, n_rows // 5 + 2, n_rows)).map('cust_{}'.format),
+        'order_datetime': pd.Timestamp('2023-01-01') + pd.to_timedelta(rng.integers(0, 3 * 365 * 86400, n_rows), unit='s'),
+        'sku': pd.Series(rng.integers(1, 500, n_rows)).map('SKU{:03d}'.format),
+        'qty': rng.integers(1, 6, n_rows),
+        'unit_price': rng.uniform(5, 200, n_rows).round(2),
+        'discount': rng.choice([0.0, 0.1, 0.2], n_rows),
+    })
+    n_bad = int(n_rows * bad_fraction)
+    if n_bad:
+        bad = rng.choice(n_rows, n_bad, replace=False)
+        df.loc[bad[::2], 'qty'] = 0
+        df.loc[bad[1::2], 'unit_price'] = -1.0
+    return df
+
+
+def time_call(fn):
+    started = time.perf_counter()
+    fn()
+    return time.perf_counter() - started
+
+
+def run_pandera(df):
+    try:
+        order_schema.validate(df, lazy=True)
+    except (SchemaError, SchemaErrors):
+        pass
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark pandera vs. the compiled validator.")
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--bad-fraction", type=float, default=0.001)
+    args = parser.parse_args()
+
+    compiled = compile_schema(order_schema)
+    for label, bad_fraction in (("clean", 0.0), (f"{args.bad_fraction:.2%} bad rows", args.bad_fraction)):
+        df = make_orders(args.rows, bad_fraction)
+        pandera_seconds = time_call(lambda: run_pandera(df))
+        compiled_seconds = time_call(lambda: compiled.validate(df))
+        result = compiled.validate(df)
+        print(f"{args.rows:,} rows, {label}: pandera {pandera_seconds:.2f}s | compiled {compiled_seconds:.2f}s "
+              f"({pandera_seconds / compiled_seconds:.1f}x) | {result.n_invalid:,} invalid rows")
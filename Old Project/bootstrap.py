@@ -0,0 +1,102 @@
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import numpy as np
+
+# --- BOOTSTRAP ENGINE ---
+# Vectorized bootstrap resampling for Bootstrap_ltv.py. Instead of one pandas
+# sample per iteration, resamples are drawn as whole matrices:
+#
+#   indices  an (iterations x n) matrix of row indices; the statistic runs once
+#            along axis 1, so any reducing NumPy function works (np.mean,
+#            np.median, partial(np.quantile, q=0.9), ...)
+#   counts   an (iterations x k) matrix of multinomial counts: how often each of
+#            the k distinct values is drawn. Means are one matrix product and
+#            the resampled values are never materialized, so when many
+#            customers share a value (LTVs rounded to whole dollars, say) a
+#            batch takes n / k times less memory than an index matrix
+#
+# Matrices are drawn in batches of at most MAX_BATCH_CELLS cells, which bounds
+# memory for large customer bases. The two worker settings draw differently:
+#
+#   max_workers=1   every draw comes from `random_state` in order, so
+#                   np.random.seed(42) followed by the indices method reproduces
+#                   the former Series.sample(replace=True) loop draw for draw
+#   max_workers>1   iterations are split into tasks of TASK_ITERATIONS, each with
+#   (or None)       a seed drawn from `random_state` up front, so a fixed seed
+#                   gives the same result for 2, 4 or any other number of workers
+#
+# A fixed seed therefore gives one interval with max_workers=1 and a different
+# (equally valid) one with more workers. Runs of at most TASK_ITERATIONS
+# iterations always use the single-worker draws.
+BOOTSTRAP_METHODS = ('indices', 'counts')
+MAX_BATCH_CELLS = 2 ** 23
+TASK_ITERATIONS = 100
+
+
+def _as_random_state(random_state):
+    """None -> NumPy's global RandomState (as pandas does), int -> a new RandomState."""
+    if random_state is None:
+        return np.random.mtrand._rand
+    if isinstance(random_state, np.random.RandomState):
+        return random_state
+    return np.random.RandomState(random_state)
+
+
+def _bootstrap_batches(values, n_iterations, random_state, statistic=np.mean, method='indices'):
+    """The statistic of `n_iterations` resamples of `values`, drawn in memory-bounded batches."""
+    n = len(values)
+    if method == 'counts':
+        distinct, frequencies = np.unique(values, return_counts=True)
+    batch_rows = max(1, MAX_BATCH_CELLS // (n if method == 'indices' else len(distinct)))
+    results = []
+    for start in range(0, n_iterations, batch_rows):
+        rows = min(batch_rows, n_iterations - start)
+        if method == 'indices':
+            results.append(statistic(values[random_state.randint(0, n, size=(rows, n))], axis=1))
+        else:
+            counts = random_state.multinomial(n, frequencies / n, size=rows)
+            results.append(counts @ distinct / n)
+    return np.concatenate(results)
+
+
+def _bootstrap_task(seed, n_iterations, values, statistic, method):
+    return _bootstrap_batches(values, n_iterations, np.random.RandomState(seed), statistic, method)
+
+
+def bootstrap_distribution(values, statistic=np.mean, n_iterations=1000, random_state=None, method='indices',
+                           max_workers=1):
+    """
+    The bootstrap distribution of `statistic` over `values`: one value per
+    resample of len(values) draws with replacement. `statistic` must accept
+    an `axis` argument (and be picklable when max_workers != 1); the counts
+    method only computes means. `max_workers` processes share the iterations
+    (None = all cores). For a fixed seed, max_workers=1 and max_workers > 1
+    give different (equally valid) distributions; see the module header.
+    """
+    if method not in BOOTSTRAP_METHODS:
+        raise ValueError(f"Unknown bootstrap method {method!r}; expected one of {BOOTSTRAP_METHODS}")
+    if method == 'counts' and statistic is not np.mean:
+        raise ValueError("The counts method only computes means; use method='indices' for other statistics.")
+    values = np.asarray(values, dtype=float)
+    if len(values) == 0:
+        raise ValueError("Cannot bootstrap an empty sample.")
+    if n_iterations < 1:
+        raise ValueError(f"n_iterations must be at least 1, got {n_iterations}.")
+    random_state = _as_random_state(random_state)
+
+    if max_workers == 1 or n_iterations <= TASK_ITERATIONS:
+        return _bootstrap_batches(values, n_iterations, random_state, statistic, method)
+    task_sizes = [min(TASK_ITERATIONS, n_iterations - start) for start in range(0, n_iterations, TASK_ITERATIONS)]
+    seeds = random_state.randint(0, 2 ** 32, size=len(task_sizes), dtype=np.uint64)
+    task = partial(_bootstrap_task, values=values, statistic=statistic, method=method)
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        # map() yields in submission order, so the result does not depend on scheduling.
+        return np.concatenate(list(pool.map(task, seeds, task_sizes)))
+
+
+def confidence_interval(distribution, confidence_level=0.95):
+    """Percentile interval of a bootstrap distribution (linear interpolation, like Series.quantile)."""
+    tail = (1 - confidence_level) / 2
+    lower, upper = np.quantile(distribution, [tail, 1 - tail])
+    return float(lower), float(upper)
@@ -0,0 +1,113 @@
+import numpy as np
+import pandas as pd
+
+# --- CHANNEL METRICS ---
+# Channel-key normalization and the channel summary tables, shared by
+# data_preparation_pipeline.py (which writes them to data/analysis_ready) and
+# dashboard.py (which builds them from uploaded CSVs). Functions that take
+# media spend expect its `mapping_key` column to come from
+# normalize_channel_keys(), and dates to be parsed. Both patch months with zero
+# spend from spend_overrides.csv the same way (patch_spend_gaps()).
+
+# Channel names that normalize to a different spelling than the marketing breakdown uses.
+CHANNEL_ALIASES = {'affiliate': 'affiliates'}
+NET_SALES_PREFIX = "NET SALES - "
+# Overall CAC, customer mix and acquisition totals only count months before this date.
+ANALYSIS_END_DATE = pd.Timestamp('2025-05-01')
+
+
+def normalize_channel_keys(names):
+    """
+    Maps channel names ("Paid Search Media", "Affiliate Agency", "NET SALES -"
+    suffixes, ...) to a categorical mapping_key such as 'paid search' or
+    'affiliates'. The string work runs once per distinct name, not per row.
+    """
+    codes, uniques = pd.factorize(pd.Series(names, dtype=object))
+    keys = pd.Index(uniques).str.lower().str.replace(r" (?:media|agency)", "", regex=True).str.strip()
+    key_codes, categories = pd.factorize(keys.map(lambda key: CHANNEL_ALIASES.get(key, key)))
+    return pd.Categorical.from_codes(np.where(codes >= 0, key_codes[codes], -1), categories=categories)
+
+
+def is_agency_fee(media_spend_df):
+    """True for media spend rows that are agency fees rather than direct media spend."""
+    return media_spend_df['channel_name'].str.contains("agency", na=False, case=False)
+
+
+def safe_ratio(numerator, denominator):
+    """numerator / denominator where the denominator is positive, else 0."""
+    numerator = np.asarray(numerator, dtype=float)
+    denominator = np.asarray(denominator, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(denominator > 0, numerator / denominator, 0.0)
+
+
+def read_spend_overrides(path):
+    """The spend_override column of a month,channel,spend_override CSV as a Series indexed by (month, mapping_key); later duplicates win."""
+    overrides_df = pd.read_csv(path)
+    index = pd.MultiIndex.from_arrays(
+        [pd.to_datetime(overrides_df['month']), normalize_channel_keys(overrides_df['channel']).astype(str)],
+        names=['month', 'mapping_key'],
+    )
+    overrides = pd.Series(overrides_df['spend_override'].to_numpy(dtype=float), index=index)
+    return overrides[~overrides.index.duplicated(keep='last')]
+
+
+def patch_spend_gaps(dates, mapping_keys, total_spend, overrides):
+    """`total_spend` with zeros replaced by the override of their month and channel (0 if there is none)."""
+    months = pd.DatetimeIndex(dates).to_period('M').to_timestamp()
+    keys = np.asarray(mapping_keys).astype(str)
+    override = overrides.reindex(pd.MultiIndex.from_arrays([months, keys])).to_numpy()
+    total_spend = np.asarray(total_spend, dtype=float)
+    return np.where(total_spend == 0, np.nan_to_num(override), total_spend)
+
+
+def corrected_roas(marketing_df, media_spend_df):
+    """ROAS per marketing channel with agency fees added to its ad spend, best channel first."""
+    agency_fees = media_spend_df[is_agency_fee(media_spend_df)].groupby('mapping_key', observed=True)['value'].sum().reset_index()
+    agency_fees['mapping_key'] = agency_fees['mapping_key'].astype(str)
+    agency_fees.rename(columns={'value': 'agency_fees'}, inplace=True)
+
+    channel_summary = marketing_df.groupby('marketing_channel').agg(total_ad_spend=('ad_spend', 'sum'), total_revenue=('gross_discount_(shopify)', 'sum')).reset_index()
+    channel_summary = pd.merge(channel_summary, agency_fees, left_on='marketing_channel', right_on='mapping_key', how='left')
+    channel_summary['agency_fees'] = channel_summary['agency_fees'].fillna(0)
+    channel_summary['true_total_ad_spend'] = channel_summary['total_ad_spend'] + channel_summary['agency_fees']
+    channel_summary['corrected_roas'] = safe_ratio(channel_summary['total_revenue'], channel_summary['true_total_ad_spend'])
+    return channel_summary.sort_values('corrected_roas', ascending=False).reset_index(drop=True)
+
+
+def overall_cac(media_spend_df, new_cust_df):
+    """CAC per channel before ANALYSIS_END_DATE: media spend plus agency fees over new customers."""
+    capped_spend = media_spend_df[media_spend_df['date'] < ANALYSIS_END_DATE]
+    new_cust_capped = new_cust_df[new_cust_df['date'] < ANALYSIS_END_DATE]
+    total_spend = capped_spend.groupby('mapping_key', observed=True)['value'].sum()
+    total_new_customers = new_cust_capped.groupby(normalize_channel_keys(new_cust_capped['channel_name']), observed=True)['value'].sum()
+    cac_df = pd.DataFrame({'total_spend': total_spend, 'total_new_customers': total_new_customers})
+    cac_df.index = cac_df.index.astype(str)
+    cac_df['cac'] = safe_ratio(cac_df['total_spend'], cac_df['total_new_customers'])
+    return cac_df[cac_df['cac'] > 0].rename_axis('channel').reset_index()
+
+
+def customer_composition(new_cust_df, ext_cust_df):
+    """Monthly new and existing customers before ANALYSIS_END_DATE, one column per customer type."""
+    all_cust_df = pd.concat([new_cust_df.assign(customer_type='New'), ext_cust_df.assign(customer_type='Existing')])
+    all_cust_capped = all_cust_df[all_cust_df['date'] < ANALYSIS_END_DATE]
+    return all_cust_capped.groupby(['date', 'customer_type'])['value'].sum().unstack().fillna(0)
+
+
+def new_customer_acquisition(new_cust_df):
+    """New customers per channel before ANALYSIS_END_DATE, most first."""
+    new_cust_capped = new_cust_df[new_cust_df['date'] < ANALYSIS_END_DATE]
+    return new_cust_capped.groupby('channel_name')['value'].sum().sort_values(ascending=False).reset_index()
+
+
+def headline_kpis(roas_df, cac_df):
+    """Total revenue, blended ROAS and CAC, and total new customers."""
+    total_revenue = roas_df['total_revenue'].sum()
+    total_ad_spend = roas_df.loc[roas_df['true_total_ad_spend'] > 0, 'true_total_ad_spend'].sum()
+    total_new = cac_df['total_new_customers'].sum()
+    return {
+        'total_revenue': float(total_revenue),
+        'blended_roas': float(total_revenue / total_ad_spend) if total_ad_spend > 0 else 0.0,
+        'blended_cac': float(cac_df['total_spend'].sum() / total_new) if total_new > 0 else 0.0,
+        'total_new_customers': float(total_new),
+    }
@@ -45,8 +45,10 @@ def create_persona_lookup_file():
     except FileNotFoundError:
         print("Error: 'cleaned_Cust By Channel-New.csv' not found.")
         print("Please ensure the file is in the same directory to generate realistic persona mappings.")
+        raise
     except Exception as e:
         print(f"An error occurred: {e}")
+        raise
 
 if __name__ == '__main__':
     create_persona_lookup_file()
@@ -2,9 +2,14 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 import numpy as np
-import io
-import re
 import base64
+from pathlib import Path
+from streamlit.runtime.uploaded_file_manager import UploadedFile
+
+from analysis_artifacts import dataset_version, read_analysis_ready
+from channel_metrics import (NET_SALES_PREFIX, corrected_roas, customer_composition, headline_kpis, is_agency_fee,
+                             new_customer_acquisition, normalize_channel_keys, overall_cac, patch_spend_gaps,
+                             read_spend_overrides, safe_ratio)
 
 # --- App Configuration ---
 st.set_page_config(
@@ -170,6 +175,21 @@ st.markdown("<div class='section-divider'></div>", unsafe_allow_html=True)
 
 # --- Sidebar for File Uploads and Navigation ---
 with st.sidebar:
+    # Tables precomputed by data_preparation_pipeline.py, if it has been run.
+    prepared_version = dataset_version()
+    st.header("Data Source")
+    data_source = st.radio(
+        "Load the analysis from:",
+        ["Prepared datasets", "Uploaded CSVs"],
+        index=0 if prepared_version else 1,
+        help="Prepared datasets are read from data/analysis_ready (run data_preparation_pipeline.py to refresh them).",
+    )
+    use_prepared_data = data_source == "Prepared datasets" and prepared_version is not None
+    if data_source == "Prepared datasets" and prepared_version is None:
+        st.warning("No prepared datasets found in `data/analysis_ready`. Run `data_preparation_pipeline.py` or upload the CSVs.")
+    elif use_prepared_data:
+        st.caption(f"Dataset version `{prepared_version}`")
+
     st.header("Data Upload")
 
     # Toggle button for showing/hiding file uploaders
@@ -205,6 +225,11 @@ with st.sidebar:
     ext_cust_file = get_file("5. Customers by Channel (Existing) CSV", "ext_cust_file")
     persona_file = get_file("6. Customer Personas CSV (Optional)", "persona_file")
     email_file = get_file("7. Email Flow Performance CSV (Optional)", "email_file")
+    # The five uploads the main analysis is built from.
+    uploads = {
+        'marketing_file': marketing_file, 'media_spend_file': media_spend_file, 'topsheet_file': topsheet_file,
+        'new_cust_file': new_cust_file, 'ext_cust_file': ext_cust_file,
+    }
 
     # Only show the widgets if toggled on
     if st.session_state["show_upload_section"]:
@@ -224,108 +249,148 @@ with st.sidebar:
     )
 
 # --- Data Processing Logic ---
-@st.cache_data
-def load_and_process_data(marketing_file, media_spend_file, topsheet_file, new_cust_file, ext_cust_file):
+# Each table the pages show has its own cached builder, keyed only by the
+# uploads it reads, so a page builds just what it displays and replacing one
+# upload only rebuilds the tables that depend on it. Uploads are keyed by their
+# Streamlit file id instead of hashing their content on every rerun.
+CACHE_BY_UPLOAD = {UploadedFile: lambda file: file.file_id}
+CHANNELS_TO_PLOT = ['paid search', 'paid social', 'affiliates']
+# Agency spend to use for months whose recorded spend is 0 (spend gaps).
+SPEND_OVERRIDES_PATH = Path("spend_overrides.csv")
+
+def read_upload(file):
+    file.seek(0)
+    return pd.read_csv(file)
+
+# Normalized base tables: dates parsed and channel names mapped to mapping_key once.
+@st.cache_data(hash_funcs=CACHE_BY_UPLOAD)
+def load_media_spend(media_spend_file):
+    media_spend_df = read_upload(media_spend_file)
+    media_spend_df['date'] = pd.to_datetime(media_spend_df['date'])
+    media_spend_df['mapping_key'] = normalize_channel_keys(media_spend_df['channel_name'])
+    return media_spend_df
+
+@st.cache_data(hash_funcs=CACHE_BY_UPLOAD)
+def load_customers(cust_file):
+    cust_df = read_upload(cust_file)
+    cust_df['date'] = pd.to_datetime(cust_df['date'])
+    cust_df['mapping_key'] = normalize_channel_keys(cust_df['channel_name'])
+    return cust_df
+
+@st.cache_data(hash_funcs=CACHE_BY_UPLOAD)
+def load_topsheet(topsheet_file):
+    topsheet_df = read_upload(topsheet_file)
+    topsheet_df['date'] = pd.to_datetime(topsheet_df['date'])
+    return topsheet_df
+
+@st.cache_data(hash_funcs=CACHE_BY_UPLOAD)
+def build_roas(marketing_file, media_spend_file):
+    return corrected_roas(read_upload(marketing_file), load_media_spend(media_spend_file))
+
+def spend_overrides_version():
+    """(mtime, size) of the overrides file, or None if it is missing. Keys the overrides cache."""
     try:
-        marketing_df = pd.read_csv(marketing_file)
-        media_spend_df = pd.read_csv(media_spend_file)
-        topsheet_df = pd.read_csv(topsheet_file)
-        new_cust_df = pd.read_csv(new_cust_file)
-        ext_cust_df = pd.read_csv(ext_cust_file)
-
-        agency_fees_df = media_spend_df[media_spend_df['channel_name'].str.contains("Agency", na=False, case=False)].copy()
-        agency_fees_df['mapping_key'] = agency_fees_df['channel_name'].str.replace(" Agency", "", regex=True, flags=re.IGNORECASE).str.lower().str.strip()
-        agency_fees_df['mapping_key'] = agency_fees_df['mapping_key'].replace({'affiliate': 'affiliates'})
-        total_agency_fees_agg = agency_fees_df.groupby('mapping_key')['value'].sum().reset_index()
-        total_agency_fees_agg.rename(columns={'value': 'agency_fees'}, inplace=True)
-        channel_summary = marketing_df.groupby('marketing_channel').agg(total_ad_spend=('ad_spend', 'sum'), total_revenue=('gross_discount_(shopify)', 'sum')).reset_index()
-        channel_summary = pd.merge(channel_summary, total_agency_fees_agg, left_on='marketing_channel', right_on='mapping_key', how='left')
-        channel_summary['agency_fees'] = channel_summary['agency_fees'].fillna(0)
-        channel_summary['true_total_ad_spend'] = channel_summary['total_ad_spend'] + channel_summary['agency_fees']
-        channel_summary['corrected_roas'] = channel_summary.apply(lambda row: row['total_revenue'] / row['true_total_ad_spend'] if row['true_total_ad_spend'] > 0 else 0, axis=1)
-        roas_df = channel_summary.sort_values('corrected_roas', ascending=False).reset_index(drop=True)
-
-        media_spend_df['date'] = pd.to_datetime(media_spend_df['date'])
-        topsheet_df['date'] = pd.to_datetime(topsheet_df['date'])
-        new_cust_df['date'] = pd.to_datetime(new_cust_df['date'])
-        ext_cust_df['date'] = pd.to_datetime(ext_cust_df['date'])
-        media_spend_df['channel_name'] = media_spend_df['channel_name'].str.lower().replace({'affiliate': 'affiliates'})
-        agency_fees_df = media_spend_df[media_spend_df['channel_name'].str.contains("agency", na=False, case=False)].copy()
-        agency_fees_df['mapping_key'] = agency_fees_df['channel_name'].str.replace(" agency", "", regex=True, flags=re.IGNORECASE).str.lower().str.strip()
-        direct_media_spend_df = media_spend_df[~media_spend_df['channel_name'].str.contains("agency", na=False, case=False)].copy()
-        direct_media_spend_df['mapping_key'] = direct_media_spend_df['channel_name'].str.replace(" media", "", regex=True, flags=re.IGNORECASE).str.lower().str.strip()
-        monthly_spend = pd.merge(direct_media_spend_df, agency_fees_df[['date', 'mapping_key', 'value']], on=['date', 'mapping_key'], how='left', suffixes=('_media', '_agency'))
-        monthly_spend['value_agency'] = monthly_spend['value_agency'].fillna(0)
-        monthly_spend['total_spend'] = monthly_spend['value_media'] + monthly_spend['value_agency']
-
-        try:
-            overrides_df = pd.read_csv("spend_overrides.csv")
-            overrides_df['month'] = pd.to_datetime(overrides_df['month'])
-            overrides_df['channel'] = overrides_df['channel'].str.replace(" agency", "", regex=True, flags=re.IGNORECASE).str.lower().str.strip()
-            monthly_spend['month'] = monthly_spend['date'].dt.to_period('M').dt.to_timestamp()
-            monthly_spend = pd.merge(monthly_spend, overrides_df, left_on=['month', 'mapping_key'], right_on=['month', 'channel'], how='left')
-            monthly_spend['total_spend'] = np.where(monthly_spend['total_spend'] == 0, monthly_spend['spend_override'], monthly_spend['total_spend'])
-            monthly_spend.drop(columns=['month', 'channel', 'spend_override'], inplace=True)
-            monthly_spend['total_spend'].fillna(0, inplace=True)
-        except FileNotFoundError:
-            st.sidebar.warning("`spend_overrides.csv` not found. Spend gap not patched.")
-
-        monthly_revenue = topsheet_df[topsheet_df['metric'].str.contains("NET SALES -", na=False)].copy()
-        monthly_revenue['mapping_key'] = monthly_revenue['metric'].str.replace("NET SALES - ", "", regex=False).str.strip().str.lower()
-        monthly_performance = pd.merge(monthly_spend[['date', 'mapping_key', 'total_spend']], monthly_revenue[['date', 'mapping_key', 'value']], on=['date', 'mapping_key'], how='left')
-        monthly_performance.rename(columns={'value': 'net_revenue'}, inplace=True)
-        monthly_performance['net_revenue'] = monthly_performance['net_revenue'].fillna(0)
-        monthly_performance['monthly_roas'] = monthly_performance.apply(lambda row: row['net_revenue'] / row['total_spend'] if row['total_spend'] > 0 else 0, axis=1)
-        new_cust_df['mapping_key'] = new_cust_df['channel_name'].str.lower().replace({'affiliate': 'affiliates'})
-        monthly_cac_df = pd.merge(monthly_spend[['date', 'mapping_key', 'total_spend']], new_cust_df[['date', 'mapping_key', 'value']], on=['date', 'mapping_key'], how='left')
-        monthly_cac_df.rename(columns={'value': 'new_customers'}, inplace=True)
-        monthly_cac_df['new_customers'] = monthly_cac_df['new_customers'].fillna(0)
-        monthly_cac_df['monthly_cac'] = monthly_cac_df.apply(lambda row: row['total_spend'] / row['new_customers'] if row['new_customers'] > 0 else 0, axis=1)
-        monthly_trends_df = pd.merge(monthly_performance, monthly_cac_df[['date', 'mapping_key', 'monthly_cac']], on=['date', 'mapping_key'], how='left')
-        channels_to_plot = ['paid search', 'paid social', 'affiliates']
-        monthly_trends_df = monthly_trends_df[monthly_trends_df['mapping_key'].isin(channels_to_plot)]
-
-        analysis_end_date = pd.to_datetime('2025-05-01')
-        media_spend_capped = media_spend_df[media_spend_df['date'] < analysis_end_date].copy()
-        new_cust_capped = new_cust_df[new_cust_df['date'] < analysis_end_date].copy()
-        agency_fees_capped = media_spend_capped[media_spend_capped['channel_name'].str.contains("Agency", na=False, case=False)].copy()
-        agency_fees_capped['mapping_key'] = agency_fees_capped['channel_name'].str.replace(" Agency", "", regex=True, flags=re.IGNORECASE).str.lower().str.strip()
-        total_agency_fees = agency_fees_capped.groupby('mapping_key')['value'].sum()
-        direct_media_spend_capped = media_spend_capped[~media_spend_capped['channel_name'].str.contains("Agency", na=False, case=False)].copy()
-        direct_media_spend_capped['mapping_key'] = direct_media_spend_capped['channel_name'].str.replace(" Media", "", regex=True, flags=re.IGNORECASE).str.lower().str.strip()
-        total_media_spend = direct_media_spend_capped.groupby('mapping_key')['value'].sum()
-        total_spend_agg = total_media_spend.add(total_agency_fees, fill_value=0)
-        total_new_customers = new_cust_capped.groupby('mapping_key')['value'].sum()
-        cac_df = pd.DataFrame({'total_spend': total_spend_agg, 'total_new_customers': total_new_customers})
-        cac_df['cac'] = cac_df.apply(lambda r: r['total_spend'] / r['total_new_customers'] if r['total_new_customers'] > 0 else 0, axis=1)
-        cac_df = cac_df[cac_df['cac'] > 0].reset_index().rename(columns={'mapping_key': 'channel'})
-
-        new_cust_df['customer_type'] = 'New'
-        ext_cust_df['customer_type'] = 'Existing'
-        all_cust_df = pd.concat([new_cust_df, ext_cust_df])
-        all_cust_df['date'] = pd.to_datetime(all_cust_df['date'])
-        all_cust_capped = all_cust_df[all_cust_df['date'] < analysis_end_date]
-        cust_composition_df = all_cust_capped.groupby(['date', 'customer_type'])['value'].sum().unstack().fillna(0)
-        new_cust_acq_df = new_cust_capped.groupby('channel_name')['value'].sum().sort_values(ascending=False).reset_index()
-
-        total_revenue_kpi = roas_df['total_revenue'].sum()
-        total_spend_kpi = roas_df[roas_df['true_total_ad_spend'] > 0]['true_total_ad_spend'].sum()
-        blended_roas_kpi = total_revenue_kpi / total_spend_kpi if total_spend_kpi > 0 else 0
-        total_new_cust_kpi = cac_df['total_new_customers'].sum()
-        blended_cac_kpi = cac_df['total_spend'].sum() / total_new_cust_kpi if total_new_cust_kpi > 0 else 0
-
-        kpi_data = {
-            "total_revenue": total_revenue_kpi,
-            "blended_roas": blended_roas_kpi,
-            "blended_cac": blended_cac_kpi,
-            "total_new_customers": total_new_cust_kpi
-        }
-
-        return roas_df, monthly_trends_df, cac_df, cust_composition_df, new_cust_acq_df, kpi_data
+        stat = SPEND_OVERRIDES_PATH.stat()
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
 
+@st.cache_data(max_entries=4)
+def load_spend_overrides(version):
+    """spend_override indexed by (month, mapping_key); None if the file is missing."""
+    if version is None:
+        return None
+    return read_spend_overrides(SPEND_OVERRIDES_PATH)
+
+@st.cache_data(hash_funcs=CACHE_BY_UPLOAD)
+def build_monthly_spend(media_spend_file, overrides_version):
+    """Media spend plus agency fees per month and channel, with spend gaps patched from the overrides."""
+    media_spend_df = load_media_spend(media_spend_file)
+    is_agency = is_agency_fee(media_spend_df)
+    monthly_spend = pd.merge(
+        media_spend_df.loc[~is_agency, ['date', 'mapping_key', 'value']],
+        media_spend_df.loc[is_agency, ['date', 'mapping_key', 'value']],
+        on=['date', 'mapping_key'], how='left', suffixes=('_media', '_agency'),
+    ).astype({'mapping_key': str})
+    total_spend = monthly_spend['value_media'] + monthly_spend['value_agency'].fillna(0)
+
+    overrides = load_spend_overrides(overrides_version)
+    if overrides is None:
+        st.sidebar.warning("`spend_overrides.csv` not found. Spend gap not patched.")
+    else:
+        total_spend = pd.Series(patch_spend_gaps(monthly_spend['date'], monthly_spend['mapping_key'], total_spend, overrides)).fillna(0)
+    monthly_spend['total_spend'] = total_spend.to_numpy()
+    return monthly_spend[['date', 'mapping_key', 'total_spend']]
+
+@st.cache_data(hash_funcs=CACHE_BY_UPLOAD)
+def build_monthly_trends(media_spend_file, topsheet_file, new_cust_file, overrides_version):
+    monthly_spend = build_monthly_spend(media_spend_file, overrides_version)
+
+    topsheet_df = load_topsheet(topsheet_file)
+    monthly_revenue = topsheet_df[topsheet_df['metric'].str.startswith(NET_SALES_PREFIX, na=False)].copy()
+    monthly_revenue['mapping_key'] = normalize_channel_keys(monthly_revenue['metric'].str[len(NET_SALES_PREFIX):]).astype(str)
+    monthly_trends_df = pd.merge(monthly_spend, monthly_revenue[['date', 'mapping_key', 'value']], on=['date', 'mapping_key'], how='left')
+    monthly_trends_df.rename(columns={'value': 'net_revenue'}, inplace=True)
+    monthly_trends_df['net_revenue'] = monthly_trends_df['net_revenue'].fillna(0)
+    monthly_trends_df['monthly_roas'] = safe_ratio(monthly_trends_df['net_revenue'], monthly_trends_df['total_spend'])
+
+    new_cust_df = load_customers(new_cust_file).astype({'mapping_key': str})
+    monthly_trends_df = pd.merge(monthly_trends_df, new_cust_df[['date', 'mapping_key', 'value']], on=['date', 'mapping_key'], how='left')
+    monthly_trends_df['new_customers'] = monthly_trends_df.pop('value').fillna(0)
+    monthly_trends_df['monthly_cac'] = safe_ratio(monthly_trends_df['total_spend'], monthly_trends_df['new_customers'])
+    return monthly_trends_df[monthly_trends_df['mapping_key'].isin(CHANNELS_TO_PLOT)]
+
+@st.cache_data(hash_funcs=CACHE_BY_UPLOAD)
+def build_cac(media_spend_file, new_cust_file):
+    return overall_cac(load_media_spend(media_spend_file), load_customers(new_cust_file))
+
+@st.cache_data(hash_funcs=CACHE_BY_UPLOAD)
+def build_customer_composition(new_cust_file, ext_cust_file):
+    return customer_composition(load_customers(new_cust_file), load_customers(ext_cust_file))
+
+@st.cache_data(hash_funcs=CACHE_BY_UPLOAD)
+def build_new_customer_acquisition(new_cust_file):
+    return new_customer_acquisition(load_customers(new_cust_file))
+
+@st.cache_data(hash_funcs=CACHE_BY_UPLOAD)
+def build_kpis(marketing_file, media_spend_file, new_cust_file):
+    return headline_kpis(build_roas(marketing_file, media_spend_file), build_cac(media_spend_file, new_cust_file))
+
+def monthly_trends_for(media_spend_file, topsheet_file, new_cust_file):
+    # The overrides file is checked on every rerun; only a changed file rebuilds the spend.
+    return build_monthly_trends(media_spend_file, topsheet_file, new_cust_file, spend_overrides_version())
+
+# Table name -> (builder, the uploads it reads); names match analysis_artifacts.ARTIFACTS.
+UPLOAD_BUILDERS = {
+    'roas': (build_roas, ['marketing_file', 'media_spend_file']),
+    'monthly_trends': (monthly_trends_for, ['media_spend_file', 'topsheet_file', 'new_cust_file']),
+    'cac': (build_cac, ['media_spend_file', 'new_cust_file']),
+    'customer_composition': (build_customer_composition, ['new_cust_file', 'ext_cust_file']),
+    'new_customer_acquisition': (build_new_customer_acquisition, ['new_cust_file']),
+    'kpis': (build_kpis, ['marketing_file', 'media_spend_file', 'new_cust_file']),
+}
+
+@st.cache_data(max_entries=2)
+def load_analysis_ready(version):
+    """
+    The prepared tables, keyed like UPLOAD_BUILDERS. Cached on the dataset
+    version string alone, so no file content is hashed per rerun; a new
+    preparation run gets a new version.
+    """
+    data = read_analysis_ready()
+    data['monthly_trends'] = data['monthly_trends'][data['monthly_trends']['mapping_key'].isin(CHANNELS_TO_PLOT)]
+    return data
+
+def get_table(name):
+    """One table for the current page, from the prepared datasets or built from the uploads."""
+    try:
+        if use_prepared_data:
+            return load_analysis_ready(prepared_version)[name]
+        builder, upload_names = UPLOAD_BUILDERS[name]
+        return builder(*(uploads[upload_name] for upload_name in upload_names))
     except Exception as e:
         st.error(f"An error occurred during main data processing: {e}")
-        return None, None, None, None, None, None
+        st.stop()
 
 @st.cache_data
 def process_email_data(email_file):
@@ -648,184 +713,192 @@ def plot_email_roas(df):
 
 # --- Main Content ---
 if page in ["❓ Executive Summary", "👥 Who is driving my growth?", "🌍 Where is that growth coming from?"]:
-    if all([marketing_file, media_spend_file, topsheet_file, new_cust_file, ext_cust_file]):
-        result = load_and_process_data(
-            marketing_file, media_spend_file, topsheet_file, new_cust_file, ext_cust_file
-        )
-        if result:
-            roas_df, monthly_trends_df, cac_df, cust_composition_df, new_cust_acq_df, kpi_data = result
-
-            if page == "❓ Executive Summary":
-                st.header("Executive Summary")
-
-                # --- Attractive Overall Summary Card ---
-                st.markdown("""
-                <div style="
-                    background: linear-gradient(120deg, #232b39 60%, #4b6cb7 100%);
-                    border-radius: 18px;
-                    box-shadow: 0 4px 24px rgba(75,108,183,0.18);
-                    padding: 2.2rem 2rem 1.2rem 2rem;
-                    margin-bottom: 2.2rem;
-                    color: #e6e9f0;
-                    font-size: 1.18rem;
-                    font-family: 'Inter', 'Segoe UI', Arial, sans-serif;
-                ">
-                    <b>📊 Dashboard At-a-Glance</b><br>
-                    <ul style="margin: 1em 0 0 1.2em; padding: 0;">
-                        <li><b>Growth Drivers:</b> See which channels and personas are fueling your business growth.</li>
-                        <li><b>Channel Efficiency:</b> Instantly compare ROAS and CAC across all paid channels.</li>
-                        <li><b>Customer Mix:</b> Track the balance between new and existing customers for sustainable growth.</li>
-                        <li><b>Email & Wholesale:</b> Review high-level email flow performance and wholesale readiness.</li>
-                        <li><b>Product Strategy:</b> (Coming soon) Get ready for actionable product and pricing insights.</li>
-                    </ul>
-                    <div style="margin-top:1.2em; color:#bfc9da; font-size:1.05rem;">
-                        <i>Use the navigation to explore each area in detail. This summary gives you a quick pulse on your business health and marketing effectiveness.</i>
-                    </div>
+    if use_prepared_data or all(uploads.values()):
+        if page == "❓ Executive Summary":
+            kpi_data = get_table('kpis')
+            cust_composition_df = get_table('customer_composition')
+
+            st.header("Executive Summary")
+
+            # --- Attractive Overall Summary Card ---
+            st.markdown("""
+            <div style="
+                background: linear-gradient(120deg, #232b39 60%, #4b6cb7 100%);
+                border-radius: 18px;
+                box-shadow: 0 4px 24px rgba(75,108,183,0.18);
+                padding: 2.2rem 2rem 1.2rem 2rem;
+                margin-bottom: 2.2rem;
+                color: #e6e9f0;
+                font-size: 1.18rem;
+                font-family: 'Inter', 'Segoe UI', Arial, sans-serif;
+            ">
+                <b>📊 Dashboard At-a-Glance</b><br>
+                <ul style="margin: 1em 0 0 1.2em; padding: 0;">
+                    <li><b>Growth Drivers:</b> See which channels and personas are fueling your business growth.</li>
+                    <li><b>Channel Efficiency:</b> Instantly compare ROAS and CAC across all paid channels.</li>
+                    <li><b>Customer Mix:</b> Track the balance between new and existing customers for sustainable growth.</li>
+                    <li><b>Email & Wholesale:</b> Review high-level email flow performance and wholesale readiness.</li>
+                    <li><b>Product Strategy:</b> (Coming soon) Get ready for actionable product and pricing insights.</li>
+                </ul>
+                <div style="margin-top:1.2em; color:#bfc9da; font-size:1.05rem;">
+                    <i>Use the navigation to explore each area in detail. This summary gives you a quick pulse on your business health and marketing effectiveness.</i>
+                </div>
+            </div>
+            """, unsafe_allow_html=True)
+
+            # --- KPIs ---
+            st.markdown("""
+            <div style="display:flex; flex-wrap:wrap; gap:1.5em; margin-bottom:1.5em;">
+                <div style="flex:1; min-width:180px; background:rgba(75,108,183,0.18); border-radius:14px; padding:1.2em 1em; text-align:center;">
+                    <div style="font-size:1.2em; font-weight:700; color:#4b6cb7;">${:,.0f}</div>
+                    <div style="color:#bfc9da;">Total Revenue</div>
+                </div>
+                <div style="flex:1; min-width:180px; background:rgba(75,108,183,0.18); border-radius:14px; padding:1.2em 1em; text-align:center;">
+                    <div style="font-size:1.2em; font-weight:700; color:#00b894;">{:.2f}x</div>
+                    <div style="color:#bfc9da;">Blended ROAS</div>
+                </div>
+                <div style="flex:1; min-width:180px; background:rgba(75,108,183,0.18); border-radius:14px; padding:1.2em 1em; text-align:center;">
+                    <div style="font-size:1.2em; font-weight:700; color:#fdcb6e;">${:.2f}</div>
+                    <div style="color:#bfc9da;">Blended CAC</div>
+                </div>
+                <div style="flex:1; min-width:180px; background:rgba(75,108,183,0.18); border-radius:14px; padding:1.2em 1em; text-align:center;">
+                    <div style="font-size:1.2em; font-weight:700; color:#e17055;">{:,.0f}</div>
+                    <div style="color:#bfc9da;">Total New Customers</div>
                 </div>
-                """, unsafe_allow_html=True)
-
-                # --- KPIs ---
-                st.markdown("""
-                <div style="display:flex; flex-wrap:wrap; gap:1.5em; margin-bottom:1.5em;">
-                    <div style="flex:1; min-width:180px; background:rgba(75,108,183,0.18); border-radius:14px; padding:1.2em 1em; text-align:center;">
-                        <div style="font-size:1.2em; font-weight:700; color:#4b6cb7;">${:,.0f}</div>
-                        <div style="color:#bfc9da;">Total Revenue</div>
+            </div>
+            """.format(
+                kpi_data['total_revenue'],
+                kpi_data['blended_roas'],
+                kpi_data['blended_cac'],
+                kpi_data['total_new_customers']
+            ), unsafe_allow_html=True)
+
+            # --- Generalized High-Level Summaries for Each Tab ---
+            st.markdown("""
+            <div style="margin-top:2.2em; margin-bottom:1.2em;">
+                <div style="display:flex; flex-wrap:wrap; gap:1.2em;">
+                    <div style="flex:1; min-width:220px; background:rgba(75,108,183,0.10); border-radius:12px; padding:1.1em;">
+                        <b>👥 Who is driving my growth?</b><br>
+                        <span style="color:#bfc9da;">Top personas and channels are identified for targeted acquisition and retention.</span>
                     </div>
-                    <div style="flex:1; min-width:180px; background:rgba(75,108,183,0.18); border-radius:14px; padding:1.2em 1em; text-align:center;">
-                        <div style="font-size:1.2em; font-weight:700; color:#00b894;">{:.2f}x</div>
-                        <div style="color:#bfc9da;">Blended ROAS</div>
+                    <div style="flex:1; min-width:220px; background:rgba(75,108,183,0.10); border-radius:12px; padding:1.1em;">
+                        <b>🌍 Where is that growth coming from?</b><br>
+                        <span style="color:#bfc9da;">Compare channel performance and efficiency at a glance.</span>
                     </div>
-                    <div style="flex:1; min-width:180px; background:rgba(75,108,183,0.18); border-radius:14px; padding:1.2em 1em; text-align:center;">
-                        <div style="font-size:1.2em; font-weight:700; color:#fdcb6e;">${:.2f}</div>
-                        <div style="color:#bfc9da;">Blended CAC</div>
+                    <div style="flex:1; min-width:220px; background:rgba(75,108,183,0.10); border-radius:12px; padding:1.1em;">
+                        <b>📧 Email Performance</b><br>
+                        <span style="color:#bfc9da;">See which email flows are delivering the best ROI.</span>
                     </div>
-                    <div style="flex:1; min-width:180px; background:rgba(75,108,183,0.18); border-radius:14px; padding:1.2em 1em; text-align:center;">
-                        <div style="font-size:1.2em; font-weight:700; color:#e17055;">{:,.0f}</div>
-                        <div style="color:#bfc9da;">Total New Customers</div>
+                    <div style="flex:1; min-width:220px; background:rgba(75,108,183,0.10); border-radius:12px; padding:1.1em;">
+                        <b>🛍️ Wholesale Shell</b><br>
+                        <span style="color:#bfc9da;">Wholesale analytics framework is ready for your retailer data.</span>
                     </div>
-                </div>
-                """.format(
-                    kpi_data['total_revenue'],
-                    kpi_data['blended_roas'],
-                    kpi_data['blended_cac'],
-                    kpi_data['total_new_customers']
-                ), unsafe_allow_html=True)
-
-                # --- Generalized High-Level Summaries for Each Tab ---
-                st.markdown("""
-                <div style="margin-top:2.2em; margin-bottom:1.2em;">
-                    <div style="display:flex; flex-wrap:wrap; gap:1.2em;">
-                        <div style="flex:1; min-width:220px; background:rgba(75,108,183,0.10); border-radius:12px; padding:1.1em;">
-                            <b>👥 Who is driving my growth?</b><br>
-                            <span style="color:#bfc9da;">Top personas and channels are identified for targeted acquisition and retention.</span>
-                        </div>
-                        <div style="flex:1; min-width:220px; background:rgba(75,108,183,0.10); border-radius:12px; padding:1.1em;">
-                            <b>🌍 Where is that growth coming from?</b><br>
-                            <span style="color:#bfc9da;">Compare channel performance and efficiency at a glance.</span>
-                        </div>
-                        <div style="flex:1; min-width:220px; background:rgba(75,108,183,0.10); border-radius:12px; padding:1.1em;">
-                            <b>📧 Email Performance</b><br>
-                            <span style="color:#bfc9da;">See which email flows are delivering the best ROI.</span>
-                        </div>
-                        <div style="flex:1; min-width:220px; background:rgba(75,108,183,0.10); border-radius:12px; padding:1.1em;">
-                            <b>🛍️ Wholesale Shell</b><br>
-                            <span style="color:#bfc9da;">Wholesale analytics framework is ready for your retailer data.</span>
-                        </div>
-                        <div style="flex:1; min-width:220px; background:rgba(75,108,183,0.10); border-radius:12px; padding:1.1em;">
-                            <b>📦 What should I be selling?</b><br>
-                            <span style="color:#bfc9da;">Product and pricing insights will be available once data is provided.</span>
-                        </div>
+                    <div style="flex:1; min-width:220px; background:rgba(75,108,183,0.10); border-radius:12px; padding:1.1em;">
+                        <b>📦 What should I be selling?</b><br>
+                        <span style="color:#bfc9da;">Product and pricing insights will be available once data is provided.</span>
                     </div>
                 </div>
-                """, unsafe_allow_html=True)
-
-                st.markdown("---")
-
-                st.subheader("The 'Leaky Bucket' Problem")
-                st.markdown(
-                    """
-                    <div style="font-size:1.08rem; color:#bfc9da; margin-bottom:1.2em;">
-                        <b>What is the 'Leaky Bucket' Problem?</b><br>
-                        Imagine your business as a bucket: <b>new customers</b> are water pouring in, while <b>existing customers</b> are water you want to keep. 
-                        If you only focus on acquiring new customers but don't retain existing ones, your bucket will always be leaking—making it hard to grow sustainably.<br><br>
-                        <b>Why does it matter?</b><br>
-                        • <b>High churn</b> means you must spend more to replace lost customers.<br>
-                        • <b>Healthy growth</b> comes from both acquiring new customers and keeping existing ones engaged.<br>
-                        • <b>Tracking the mix</b> helps you spot if your growth is real or just replacing lost customers.<br><br>
-                        <b>How to use this chart:</b><br>
-                        • <span style="color:#4b6cb7;">Blue area</span>: New customers acquired each month.<br>
-                        • <span style="color:#fdcb6e;">Yellow area</span>: Existing customers returning.<br>
-                        • <b>Goal:</b> Grow both areas over time, not just one!
-                    </div>
-                    """, unsafe_allow_html=True
-                )
-                st.plotly_chart(plot_customer_composition(cust_composition_df), use_container_width=True)
-
-            elif page == "👥 Who is driving my growth?":
-                st.header("👥 Customer Analysis: Personas & Segments")
-                st.markdown("""
-                <div style="font-size:1.1rem; color:#bfc9da; margin-bottom:1.5em;">
-                    <b>Summary:</b> Identify which customer segments and personas are fueling your growth. Analyze acquisition channels and persona distribution to optimize targeting and retention.
+            </div>
+            """, unsafe_allow_html=True)
+
+            st.markdown("---")
+
+            st.subheader("The 'Leaky Bucket' Problem")
+            st.markdown(
+                """
+                <div style="font-size:1.08rem; color:#bfc9da; margin-bottom:1.2em;">
+                    <b>What is the 'Leaky Bucket' Problem?</b><br>
+                    Imagine your business as a bucket: <b>new customers</b> are water pouring in, while <b>existing customers</b> are water you want to keep. 
+                    If you only focus on acquiring new customers but don't retain existing ones, your bucket will always be leaking—making it hard to grow sustainably.<br><br>
+                    <b>Why does it matter?</b><br>
+                    • <b>High churn</b> means you must spend more to replace lost customers.<br>
+                    • <b>Healthy growth</b> comes from both acquiring new customers and keeping existing ones engaged.<br>
+                    • <b>Tracking the mix</b> helps you spot if your growth is real or just replacing lost customers.<br><br>
+                    <b>How to use this chart:</b><br>
+                    • <span style="color:#4b6cb7;">Blue area</span>: New customers acquired each month.<br>
+                    • <span style="color:#fdcb6e;">Yellow area</span>: Existing customers returning.<br>
+                    • <b>Goal:</b> Grow both areas over time, not just one!
                 </div>
-                """, unsafe_allow_html=True)
-
-                col1, col2 = st.columns(2)
-                col1.metric("Total New Customers", f"{kpi_data['total_new_customers']:,.0f}")
-                col2.metric("Top Acquisition Channel", f"{new_cust_acq_df.iloc[0]['channel_name']}" if not new_cust_acq_df.empty else "N/A")
-
-                st.subheader("Monthly Active Customers: New vs. Existing")
-                st.plotly_chart(plot_customer_composition(cust_composition_df), use_container_width=True)
-                st.subheader("Top Channels for New Customer Acquisition")
-                st.plotly_chart(plot_new_customer_acquisition(new_cust_acq_df), use_container_width=True)
-                st.markdown("---")
-                st.header("Persona Analysis")
-                if persona_file:
-                    personas_df = pd.read_csv(persona_file)
-                    persona_list = ['All Personas'] + sorted(personas_df['persona'].unique().tolist())
-                    selected_persona = st.selectbox("Filter by Persona:", persona_list)
-                    if selected_persona != 'All Personas':
-                        display_personas_df = personas_df[personas_df['persona'] == selected_persona]
-                    else:
-                        display_personas_df = personas_df
-                    st.plotly_chart(plot_persona_distribution(display_personas_df), use_container_width=True)
-                    st.dataframe(display_personas_df)
+                """, unsafe_allow_html=True
+            )
+            st.plotly_chart(plot_customer_composition(cust_composition_df), use_container_width=True)
+
+        elif page == "👥 Who is driving my growth?":
+            kpi_data = get_table('kpis')
+            cust_composition_df = get_table('customer_composition')
+            new_cust_acq_df = get_table('new_customer_acquisition')
+
+            st.header("👥 Customer Analysis: Personas & Segments")
+            st.markdown("""
+            <div style="font-size:1.1rem; color:#bfc9da; margin-bottom:1.5em;">
+                <b>Summary:</b> Identify which customer segments and personas are fueling your growth. Analyze acquisition channels and persona distribution to optimize targeting and retention.
+            </div>
+            """, unsafe_allow_html=True)
+
+            col1, col2 = st.columns(2)
+            col1.metric("Total New Customers", f"{kpi_data['total_new_customers']:,.0f}")
+            col2.metric("Top Acquisition Channel", f"{new_cust_acq_df.iloc[0]['channel_name']}" if not new_cust_acq_df.empty else "N/A")
+
+            st.subheader("Monthly Active Customers: New vs. Existing")
+            st.plotly_chart(plot_customer_composition(cust_composition_df), use_container_width=True)
+            st.subheader("Top Channels for New Customer Acquisition")
+            st.plotly_chart(plot_new_customer_acquisition(new_cust_acq_df), use_container_width=True)
+            st.markdown("---")
+            st.header("Persona Analysis")
+            if persona_file:
+                personas_df = pd.read_csv(persona_file)
+                persona_list = ['All Personas'] + sorted(personas_df['persona'].unique().tolist())
+                selected_persona = st.selectbox("Filter by Persona:", persona_list)
+                if selected_persona != 'All Personas':
+                    display_personas_df = personas_df[personas_df['persona'] == selected_persona]
                 else:
-                    st.info("Upload the `customer_personas.csv` file to view persona analysis.")
-
-            elif page == "🌍 Where is that growth coming from?":
-                st.header("🌍 Channel Analysis: Performance & Tactics")
-                st.markdown("""
-                <div style="font-size:1.1rem; color:#bfc9da; margin-bottom:1.5em;">
-                    <b>Summary:</b> Evaluate which marketing channels deliver the best return on investment and lowest acquisition costs. Use these insights to optimize your marketing mix.
-                </div>
-                """, unsafe_allow_html=True)
-
-                col1, col2 = st.columns(2)
-                top_roas_channel = roas_df.iloc[0]['marketing_channel'] if not roas_df.empty else "N/A"
-                top_roas_value = roas_df.iloc[0]['corrected_roas'] if not roas_df.empty else 0
-                col1.metric("Top ROAS Channel", f"{top_roas_channel}", f"{top_roas_value:.2f}x")
-                lowest_cac_channel = cac_df.sort_values('cac').iloc[0]['channel'] if not cac_df.empty else "N/A"
-                lowest_cac_value = cac_df.sort_values('cac').iloc[0]['cac'] if not cac_df.empty else 0
-                col2.metric("Lowest CAC Channel", f"{lowest_cac_channel}", f"${lowest_cac_value:.2f}")
-
-                tab1, tab2 = st.tabs(["Return on Ad Spend (ROAS)", "Customer Acquisition Cost (CAC)"])
-                with tab1:
-                    spend_gaps = monthly_trends_df[monthly_trends_df['total_spend'] <= 0]
-                    if not spend_gaps.empty:
-                        st.error("🚨 Data Gap: One or more channels has $0 spend in a recent month after patching.")
-                        with st.expander("Show rows with data gaps"):
-                            st.dataframe(spend_gaps[['date', 'mapping_key', 'total_spend']])
-                    st.subheader("Corrected Return on Ad Spend (ROAS) by Channel")
-                    st.plotly_chart(plot_corrected_roas(roas_df), use_container_width=True)
-                    st.subheader("Monthly ROAS Trend for Key Paid Channels")
-                    st.plotly_chart(plot_monthly_roas_trends(monthly_trends_df), use_container_width=True)
-                with tab2:
-                    st.subheader("Overall Customer Acquisition Cost (CAC) by Channel")
-                    st.plotly_chart(plot_overall_cac(cac_df), use_container_width=True)
-                    st.subheader("Monthly CAC Trend for Key Paid Channels")
-                    st.plotly_chart(plot_monthly_cac_trends(monthly_trends_df), use_container_width=True)
+                    display_personas_df = personas_df
+                st.plotly_chart(plot_persona_distribution(display_personas_df), use_container_width=True)
+                st.dataframe(display_personas_df)
+            else:
+                st.info("Upload the `customer_personas.csv` file to view persona analysis.")
+
+        elif page == "🌍 Where is that growth coming from?":
+            roas_df = get_table('roas')
+            cac_df = get_table('cac')
+            monthly_trends_df = get_table('monthly_trends')
+
+            st.header("🌍 Channel Analysis: Performance & Tactics")
+            st.markdown("""
+            <div style="font-size:1.1rem; color:#bfc9da; margin-bottom:1.5em;">
+                <b>Summary:</b> Evaluate which marketing channels deliver the best return on investment and lowest acquisition costs. Use these insights to optimize your marketing mix.
+            </div>
+            """, unsafe_allow_html=True)
+
+            col1, col2 = st.columns(2)
+            top_roas_channel = roas_df.iloc[0]['marketing_channel'] if not roas_df.empty else "N/A"
+            top_roas_value = roas_df.iloc[0]['corrected_roas'] if not roas_df.empty else 0
+            col1.metric("Top ROAS Channel", f"{top_roas_channel}", f"{top_roas_value:.2f}x")
+            lowest_cac_channel = cac_df.sort_values('cac').iloc[0]['channel'] if not cac_df.empty else "N/A"
+            lowest_cac_value = cac_df.sort_values('cac').iloc[0]['cac'] if not cac_df.empty else 0
+            col2.metric("Lowest CAC Channel", f"{lowest_cac_channel}", f"${lowest_cac_value:.2f}")
+
+            tab1, tab2 = st.tabs(["Return on Ad Spend (ROAS)", "Customer Acquisition Cost (CAC)"])
+            with tab1:
+                spend_gaps = monthly_trends_df[monthly_trends_df['total_spend'] <= 0]
+                if not spend_gaps.empty:
+                    st.error("🚨 Data Gap: One or more channels has $0 spend in a recent month after patching.")
+                    with st.expander("Show rows with data gaps"):
+                        st.dataframe(spend_gaps[['date', 'mapping_key', 'total_spend']])
+                if use_prepared_data and monthly_trends_df['imputed_bool'].any():
+                    st.caption(f"Prepared data: {int(monthly_trends_df['imputed_bool'].sum())} channel-months with missing revenue "
+                               "or customer counts are imputed (`imputed_bool`). Uploaded CSVs count them as 0.")
+                st.subheader("Corrected Return on Ad Spend (ROAS) by Channel")
+                st.plotly_chart(plot_corrected_roas(roas_df), use_container_width=True)
+                st.subheader("Monthly ROAS Trend for Key Paid Channels")
+                st.plotly_chart(plot_monthly_roas_trends(monthly_trends_df), use_container_width=True)
+            with tab2:
+                st.subheader("Overall Customer Acquisition Cost (CAC) by Channel")
+                st.plotly_chart(plot_overall_cac(cac_df), use_container_width=True)
+                st.subheader("Monthly CAC Trend for Key Paid Channels")
+                st.plotly_chart(plot_monthly_cac_trends(monthly_trends_df), use_container_width=True)
     else:
-        st.info("Please upload all 5 required CSV files using the sidebar to begin the analysis.")
+        st.info("Please upload all 5 required CSV files using the sidebar (or run `data_preparation_pipeline.py`) to begin the analysis.")
         st.image("https://i.imgur.com/3_3.png", caption="Upload files to start", use_container_width=True)
 
 elif page == "📧 Email Performance":
@@ -2,19 +2,48 @@ import pandas as pd
 import numpy as np
 import pandera as pa
 from pandera.errors import SchemaError
-from sklearn.experimental import enable_iterative_imputer
-from sklearn.impute import IterativeImputer
 from pathlib import Path
+import argparse
 import logging
 
+from analysis_artifacts import ANALYSIS_READY_DIR, artifact_paths, artifacts_version
+from channel_metrics import (NET_SALES_PREFIX, corrected_roas, customer_composition, headline_kpis, is_agency_fee,
+                             new_customer_acquisition, normalize_channel_keys, overall_cac, patch_spend_gaps,
+                             read_spend_overrides, safe_ratio)
+from imputation import IMPUTATION_STRATEGIES, apply_imputation
+from incremental_prep import (PrepManifest, changed_months, code_version, input_hashes, month_fingerprints,
+                              write_csv_atomically, write_json_atomically)
+from master_store import file_sha256
+
 # --- 1. CONFIGURATION & SETUP ---
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 # Define input and output paths
 INPUT_DIR = Path(".") # Assumes cleaned files are in the current directory
-OUTPUT_DIR = Path("data/analysis_ready")
+OUTPUT_DIR = ANALYSIS_READY_DIR
 OUTPUT_DIR.mkdir(exist_ok=True)
+# Input files of the analysis-ready outputs; their hashes decide what a run recomputes.
+SOURCE_FILES = {
+    'marketing': "Cleaned_Marketing Channel Breakdown.csv",
+    'media_spend': "cleaned_Media Spend by Channel.csv",
+    'topsheet': "cleaned_TOPSHEET.csv",
+    'new_customers': "cleaned_Cust By Channel-New.csv",
+    'existing_customers': "cleaned_Cust By Channel-Ext.csv",
+}
+# Optional agency spend for months whose recorded spend is 0, as in the dashboard's upload mode.
+SPEND_OVERRIDES_FILE = "spend_overrides.csv"
+OUTPUTS = artifact_paths(OUTPUT_DIR)
+# Modules that compute the outputs; a change to any of them forces a full refresh.
+PREP_MODULES = ['data_preparation_pipeline.py', 'channel_metrics.py', 'imputation.py', 'incremental_prep.py',
+                'analysis_artifacts.py']
+ROAS_OUTPUT = OUTPUTS['roas']
+MONTHLY_TRENDS_OUTPUT = OUTPUTS['monthly_trends']
+# How missing monthly values are filled; see imputation.py for the options.
+IMPUTATION_STRATEGY = 'iterative'
+# Fit model-based imputers per channel, on this many processes (None: all cores).
+IMPUTE_PER_CHANNEL = False
+IMPUTATION_WORKERS = None
 
 # --- 2. PANDERA SCHEMAS for Key DataFrames ---
 # We'll define schemas for the most critical dataframes to ensure quality.
@@ -23,7 +52,7 @@ OUTPUT_DIR.mkdir(exist_ok=True)
 # Schema for the monthly trends data before it's used in charts
 monthly_trends_schema = pa.DataFrameSchema({
     "date": pa.Column(pa.DateTime),
-    "mapping_key": pa.Column(str, pa.Check.isin(['paid search', 'paid social', 'affiliates'])),
+    "mapping_key": pa.Column(pa.Category, pa.Check.isin(['paid search', 'paid social', 'affiliates'])),
     "total_spend": pa.Column(float, pa.Check.greater_than_or_equal_to(0)),
     "net_revenue": pa.Column(float, pa.Check.greater_than_or_equal_to(0)),
     "monthly_roas": pa.Column(float),
@@ -41,39 +70,98 @@ roas_schema = pa.DataFrameSchema({
 
 # --- 3. DATA PROCESSING FUNCTIONS ---
 
+def pivot_to_grid(dates, keys, values, date_index, channel_index):
+    """
+    Sums `values` into a (date x channel) array aligned to `date_index` and
+    `channel_index`. Cells without any row are NaN; rows outside the grid are ignored.
+    """
+    rows = date_index.get_indexer(dates)
+    cols = channel_index.get_indexer(keys)
+    inside = (rows >= 0) & (cols >= 0)
+    cells = rows[inside] * len(channel_index) + cols[inside]
+    size = len(date_index) * len(channel_index)
+    totals = np.bincount(cells, weights=np.asarray(values, dtype=float)[inside], minlength=size)
+    counts = np.bincount(cells, minlength=size)
+    return np.where(counts > 0, totals, np.nan).reshape(len(date_index), len(channel_index))
+
+def build_channel_panel(media_spend_df, topsheet_df, new_cust_df):
+    """
+    Builds the monthly date x channel panel in one pass: channel keys are
+    normalized once, then media spend, agency fees, net revenue and new
+    customers are pivoted into aligned arrays. Returns one row per month and
+    channel with direct media spend (channel-major order) with columns date,
+    mapping_key, total_spend, net_revenue and new_customers.
+    """
+    media_keys = normalize_channel_keys(media_spend_df['channel_name'])
+    is_agency = is_agency_fee(media_spend_df).to_numpy()
+    media_dates = media_spend_df['date'].to_numpy()
+
+    date_index = pd.DatetimeIndex(np.unique(media_dates[~is_agency]))
+    channel_index = pd.Index(pd.unique(media_keys[~is_agency].dropna())).sort_values()
+    def grid(dates, keys, values):
+        return pivot_to_grid(dates, keys, values, date_index, channel_index)
+
+    media = grid(media_dates[~is_agency], media_keys[~is_agency], media_spend_df['value'].to_numpy()[~is_agency])
+    agency = grid(media_dates[is_agency], media_keys[is_agency], media_spend_df['value'].to_numpy()[is_agency])
+
+    is_net_sales = topsheet_df['metric'].str.startswith(NET_SALES_PREFIX, na=False).to_numpy()
+    net_sales = topsheet_df[is_net_sales]
+    revenue = grid(net_sales['date'], normalize_channel_keys(net_sales['metric'].str[len(NET_SALES_PREFIX):]), net_sales['value'])
+    new_customers = grid(new_cust_df['date'], normalize_channel_keys(new_cust_df['channel_name']), new_cust_df['value'])
+
+    # Months without agency fees count as zero fees; months without media spend have no row.
+    total_spend = media + np.nan_to_num(agency)
+    rows, cols = np.nonzero(~np.isnan(media).T)
+    return pd.DataFrame({
+        'date': date_index[cols],
+        'mapping_key': pd.Categorical.from_codes(rows, categories=channel_index),
+        'total_spend': total_spend[cols, rows],
+        'net_revenue': revenue[cols, rows],
+        'new_customers': new_customers[cols, rows],
+    })
+
 def apply_iterative_imputation(df, numeric_cols):
     """
     Applies IterativeImputer to fill missing values in numeric columns
     and adds a boolean flag for imputed rows, as per Task 8.2.
     """
-    df_numeric = df[numeric_cols]
-    
-    # Flag rows with missing data BEFORE imputing
-    df['imputed_bool'] = df_numeric.isnull().any(axis=1)
-    
-    if df_numeric.isnull().sum().sum() > 0:
-        logging.info(f"Applying IterativeImputer to columns: {numeric_cols}")
-        imputer = IterativeImputer(max_iter=10, random_state=0)
-        imputed_data = imputer.fit_transform(df_numeric)
-        df[numeric_cols] = imputed_data
-    
-    return df
-
-def prepare_final_data():
+    return apply_imputation(df, numeric_cols, strategy='iterative')
+
+def prepare_final_data(imputation_strategy=IMPUTATION_STRATEGY, per_channel=IMPUTE_PER_CHANNEL, max_workers=IMPUTATION_WORKERS,
+                       full_refresh=False):
     """
     Loads all cleaned CSVs, applies validation and imputation, performs calculations,
-    and saves the final, analysis-ready DataFrames.
+    and saves the final, analysis-ready DataFrames. Missing monthly values are
+    filled with `imputation_strategy` (one of IMPUTATION_STRATEGIES); with
+    `per_channel`, each channel gets its own imputer, fitted across `max_workers` processes.
+
+    Unless `full_refresh` is set, only the channels with input rows in a changed
+    month are recomputed and merged into the existing outputs (see incremental_prep.py).
     """
     try:
         logging.info("--- Starting Data Preparation Pipeline ---")
+
+        # An edited overrides file changes spend in any month, so it forces a full refresh.
+        overrides_path = INPUT_DIR / SPEND_OVERRIDES_FILE
+        params = {'imputation_strategy': imputation_strategy, 'per_channel': per_channel,
+                  'spend_overrides': file_sha256(overrides_path) if overrides_path.exists() else None,
+                  'code_version': code_version(PREP_MODULES)}
+        source_paths = {name: INPUT_DIR / file_name for name, file_name in SOURCE_FILES.items()}
+        file_hashes = input_hashes(source_paths)
+        manifest = PrepManifest(OUTPUT_DIR)
+        incremental = (not full_refresh and manifest.params == params
+                       and all(path.exists() for path in OUTPUTS.values()))
+        if incremental and all(manifest.file_hash(name) == sha256 for name, sha256 in file_hashes.items()):
+            logging.info("Source files unchanged since the last run; analysis-ready files are up to date.")
+            return
         
         # --- 4. LOAD ALL CLEANED DATA ---
         logging.info("Loading cleaned source files...")
-        marketing_df = pd.read_csv(INPUT_DIR / "Cleaned_Marketing Channel Breakdown.csv")
-        media_spend_df = pd.read_csv(INPUT_DIR / "cleaned_Media Spend by Channel.csv")
-        topsheet_df = pd.read_csv(INPUT_DIR / "cleaned_TOPSHEET.csv")
-        new_cust_df = pd.read_csv(INPUT_DIR / "cleaned_Cust By Channel-New.csv")
-        ext_cust_df = pd.read_csv(INPUT_DIR / "cleaned_Cust By Channel-Ext.csv")
+        marketing_df = pd.read_csv(source_paths['marketing'])
+        media_spend_df = pd.read_csv(source_paths['media_spend'])
+        topsheet_df = pd.read_csv(source_paths['topsheet'])
+        new_cust_df = pd.read_csv(source_paths['new_customers'])
+        ext_cust_df = pd.read_csv(source_paths['existing_customers'])
         
         # --- 5. DATA CLEANING & TRANSFORMATION ---
         # (This section contains the core logic from your dashboard's processing function)
@@ -83,48 +171,63 @@ def prepare_final_data():
         topsheet_df['date'] = pd.to_datetime(topsheet_df['date'])
         new_cust_df['date'] = pd.to_datetime(new_cust_df['date'])
         ext_cust_df['date'] = pd.to_datetime(ext_cust_df['date'])
+        month_hashes = {
+            'media_spend': month_fingerprints(media_spend_df),
+            'topsheet': month_fingerprints(topsheet_df),
+            'new_customers': month_fingerprints(new_cust_df),
+        }
 
-        # Calculate Corrected ROAS
-        agency_fees_df = media_spend_df[media_spend_df['channel_name'].str.contains("Agency", na=False, case=False)].copy()
-        agency_fees_df['mapping_key'] = agency_fees_df['channel_name'].str.replace(" Agency", "", regex=True, case=False).str.lower().str.strip()
-        agency_fees_df['mapping_key'] = agency_fees_df['mapping_key'].replace({'affiliate': 'affiliates'})
-        total_agency_fees_agg = agency_fees_df.groupby('mapping_key')['value'].sum().reset_index()
-        total_agency_fees_agg.rename(columns={'value': 'agency_fees'}, inplace=True)
-        
-        channel_summary = marketing_df.groupby('marketing_channel').agg(total_ad_spend=('ad_spend', 'sum'), total_revenue=('gross_discount_(shopify)', 'sum')).reset_index()
-        channel_summary = pd.merge(channel_summary, total_agency_fees_agg, left_on='marketing_channel', right_on='mapping_key', how='left')
-        channel_summary['agency_fees'] = channel_summary['agency_fees'].fillna(0)
-        channel_summary['true_total_ad_spend'] = channel_summary['total_ad_spend'] + channel_summary['agency_fees']
-        channel_summary['corrected_roas'] = channel_summary.apply(lambda row: row['total_revenue'] / row['true_total_ad_spend'] if row['true_total_ad_spend'] > 0 else 0, axis=1)
-        roas_df = channel_summary.sort_values('corrected_roas', ascending=False).reset_index(drop=True)
-
-        # Calculate Monthly Trends
-        media_spend_df['channel_name'] = media_spend_df['channel_name'].str.lower().replace({'affiliate': 'affiliates'})
-        direct_media_spend_df = media_spend_df[~media_spend_df['channel_name'].str.contains("agency", na=False, case=False)].copy()
-        direct_media_spend_df['mapping_key'] = direct_media_spend_df['channel_name'].str.replace(" media", "", regex=True, case=False).str.lower().str.strip()
-        monthly_spend = pd.merge(direct_media_spend_df, agency_fees_df[['date', 'mapping_key', 'value']], on=['date', 'mapping_key'], how='left', suffixes=('_media', '_agency'))
-        monthly_spend['value_agency'] = monthly_spend['value_agency'].fillna(0)
-        monthly_spend['total_spend'] = monthly_spend['value_media'] + monthly_spend['value_agency']
-        
-        monthly_revenue = topsheet_df[topsheet_df['metric'].str.contains("NET SALES -", na=False)].copy()
-        monthly_revenue['mapping_key'] = monthly_revenue['metric'].str.replace("NET SALES - ", "", regex=False).str.strip().str.lower()
-        
-        monthly_performance = pd.merge(monthly_spend[['date', 'mapping_key', 'total_spend']], monthly_revenue[['date', 'mapping_key', 'value']], on=['date', 'mapping_key'], how='left')
-        monthly_performance.rename(columns={'value': 'net_revenue'}, inplace=True)
+        # Channel keys are normalized once and shared by every table below.
+        media_spend_df['mapping_key'] = normalize_channel_keys(media_spend_df['channel_name'])
+
+        # Calculate Corrected ROAS and the dashboard's summary tables
+        roas_df = corrected_roas(marketing_df, media_spend_df)
+        cac_df = overall_cac(media_spend_df, new_cust_df)
+        cust_composition_df = customer_composition(new_cust_df, ext_cust_df)
+        new_cust_acq_df = new_customer_acquisition(new_cust_df)
+        kpi_data = headline_kpis(roas_df, cac_df)
+
+        # Calculate Monthly Trends: spend, agency fees, revenue and new customers
+        # aligned on one date x channel grid instead of merged table by table.
+        monthly_performance = build_channel_panel(media_spend_df, topsheet_df, new_cust_df)
+        if overrides_path.exists():
+            monthly_performance['total_spend'] = patch_spend_gaps(monthly_performance['date'], monthly_performance['mapping_key'],
+                                                                  monthly_performance['total_spend'], read_spend_overrides(overrides_path))
+        else:
+            logging.warning(f"{overrides_path} not found; months with zero spend are not patched.")
+
+        previous_trends = None
+        channel_order = monthly_performance['mapping_key'].cat.categories
+        if incremental:
+            # A channel is recomputed (over all its months, which imputation
+            # draws on) if it has rows in a changed month, before or now.
+            changed = set().union(*(changed_months(manifest.month_hashes(name), hashes) for name, hashes in month_hashes.items()))
+            previous_trends = pd.read_csv(MONTHLY_TRENDS_OUTPUT, parse_dates=['date'], float_precision='round_trip')
+            def channels_in_changed_months(df):
+                return set(df.loc[df['date'].dt.strftime('%Y-%m').isin(changed), 'mapping_key'].astype(str))
+            affected = channels_in_changed_months(monthly_performance) | channels_in_changed_months(previous_trends)
+            if affected and imputation_strategy == 'iterative' and not per_channel:
+                # One imputer is fitted over all channels, so any change reaches all of them.
+                affected = set(monthly_performance['mapping_key'].astype(str)) | set(previous_trends['mapping_key'])
+            logging.info(f"{len(changed)} changed month(s); recomputing {len(affected)} channel(s): {sorted(affected)}")
+            monthly_performance = monthly_performance[monthly_performance['mapping_key'].astype(str).isin(affected)].reset_index(drop=True)
+            previous_trends = previous_trends[~previous_trends['mapping_key'].isin(affected)]
         
         # --- 6. APPLY IMPUTATION (Task 8.2) ---
         # Impute missing values for net_revenue before calculating ROAS
-        monthly_performance = apply_iterative_imputation(monthly_performance, ['net_revenue', 'total_spend'])
-        
-        monthly_performance['monthly_roas'] = monthly_performance.apply(lambda row: row['net_revenue'] / row['total_spend'] if row['total_spend'] > 0 else 0, axis=1)
-        
-        new_cust_df['mapping_key'] = new_cust_df['channel_name'].str.lower().replace({'affiliate': 'affiliates'})
-        monthly_cac_df = pd.merge(monthly_spend[['date', 'mapping_key', 'total_spend']], new_cust_df[['date', 'mapping_key', 'value']], on=['date', 'mapping_key'], how='left')
-        monthly_cac_df.rename(columns={'value': 'new_customers'}, inplace=True)
-        monthly_cac_df = apply_iterative_imputation(monthly_cac_df, ['new_customers']) # Impute missing customer counts
-        monthly_cac_df['monthly_cac'] = monthly_cac_df.apply(lambda row: row['total_spend'] / row['new_customers'] if row['new_customers'] > 0 else 0, axis=1)
+        imputation = {'strategy': imputation_strategy, 'per_channel': per_channel, 'max_workers': max_workers}
+        monthly_performance = apply_imputation(monthly_performance, ['net_revenue', 'total_spend'], **imputation)
+        # Missing customer counts are imputed on their own, without changing the imputed flag
+        monthly_performance = apply_imputation(monthly_performance, ['new_customers'], flag_col=None, **imputation)
         
-        monthly_trends_df = pd.merge(monthly_performance, monthly_cac_df[['date', 'mapping_key', 'monthly_cac']], on=['date', 'mapping_key'], how='left')
+        monthly_performance['monthly_roas'] = safe_ratio(monthly_performance['net_revenue'], monthly_performance['total_spend'])
+        monthly_performance['monthly_cac'] = safe_ratio(monthly_performance['total_spend'], monthly_performance['new_customers'])
+        monthly_trends_df = monthly_performance[['date', 'mapping_key', 'total_spend', 'net_revenue', 'imputed_bool', 'monthly_roas', 'monthly_cac']]
+        if previous_trends is not None:
+            # Merge into the kept rows, in the same channel-major order as a full build.
+            monthly_trends_df = pd.concat([previous_trends, monthly_trends_df.astype({'mapping_key': str})], ignore_index=True)
+            monthly_trends_df['mapping_key'] = pd.Categorical(monthly_trends_df['mapping_key'], categories=channel_order)
+            monthly_trends_df = monthly_trends_df.sort_values(['mapping_key', 'date'], ignore_index=True)
         
         # --- 7. APPLY SCHEMA VALIDATION (Task 8.1) ---
         logging.info("Validating final dataframes with Pandera schemas...")
@@ -140,17 +243,35 @@ def prepare_final_data():
 
         # --- 8. SAVE ANALYSIS-READY DATA ---
         logging.info(f"Saving analysis-ready files to {OUTPUT_DIR}...")
-        roas_df.to_csv(OUTPUT_DIR / "final_roas.csv", index=False)
-        monthly_trends_df.to_csv(OUTPUT_DIR / "final_monthly_trends.csv", index=False)
-        # (Save other final dataframes as needed)
+        write_csv_atomically(roas_df, ROAS_OUTPUT)
+        write_csv_atomically(monthly_trends_df, MONTHLY_TRENDS_OUTPUT)
+        write_csv_atomically(cac_df, OUTPUTS['cac'])
+        write_csv_atomically(cust_composition_df, OUTPUTS['customer_composition'], index=True)
+        write_csv_atomically(new_cust_acq_df, OUTPUTS['new_customer_acquisition'])
+        write_json_atomically(kpi_data, OUTPUTS['kpis'])
+        # Recorded last: if the run stops before this, the next one starts from the previous manifest.
+        manifest.save(params, {name: {'sha256': sha256, 'months': month_hashes.get(name, {})} for name, sha256 in file_hashes.items()},
+                      dataset_version=artifacts_version(OUTPUT_DIR))
 
         logging.info("--- Data Preparation Pipeline Finished Successfully ---")
 
+    # Errors are logged and re-raised, so callers (pipeline_runner.py) see the run fail.
     except FileNotFoundError as e:
         logging.error(f"Error: A required input file was not found. Please check file paths. Details: {e}")
+        raise
     except Exception as e:
         logging.error(f"An unexpected error occurred in the pipeline: {e}")
+        raise
 
 
 if __name__ == '__main__':
-    prepare_final_data()
+    parser = argparse.ArgumentParser(description="Prepare the analysis-ready data tables.")
+    parser.add_argument("--imputation", choices=IMPUTATION_STRATEGIES, default=IMPUTATION_STRATEGY)
+    parser.add_argument("--per-channel", action="store_true", default=IMPUTE_PER_CHANNEL,
+                        help="Fit a separate imputer per channel, in parallel.")
+    parser.add_argument("--workers", type=int, default=IMPUTATION_WORKERS)
+    parser.add_argument("--full-refresh", action="store_true",
+                        help="Recompute every channel, ignoring the outputs of the last run.")
+    args = parser.parse_args()
+    prepare_final_data(imputation_strategy=args.imputation, per_channel=args.per_channel, max_workers=args.workers,
+                       full_refresh=args.full_refresh)
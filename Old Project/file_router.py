@@ -0,0 +1,59 @@
+import shutil
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from typed_csv import read_header, read_typed_csv, read_typed_parquet
+
+# --- FILE ROUTER ---
+# Classifies drop files as orders or sessions from their metadata alone: the
+# header row of a CSV or the schema in a Parquet footer. Only files that match a
+# known schema are ever read; anything else is moved to the quarantine folder
+# untouched.
+INGESTIBLE_SUFFIXES = ('.csv', '.parquet')
+UNRECOGNIZED_DIR = Path("data/quarantine/unrecognized")
+
+
+def read_columns(file_path):
+    """Column names of a CSV or Parquet file without reading its rows; [] if they cannot be read."""
+    file_path = Path(file_path)
+    try:
+        if file_path.suffix == '.csv':
+            return read_header(file_path)
+        if file_path.suffix == '.parquet':
+            return pq.read_schema(file_path).names
+    except (pa.ArrowInvalid, pd.errors.EmptyDataError, pd.errors.ParserError, UnicodeDecodeError, OSError):
+        pass
+    return []
+
+
+class FileRouter:
+    """Routes drop files to a file type by their columns; `specs` maps file types to CsvSpecs."""
+
+    def __init__(self, specs, unrecognized_dir=UNRECOGNIZED_DIR):
+        self.specs = specs
+        self.unrecognized_dir = Path(unrecognized_dir)
+
+    def classify(self, file_path):
+        """The first file type whose columns are all in the file, or None."""
+        columns = set(read_columns(file_path))
+        for file_type, spec in self.specs.items():
+            if columns and set(spec.columns).issubset(columns):
+                return file_type
+        return None
+
+    def read(self, file_path, file_type, chunksize=None):
+        """Yields the file as typed dataframes of about `chunksize` rows (one dataframe if None)."""
+        file_path = Path(file_path)
+        if file_path.suffix == '.parquet':
+            return read_typed_parquet(file_path, self.specs[file_type], chunksize)
+        return read_typed_csv(file_path, self.specs[file_type], chunksize)
+
+    def quarantine(self, file_path):
+        """Moves an unrecognized file, unread, to the quarantine folder; returns its new path."""
+        self.unrecognized_dir.mkdir(parents=True, exist_ok=True)
+        target = self.unrecognized_dir / Path(file_path).name
+        shutil.move(file_path, target)
+        return target
@@ -0,0 +1,207 @@
+import hashlib
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.experimental import enable_iterative_imputer  # noqa: F401
+from sklearn.impute import IterativeImputer, KNNImputer
+
+# --- IMPUTATION STRATEGIES ---
+# Fills missing numeric values in the monthly date x channel panel of
+# data_preparation_pipeline.py. Every strategy sets the `imputed_bool` flag the
+# same way: True for rows that had a missing value before imputation.
+#
+#   iterative    sklearn IterativeImputer (BayesianRidge round-robin) over all rows
+#   interpolate  per-channel linear interpolation in time between observed months
+#   seasonal     per-channel carry-forward of the same calendar month in earlier
+#                years, then of the nearest observed month
+#   knn          per-channel KNNImputer over the other numeric columns
+#
+# interpolate and seasonal are closed-form group operations. The model-based
+# strategies (iterative, knn) cache their fitted imputers on disk, keyed by a
+# hash of the observed data, so an unchanged input is never fitted twice.
+# With per_channel=True, iterative also fits one imputer per channel instead of
+# one over all channels. Per-channel fits (iterative and knn) are independent,
+# run across a process pool, and are cached by their result per channel, so
+# only channels whose observed data changed are fitted again.
+IMPUTATION_STRATEGIES = ('iterative', 'interpolate', 'seasonal', 'knn')
+IMPUTER_CACHE_DIR = Path("data/cache/imputers")
+# Least recently used fits are deleted beyond this many.
+MAX_CACHED_IMPUTERS = 32
+KNN_NEIGHBORS = 5
+# Spend, revenue and customer counts are never negative; the iterative imputer's
+# regressions are clipped here (small per-channel fits can extrapolate below 0).
+MIN_IMPUTED_VALUE = 0.0
+
+
+def data_fingerprint(df, strategy, params=()):
+    """SHA-256 of the strategy, its parameters and the frame's values (NaNs included)."""
+    digest = hashlib.sha256(repr((strategy, tuple(df.columns), params)).encode())
+    digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def make_iterative_imputer():
+    return IterativeImputer(max_iter=10, random_state=0, min_value=MIN_IMPUTED_VALUE)
+
+
+def fitted_imputer(make_imputer, data, strategy, params=(), cache_dir=IMPUTER_CACHE_DIR):
+    """
+    The imputer from `make_imputer()`, fitted on `data`. A fit is reused from
+    `cache_dir` when the same strategy was fitted on identical data before.
+    """
+    cache_path = Path(cache_dir) / f"{strategy}-{data_fingerprint(data, strategy, params)[:16]}.joblib"
+    if cache_path.exists():
+        logging.info(f"Reusing cached {strategy} imputer {cache_path.name}.")
+        cache_path.touch()
+        return joblib.load(cache_path)
+    imputer = make_imputer().fit(data)
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = cache_path.with_suffix('.joblib.tmp')
+    joblib.dump(imputer, tmp_path)
+    tmp_path.replace(cache_path)
+    cached = sorted(cache_path.parent.glob("*.joblib"), key=lambda path: path.stat().st_mtime, reverse=True)
+    for stale in cached[MAX_CACHED_IMPUTERS:]:
+        stale.unlink(missing_ok=True)
+    return imputer
+
+
+def _impute_partition(block, strategy):
+    """
+    Imputes one channel's rows (a 2-D array) with a model-based strategy.
+    Columns with no observation in the channel cannot be fitted and stay NaN.
+    """
+    fittable = ~np.isnan(block).all(axis=0)
+    result = block.copy()
+    if not fittable.any() or not np.isnan(block[:, fittable]).any():
+        return result
+    imputer = make_iterative_imputer() if strategy == 'iterative' else KNNImputer(n_neighbors=KNN_NEIGHBORS)
+    result[:, fittable] = imputer.fit_transform(block[:, fittable])
+    return result
+
+
+def impute_partitions(values, groups, strategy, columns, max_workers=None, cache_dir=IMPUTER_CACHE_DIR):
+    """
+    Imputes each group's rows of `values` independently and returns the results
+    in the original row order. Groups whose data is unchanged since the last
+    run are taken from the partition cache; the rest are spread over
+    `max_workers` processes (all cores by default; 1 runs them in this process).
+    """
+    partitions = [np.flatnonzero(groups == group) for group in np.unique(groups)]
+    params = (MIN_IMPUTED_VALUE,) if strategy == 'iterative' else (KNN_NEIGHBORS,)
+    fingerprints = [data_fingerprint(pd.DataFrame(values[rows], columns=columns), strategy, params) for rows in partitions]
+
+    columns_key = hashlib.sha256(repr(tuple(columns)).encode()).hexdigest()[:12]
+    cache_path = Path(cache_dir) / f"partitions-{strategy}-{columns_key}.joblib"
+    cached = joblib.load(cache_path) if cache_path.exists() else {}
+    todo = [i for i, fingerprint in enumerate(fingerprints) if fingerprint not in cached]
+    logging.info(f"Per-channel {strategy} imputation: {len(partitions) - len(todo)} of {len(partitions)} channels unchanged.")
+
+    blocks = (values[partitions[i]] for i in todo)
+    impute = partial(_impute_partition, strategy=strategy)
+    pool = None if max_workers == 1 or len(todo) < 2 else ProcessPoolExecutor(max_workers=max_workers)
+    try:
+        # map() yields in submission order, so each result lines up with its partition.
+        results = pool.map(impute, blocks) if pool is not None else map(impute, blocks)
+        for i, imputed in zip(todo, results):
+            cached[fingerprints[i]] = imputed
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    result = np.empty_like(values)
+    for rows, fingerprint in zip(partitions, fingerprints):
+        result[rows] = cached[fingerprint]
+    if todo:
+        # Keep only the current channels' results, written atomically.
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = cache_path.with_suffix('.joblib.tmp')
+        joblib.dump({fingerprint: cached[fingerprint] for fingerprint in fingerprints}, tmp_path)
+        tmp_path.replace(cache_path)
+    return result
+
+
+def _interpolate(values, times, groups):
+    """
+    Linear interpolation in time within each group, for a frame sorted by group
+    and time. Leading/trailing gaps take the nearest observed value; groups with
+    no observation stay NaN.
+    """
+    observed = ~np.isnan(values)
+    obs_time = pd.Series(np.where(observed, times, np.nan))
+    obs_value = pd.Series(np.where(observed, values, np.nan))
+    by_group = obs_time.groupby(groups)
+    prev_time, next_time = by_group.ffill().to_numpy(), by_group.bfill().to_numpy()
+    by_group = obs_value.groupby(groups)
+    prev_value, next_value = by_group.ffill().to_numpy(), by_group.bfill().to_numpy()
+
+    span = next_time - prev_time
+    with np.errstate(divide='ignore', invalid='ignore'):
+        between = prev_value + (next_value - prev_value) * np.where(span > 0, (times - prev_time) / span, 0.0)
+    filled = np.where(np.isnan(prev_value), next_value, np.where(np.isnan(next_value), prev_value, between))
+    return np.where(observed, values, filled)
+
+
+def _seasonal_carry_forward(values, groups, month_of_year):
+    """Same calendar month of the latest earlier year, then the nearest observed month, within each group."""
+    series = pd.Series(values)
+    filled = series.groupby([groups, month_of_year]).ffill()
+    filled = filled.groupby(groups).ffill().groupby(groups).bfill()
+    return filled.to_numpy()
+
+
+def apply_imputation(df, numeric_cols, strategy='iterative', group_col='mapping_key', date_col='date',
+                     flag_col='imputed_bool', cache_dir=IMPUTER_CACHE_DIR, per_channel=False, max_workers=None):
+    """
+    Fills missing values in `numeric_cols` of `df` in place with `strategy`
+    (one of IMPUTATION_STRATEGIES) and returns it. Per-channel strategies work
+    on rows grouped by `group_col` and ordered by `date_col`. Rows with a
+    missing value before imputation are flagged in `flag_col` (skipped if None).
+    `per_channel` fits the iterative imputer per channel too; per-channel model
+    fits run on `max_workers` processes.
+    """
+    if strategy not in IMPUTATION_STRATEGIES:
+        raise ValueError(f"Unknown imputation strategy {strategy!r}; expected one of {IMPUTATION_STRATEGIES}")
+    df_numeric = df[numeric_cols].astype(float)
+    missing = df_numeric.isnull()
+
+    # Flag rows with missing data BEFORE imputing
+    if flag_col is not None:
+        df[flag_col] = missing.any(axis=1)
+    if not missing.any().any():
+        return df
+    logging.info(f"Applying {strategy} imputation to columns: {numeric_cols}")
+
+    if strategy == 'iterative' and not per_channel:
+        imputer = fitted_imputer(make_iterative_imputer, df_numeric, strategy, (MIN_IMPUTED_VALUE,), cache_dir)
+        df[numeric_cols] = imputer.transform(df_numeric)
+        return df
+
+    # Per-channel strategies: work on a (group, date)-sorted copy, then put the
+    # results back in the original row order.
+    order = np.lexsort((df[date_col].to_numpy(), pd.factorize(df[group_col])[0]))
+    groups = pd.factorize(df[group_col])[0][order]
+    dates = pd.DatetimeIndex(df[date_col].to_numpy()[order])
+    sorted_values = df_numeric.to_numpy()[order]
+    result = np.empty_like(sorted_values)
+
+    if strategy in ('iterative', 'knn'):
+        # Channels are imputed independently; unchanged channels come from the cache.
+        result = impute_partitions(sorted_values, groups, strategy, numeric_cols, max_workers, cache_dir)
+    else:
+        times = dates.asi8.astype(float)
+        for i in range(len(numeric_cols)):
+            column = sorted_values[:, i]
+            if strategy == 'interpolate':
+                result[:, i] = _interpolate(column, times, groups)
+            else:
+                result[:, i] = _seasonal_carry_forward(column, groups, dates.month.to_numpy())
+
+    restored = np.empty_like(result)
+    restored[order] = result
+    df[numeric_cols] = restored
+    return df
@@ -0,0 +1,102 @@
+import hashlib
+import json
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from master_store import file_sha256
+
+# --- INCREMENTAL RE-PREPARATION ---
+# data_preparation_pipeline.py records what its analysis-ready outputs were
+# built from in a manifest next to them:
+#
+#   data/analysis_ready/prep_manifest.json
+#     params  imputation settings of the run and a hash of the code that ran it
+#     inputs  per input file: its SHA-256 and one content hash per month
+#     dataset_version  hash of the outputs written (see analysis_artifacts.py)
+#
+# On the next run, unchanged files (same SHA-256) are not even parsed, and only
+# the months whose hash changed mark their channels for recomputation; the
+# other channels' rows are kept from the existing outputs. A month hash does not
+# depend on row order within the file. Outputs and manifest are written to a
+# temporary file and renamed into place, manifest last, so an interrupted run
+# leaves the previous outputs and a manifest that still describes them.
+MANIFEST_NAME = "prep_manifest.json"
+
+
+def month_fingerprints(df, date_col='date'):
+    """Maps each month ('2024-01') of `df` to a SHA-256 of its rows, independent of their order."""
+    row_hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    months = df[date_col].dt.strftime('%Y-%m').fillna('NaT').to_numpy()
+    codes, labels = pd.factorize(months, sort=True)
+    order = np.lexsort((row_hashes, codes))
+    bounds = np.searchsorted(codes[order], np.arange(len(labels) + 1))
+    sorted_hashes = row_hashes[order]
+    return {
+        label: hashlib.sha256(sorted_hashes[start:end].tobytes()).hexdigest()
+        for label, start, end in zip(labels, bounds[:-1], bounds[1:])
+    }
+
+
+def changed_months(previous, current):
+    """Months added, removed or changed between two {month: hash} maps."""
+    return {month for month in previous.keys() | current.keys() if previous.get(month) != current.get(month)}
+
+
+class PrepManifest:
+    """The manifest of one output directory: run parameters and input hashes."""
+
+    def __init__(self, output_dir):
+        self.path = Path(output_dir) / MANIFEST_NAME
+        self.record = json.loads(self.path.read_text()) if self.path.exists() else {}
+
+    @property
+    def params(self):
+        return self.record.get('params')
+
+    def file_hash(self, name):
+        return self.record.get('inputs', {}).get(name, {}).get('sha256')
+
+    def month_hashes(self, name):
+        return self.record.get('inputs', {}).get(name, {}).get('months', {})
+
+    @property
+    def dataset_version(self):
+        return self.record.get('dataset_version')
+
+    def save(self, params, inputs, dataset_version=None):
+        """Atomically records `params`, `inputs` ({name: {'sha256': ..., 'months': {...}}}) and the outputs' version."""
+        self.record = {'params': params, 'inputs': inputs, 'dataset_version': dataset_version,
+                       'prepared_at': datetime.now().isoformat(timespec='seconds')}
+        write_json_atomically(self.record, self.path)
+
+
+def code_version(module_names):
+    """Short hash of the named modules' source files (next to this one), e.g. ['imputation.py']."""
+    digest = hashlib.sha256()
+    for name in sorted(module_names):
+        digest.update(f"{name}:{file_sha256(Path(__file__).parent / name)}\n".encode())
+    return digest.hexdigest()[:16]
+
+
+def input_hashes(paths):
+    """SHA-256 of each named input file."""
+    return {name: file_sha256(path) for name, path in paths.items()}
+
+
+def write_csv_atomically(df, path, index=False):
+    """Writes `df` to a temporary file next to `path`, then renames it over `path`."""
+    path = Path(path)
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    df.to_csv(tmp_path, index=index)
+    tmp_path.replace(path)
+
+
+def write_json_atomically(obj, path):
+    """JSON counterpart of write_csv_atomically()."""
+    path = Path(path)
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    tmp_path.write_text(json.dumps(obj, indent=2))
+    tmp_path.replace(path)
@@ -1,10 +1,21 @@
 import os
+import numpy as np
 import pandas as pd
-import hashlib
 import logging
 import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from functools import partial
+from itertools import repeat
 from pathlib import Path
 
+from ingestion_index import KEY_COLUMNS, IngestionIndex
+from master_store import MASTER_DATASETS, MasterStore, file_sha256
+from file_router import INGESTIBLE_SUFFIXES, FileRouter
+from typed_csv import CsvSpec
+from user_hashing import HashCache, hash_user_ids
+
 # --- 1. LOGGING CONFIGURATION ---
 # Create logs directory if it doesn't exist
 Path("logs").mkdir(exist_ok=True)
@@ -26,22 +37,57 @@ error_logger.addHandler(error_handler)
 
 # --- 2. SCHEMA AND CORE FUNCTIONS ---
 
+# Rows read per chunk in chunked mode. Peak memory is bounded by the chunk size
+# instead of the size of the incoming file.
+CHUNK_SIZE = 100_000
+STAGING_DIR = Path("data/staging")
+# Rejected rows are written in bulk to one quarantine file per run and file type.
+QUARANTINE_DIR = Path("data/quarantine")
+# Incoming files are classified from their header (or Parquet schema) alone and
+# read with the master schemas' types, so numbers and dates are parsed once by
+# the reader instead of inferred and then coerced again.
+FILE_ROUTER = FileRouter({name: CsvSpec.from_arrow(dataset['schema']) for name, dataset in MASTER_DATASETS.items()})
+
 def setup_project_structure():
     """Creates the necessary directories for the pipeline."""
     Path("data/new").mkdir(parents=True, exist_ok=True)
     Path("data/processed").mkdir(parents=True, exist_ok=True)
+    STAGING_DIR.mkdir(parents=True, exist_ok=True)
+    QUARANTINE_DIR.mkdir(parents=True, exist_ok=True)
     pipeline_logger.info("Project directories ensured to exist.")
 
-def hash_user_id(email):
-    """Hashes an email using SHA-256 for privacy."""
-    if not isinstance(email, str):
-        return None
-    return hashlib.sha256(email.encode('utf-8')).hexdigest()
+_hash_cache = None
 
-def validate_and_process_order_lines(df, file_name):
+def get_hash_cache():
+    """The process-wide user_id hash cache, loaded from disk on first use."""
+    global _hash_cache
+    if _hash_cache is None:
+        _hash_cache = HashCache.load()
+    return _hash_cache
+
+def reject_rows(df, reasons, file_name, on_reject):
+    """
+    Hands rows with a non-empty reason code to `on_reject` in one dataframe,
+    tagged with the source file, original row index and reason code.
+    Returns the number of rejected rows per reason code. Nothing is logged per
+    row; the pipeline logs one summary per file and per run.
+    """
+    rejected_mask = reasons != ''
+    if not rejected_mask.any():
+        return {}
+    rejected = df[rejected_mask].copy()
+    rejected.insert(0, 'reason_code', reasons[rejected_mask])
+    rejected.insert(0, 'source_row', df.index[rejected_mask])
+    rejected.insert(0, 'source_file', file_name)
+    if on_reject is not None:
+        on_reject(rejected)
+    return rejected['reason_code'].value_counts().to_dict()
+
+def validate_and_process_order_lines(df, file_name, on_reject=None):
     """
     Validates the order-line dataframe against the schema and rules.
-    Logs bad rows and returns a dataframe with only good rows.
+    Bad rows are passed in bulk, with a reason code, to `on_reject`.
+    Returns a dataframe with only good rows.
     """
     required_cols = {'order_id', 'customer_id', 'order_datetime', 'sku', 'qty', 'unit_price', 'discount'}
     if not required_cols.issubset(df.columns):
@@ -49,30 +95,36 @@ def validate_and_process_order_lines(df, file_name):
 
     initial_rows = len(df)
     
-    # Rule: No null IDs
-    df.dropna(subset=['order_id', 'customer_id'], inplace=True)
-    
-    # Convert types before validation
-    df['qty'] = pd.to_numeric(df['qty'], errors='coerce')
-    df['unit_price'] = pd.to_numeric(df['unit_price'], errors='coerce')
-    df.dropna(subset=['qty', 'unit_price'], inplace=True)
+    # Already numeric when the file was read typed; a no-op then
+    qty = pd.to_numeric(df['qty'], errors='coerce')
+    unit_price = pd.to_numeric(df['unit_price'], errors='coerce')
 
-    # Rule: qty >= 1 and unit_price >= 0
-    condition = (df['qty'] >= 1) & (df['unit_price'] >= 0)
-    
-    bad_rows = df[~condition]
-    if not bad_rows.empty:
-        error_logger.warning(f"Found {len(bad_rows)} bad rows in {file_name} failing qty/price rules.")
-        for index, row in bad_rows.iterrows():
-            error_logger.warning(f"SKIPPED ROW from {file_name} (Index {index}): {row.to_dict()}")
+    # Rules: no null IDs, numeric qty/price, qty >= 1 and unit_price >= 0.
+    # The first failing rule is the row's reason code.
+    reasons = pd.Series(np.select(
+        [
+            df['order_id'].isna() | df['customer_id'].isna(),
+            qty.isna() | unit_price.isna(),
+            (qty < 1).fillna(False),  # qty is nullable Int64 when read typed
+            unit_price < 0,
+        ],
+        ['null_id', 'non_numeric_qty_or_price', 'qty_below_1', 'negative_unit_price'],
+        default=''
+    ), index=df.index)
+
+    reject_rows(df, reasons, file_name, on_reject)
 
-    good_rows = df[condition]
+    good_rows = df[reasons == ''].copy()
+    good_rows['qty'] = qty[reasons == '']
+    good_rows['unit_price'] = unit_price[reasons == '']
     pipeline_logger.info(f"Validated {file_name}: {len(good_rows)}/{initial_rows} rows are valid.")
     return good_rows
 
-def validate_and_process_sessions(df, file_name):
+def validate_and_process_sessions(df, file_name, on_reject=None, hash_cache=None):
     """
     Validates the session-level dataframe and applies SHA-256 hashing to user_id.
+    Rows whose user_id cannot be hashed are passed to `on_reject`. Each distinct
+    email is hashed once, and emails found in `hash_cache` are not hashed at all.
     """
     required_cols = {'user_id', 'session_id', 'session_start', 'source', 'medium', 'campaign'}
     if not required_cols.issubset(df.columns):
@@ -81,8 +133,13 @@ def validate_and_process_sessions(df, file_name):
     pipeline_logger.info(f"Processing {file_name} as session-level data.")
     
     # Hash user_id with SHA-256 before storage
-    df['user_id'] = df['user_id'].apply(hash_user_id)
-    df.dropna(subset=['user_id'], inplace=True) # Drop rows where hashing failed (e.g., not a string)
+    hashed_user_ids = hash_user_ids(df['user_id'], hash_cache)
+    # Rows where hashing failed (e.g., not a string) are rejected
+    reasons = pd.Series(np.where(hashed_user_ids.isna(), 'invalid_user_id', ''), index=df.index)
+    reject_rows(df, reasons, file_name, on_reject)
+
+    df = df[reasons == ''].copy()
+    df['user_id'] = hashed_user_ids[reasons == '']
 
     pipeline_logger.info(f"Hashed user_id column for {file_name}.")
     return df
@@ -121,62 +178,337 @@ def create_dummy_files():
 
 # --- 4. MAIN INGESTION PIPELINE ---
 
-def run_ingestion_pipeline():
+def read_in_chunks(file_path, file_type, chunksize=None):
+    """
+    Yields the file as dataframes of about `chunksize` rows (one dataframe if
+    None), typed with the master schema of `file_type`.
+    """
+    yield from FILE_ROUTER.read(file_path, file_type, chunksize)
+
+def stage_file(file_path, file_type, chunksize=None, content_sha256=None):
+    """
+    Validates (and, for session files, hashes) a file chunk by chunk, stages the
+    good rows as Parquet parts of the master dataset and writes the rejected rows
+    to a staging CSV. The commit id is derived from the file's content, so a file
+    that is ingested again replaces its own parts instead of duplicating them.
+    Two files with the same content would share a staging directory, so stage
+    each content at most once at a time; pass `content_sha256` if it is known.
+    Returns (file_type, content_sha256, rejected_path, rows_read, rows_kept, reason_counts, new_hashes);
+    file_type is 'already_ingested' for files whose content is in the ingestion index. `new_hashes` holds the user_id
+    hash-cache entries created for this file, for the writer to persist.
+    """
+    content_sha256 = content_sha256 or file_sha256(file_path)
+    with IngestionIndex(read_only=True) as index:
+        if index.is_ingested(content_sha256):
+            return 'already_ingested', content_sha256, None, 0, 0, {}, None
+
+    STAGING_DIR.mkdir(parents=True, exist_ok=True)
+    commit_id = content_sha256[:16]
+    rejected_path = STAGING_DIR / f"{file_path.name}.rejected.partial"
+    rejected_path.unlink(missing_ok=True)
+
+    hash_cache = get_hash_cache()
+    cache_size = len(hash_cache)
+    validators = {
+        'orders': validate_and_process_order_lines,
+        'sessions': partial(validate_and_process_sessions, hash_cache=hash_cache),
+    }
+    validator = validators[file_type]
+
+    reason_counts = {}
+    def write_rejected(rejected):
+        rejected.to_csv(rejected_path, mode='a', header=not rejected_path.exists(), index=False)
+        for reason, count in rejected['reason_code'].value_counts().items():
+            reason_counts[reason] = reason_counts.get(reason, 0) + int(count)
+
+
+    rows_read = rows_kept = 0
+    for chunk_number, chunk in enumerate(read_in_chunks(file_path, file_type, chunksize)):
+        chunk_name = file_path.name if chunksize is None else f"{file_path.name} [chunk {chunk_number}]"
+        rows_read += len(chunk)
+        processed_df = validator(chunk, chunk_name, on_reject=write_rejected)
+        rows_kept += MasterStore(file_type).stage(processed_df, commit_id, chunk_number)
+
+    rejected_path = rejected_path if reason_counts else None
+    return file_type, content_sha256, rejected_path, rows_read, rows_kept, reason_counts, hash_cache.entries_since(cache_size)
+
+def stage_file_safely(file_path, file_type, chunksize=None, content_sha256=None):
+    """
+    Worker entry point for the process pool. Returns (result, error) instead of
+    raising, so one bad file never stops the results of the others.
+    """
+    try:
+        started = time.perf_counter()
+        result = stage_file(file_path, file_type, chunksize, content_sha256)
+        return result + (time.perf_counter() - started,), None
+    except Exception as e:
+        return None, str(e)
+
+class QuarantineSink:
+    """
+    Collects the rejected rows of one pipeline run into a single quarantine
+    file per file type, data/quarantine/<run_id>_rejected_<type>.csv (or
+    .parquet), with source_file, source_row and reason_code columns in front
+    of the original values. All values are kept as strings, exactly as read.
+    """
+
+    def __init__(self, run_id, file_format='csv', quarantine_dir=QUARANTINE_DIR):
+        if file_format not in ('csv', 'parquet'):
+            raise ValueError(f"Unsupported quarantine format: {file_format}")
+        self.run_id = run_id
+        self.file_format = file_format
+        self.quarantine_dir = Path(quarantine_dir)
+        self.columns = {}
+        self.writers = {}
+        self.reason_counts = {}
+
+    def path_for(self, file_type):
+        return self.quarantine_dir / f"{self.run_id}_rejected_{file_type}.{self.file_format}"
+
+    def commit(self, rejected_path, file_type, reason_counts, chunksize=CHUNK_SIZE):
+        """Appends a staged rejected-row file to the run's quarantine file and removes it."""
+        self.quarantine_dir.mkdir(parents=True, exist_ok=True)
+        path = self.path_for(file_type)
+        for chunk in pd.read_csv(rejected_path, dtype=str, keep_default_na=False, chunksize=chunksize):
+            # Files of the same type can carry different extra columns; align them
+            # with the first file's columns so the quarantine file stays rectangular.
+            columns = self.columns.setdefault(file_type, list(chunk.columns))
+            chunk = chunk.reindex(columns=columns, fill_value='')
+            if self.file_format == 'csv':
+                chunk.to_csv(path, mode='a', header=not path.exists(), index=False)
+            else:
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+                table = pa.Table.from_pandas(chunk, schema=pa.schema([(c, pa.string()) for c in columns]), preserve_index=False)
+                if file_type not in self.writers:
+                    self.writers[file_type] = pq.ParquetWriter(path, table.schema)
+                self.writers[file_type].write_table(table)
+        rejected_path.unlink()
+
+        counts = self.reason_counts.setdefault(file_type, {})
+        for reason, count in reason_counts.items():
+            counts[reason] = counts.get(reason, 0) + count
+
+    def close(self):
+        """Finishes open Parquet files and logs the run's rejection summary."""
+        for writer in self.writers.values():
+            writer.close()
+        self.writers = {}
+        for file_type, counts in self.reason_counts.items():
+            error_logger.warning(f"Run {self.run_id}: quarantined {sum(counts.values())} {file_type} rows to {self.path_for(file_type)} {counts}.")
+
+def drop_duplicate_keys(master_store, index, file_type, commit_id):
+    """
+    Removes staged rows whose primary key is already committed or repeats an
+    earlier row of the same file. Only the key columns are read, and only parts
+    that contain duplicates are rewritten. Returns (kept_keys, duplicate_count).
+    """
+    key_columns = KEY_COLUMNS[file_type]
+    parts = master_store.staged_parts(commit_id)
+    part_keys = [pd.read_parquet(part, columns=key_columns) for part in parts]
+    if not part_keys:
+        return pd.DataFrame(columns=key_columns), 0
+    keys = pd.concat(part_keys, ignore_index=True)
+    duplicate = index.known_keys(file_type, keys)
+    indexable = keys.notna().all(axis=1).to_numpy()
+    duplicate |= indexable & keys.duplicated(keep='first').to_numpy()
+
+    offset = 0
+    for part, part_key_df in zip(parts, part_keys):
+        part_duplicate = duplicate[offset:offset + len(part_key_df)]
+        if part_duplicate.any():
+            master_store.filter_staged_part(part, ~part_duplicate)
+        offset += len(part_key_df)
+    return keys[~duplicate], int(duplicate.sum())
+
+def import_legacy_masters(master_stores, index):
+    """
+    Imports each pre-partitioning master CSV (data/master_orders.csv, ...) once:
+    its rows are committed like an ingested file and its keys recorded in the
+    index, so files ingested later are deduplicated against that history.
+    """
+    for file_type, master_store in master_stores.items():
+        legacy_csv = master_store.legacy_csv
+        if legacy_csv is None or not legacy_csv.exists():
+            continue
+        content_sha256 = file_sha256(legacy_csv)
+        if index.is_ingested(content_sha256):
+            continue
+        commit_id = content_sha256[:16]
+        master_store.stage(master_store.read_legacy_csv(), commit_id)
+        kept_keys, duplicate_count = drop_duplicate_keys(master_store, index, file_type, commit_id)
+        rows_committed = master_store.commit(commit_id, source=legacy_csv.name)
+        index.record(content_sha256, legacy_csv.name, file_type, commit_id, rows_committed, kept_keys)
+        pipeline_logger.info(f"Imported {rows_committed} rows of {legacy_csv} into {master_store.root} (commit {commit_id}, {duplicate_count} duplicate keys dropped).")
+
+def run_ingestion_pipeline(chunksize=None, max_workers=None, quarantine_format='csv', files=None, outcomes=None):
     """
     Main function to run the ingestion pipeline.
-    Scans /data/new, validates files, appends to master tables, and moves processed files.
+    Scans /data/new, validates files, commits them to the partitioned master tables, and moves processed files.
+    With `chunksize`, each file is read, validated and staged in chunks of that many rows.
+    Files are parsed, validated and hashed in parallel across `max_workers`
+    processes (all cores by default); the main process is the only writer and
+    commits them to the master tables in file-name order.
+    Rejected rows go to one quarantine file per run and file type, written as
+    'csv' or 'parquet' according to `quarantine_format`.
+    `files` restricts the run to the given files instead of everything in /data/new.
+    `outcomes`, if given, is a dict that receives each file's outcome ('committed',
+    'skipped' or 'failed') as soon as it is known, so a caller can tell which
+    files were handled even if the run raises. Files that vanish before they are
+    read get no outcome.
+    Returns counts of files committed, skipped and failed and of rows committed.
     """
     pipeline_logger.info("--- Starting Ingestion Pipeline Run ---")
     
     new_files_path = Path("data/new")
     processed_files_path = Path("data/processed")
     
-    # Define master table paths
-    master_orders_file = Path("data/master_orders.csv")
-    master_sessions_file = Path("data/master_sessions.csv")
+    # Partitioned Parquet master tables (see master_store.py)
+    master_stores = {name: MasterStore(name) for name in ('orders', 'sessions')}
     
-    files_to_process = list(new_files_path.glob('*.csv'))
+    if files is None:
+        files = [path for path in new_files_path.iterdir() if path.suffix in INGESTIBLE_SUFFIXES]
+    files_to_process = sorted(map(Path, files))
+    stats = {'committed': 0, 'skipped': 0, 'failed': 0, 'rows': 0}
+    outcomes = {} if outcomes is None else outcomes
+    def settle(file_path, outcome):
+        stats[outcome] += 1
+        outcomes[file_path] = outcome
+
+    # Drop anything staged or half-committed by an interrupted run, then bring
+    # in the single-CSV master tables from before partitioning (first run only).
+    for store in master_stores.values():
+        store.recover()
+    with IngestionIndex() as index:
+        import_legacy_masters(master_stores, index)
     
     if not files_to_process:
         pipeline_logger.info("No new files found in data/new.")
-        return
+        return stats
 
+    # Route each file by its header or Parquet schema. Unrecognized files are
+    # quarantined as they are, without being read.
+    file_types, content_hashes = {}, {}
     for file_path in files_to_process:
         try:
-            df = pd.read_csv(file_path)
-            
-            # Try to validate as order-line file
-            processed_df = validate_and_process_order_lines(df, file_path.name)
-            if processed_df is not None:
-                # Append rows to the relevant master table
-                header = not master_orders_file.exists()
-                processed_df.to_csv(master_orders_file, mode='a', header=header, index=False)
-                pipeline_logger.info(f"Appended {len(processed_df)} rows to {master_orders_file}.")
-                shutil.move(file_path, processed_files_path / file_path.name)
-                pipeline_logger.info(f"Moved processed file to {processed_files_path / file_path.name}")
-                continue # Move to next file
-
-            # Try to validate as session-level file
-            processed_df = validate_and_process_sessions(df, file_path.name)
-            if processed_df is not None:
-                header = not master_sessions_file.exists()
-                processed_df.to_csv(master_sessions_file, mode='a', header=header, index=False)
-                pipeline_logger.info(f"Appended {len(processed_df)} rows to {master_sessions_file}.")
+            file_type = FILE_ROUTER.classify(file_path)
+            if file_type is None:
+                target = FILE_ROUTER.quarantine(file_path)
+                error_logger.warning(f"Unrecognized schema for file {file_path.name}. Quarantined to {target}.")
+                settle(file_path, 'skipped')
+            else:
+                content_hashes[file_path] = file_sha256(file_path)
+                file_types[file_path] = file_type
+        except FileNotFoundError:
+            # Removed from the drop folder after it was listed; nothing to ingest.
+            pipeline_logger.warning(f"Skipped {file_path.name}: it no longer exists.")
+    files_to_process = list(file_types)
+    if not files_to_process:
+        pipeline_logger.info("--- Finished Ingestion Pipeline Run ---")
+        return stats
+    # Files with the same content share a commit id and so a staging directory.
+    # Only the first of them is staged; its copies follow its outcome below.
+    first_with_content = {}
+    for file_path in files_to_process:
+        first_with_content.setdefault(content_hashes[file_path], file_path)
+    files_to_stage = list(first_with_content.values())
+    stage_args = ([file_types[path] for path in files_to_stage], repeat(chunksize),
+                  [content_hashes[path] for path in files_to_stage])
+
+    # File manifest and primary-key index; this process is its only writer.
+    index = IngestionIndex()
+    quarantine = QuarantineSink(datetime.now().strftime('%Y%m%dT%H%M%S'), quarantine_format)
+    # Loaded before the pool starts, so forked workers inherit it instead of
+    # reading it from disk again. Workers send back only the entries they add.
+    hash_cache = get_hash_cache()
+
+    if len(files_to_stage) == 1 or max_workers == 1:
+        staged_results = map(stage_file_safely, files_to_stage, *stage_args)
+        pool = None
+    else:
+        pool = ProcessPoolExecutor(max_workers=max_workers)
+        # map() yields results in submission order, so commits stay deterministic
+        # even when later files finish staging first.
+        staged_results = pool.map(stage_file_safely, files_to_stage, *stage_args)
+        pipeline_logger.info(f"Staging {len(files_to_stage)} files across {max_workers or os.cpu_count()} worker processes.")
+
+    try:
+        for file_path in files_to_process:
+            content_sha256 = content_hashes[file_path]
+            original = first_with_content[content_sha256]
+            if original != file_path:
+                # A copy of a file earlier in this run: done if that file was ingested,
+                # otherwise left in place to be retried with it.
+                if not index.is_ingested(content_sha256):
+                    settle(file_path, 'failed')
+                    error_logger.error(f"Failed to process {file_path.name}: {original.name}, which has the same content, was not ingested.")
+                    continue
+                try:
+                    shutil.move(file_path, processed_files_path / file_path.name)
+                except OSError as e:
+                    settle(file_path, 'failed')
+                    error_logger.error(f"Failed to move {file_path.name}: {e}")
+                    continue
+                pipeline_logger.info(f"Skipped {file_path.name}: same content as {original.name}.")
+                settle(file_path, 'skipped')
+                continue
+
+            result, error = next(staged_results)
+            if error is not None:
+                settle(file_path, 'failed')
+                error_logger.error(f"Failed to process {file_path.name}: {error}")
+                # Optionally move failed files to an 'error' directory instead
+                # shutil.move(file_path, processed_files_path / 'error' / file_path.name)
+                continue
+
+            file_type, content_sha256, rejected_path, rows_read, rows_kept, reason_counts, new_hashes, staging_seconds = result
+            if new_hashes is not None:
+                hash_cache.add(*new_hashes)
+            try:
+                commit_id = content_sha256[:16]
+                if file_type == 'already_ingested' or index.is_ingested(content_sha256):
+                    # Same content as a committed file (possibly earlier in this run).
+                    if file_type in master_stores:
+                        master_stores[file_type].discard(commit_id)
+                    if rejected_path is not None:
+                        rejected_path.unlink(missing_ok=True)
+                    pipeline_logger.info(f"Skipped {file_path.name}: its content was already ingested.")
+                    shutil.move(file_path, processed_files_path / file_path.name)
+                    settle(file_path, 'skipped')
+                    continue
+
+                # Commit rows to the relevant master table, then record the file and
+                # its keys in the index in one transaction. If the run stops in
+                # between, the file is ingested again and replaces its own parts.
+                # The source file is only moved once all of this has happened.
+                master_store = master_stores[file_type]
+                kept_keys, duplicate_count = drop_duplicate_keys(master_store, index, file_type, commit_id)
+                if duplicate_count:
+                    error_logger.warning(f"Dropped {duplicate_count} rows with duplicate primary keys from {file_path.name}.")
+                rows_committed = master_store.commit(commit_id, source=file_path.name)
+                index.record(content_sha256, file_path.name, file_type, commit_id, rows_committed, kept_keys)
+                pipeline_logger.info(f"Committed {rows_committed} rows to {master_store.root} (commit {commit_id}).")
+                if rejected_path is not None:
+                    quarantine.commit(rejected_path, file_type, reason_counts)
+                    error_logger.warning(f"Rejected {sum(reason_counts.values())} of {rows_read} rows in {file_path.name}: {reason_counts}.")
                 shutil.move(file_path, processed_files_path / file_path.name)
                 pipeline_logger.info(f"Moved processed file to {processed_files_path / file_path.name}")
-                continue # Move to next file
-            
-            # If neither, log as unrecognized
-            error_logger.warning(f"Unrecognized schema for file {file_path.name}. Moving to processed without action.")
-            shutil.move(file_path, processed_files_path / file_path.name)
-
-        except Exception as e:
-            error_logger.error(f"Failed to process {file_path.name}: {e}")
-            # Optionally move failed files to an 'error' directory instead
-            # shutil.move(file_path, processed_files_path / 'error' / file_path.name)
+                pipeline_logger.info(f"Ingested {file_path.name}: {rows_read} rows staged in {staging_seconds:.2f}s ({rows_read / max(staging_seconds, 1e-9):,.0f} rows/sec).")
+                settle(file_path, 'committed')
+                stats['rows'] += rows_committed
 
+            except Exception as e:
+                settle(file_path, 'failed')
+                error_logger.error(f"Failed to commit {file_path.name}: {e}")
+    finally:
+        if pool is not None:
+            pool.shutdown()
+        quarantine.close()
+        hash_cache.save()
+        index.close()
 
     pipeline_logger.info("--- Finished Ingestion Pipeline Run ---")
+    return stats
 
 
 if __name__ == '__main__':
@@ -187,9 +519,10 @@ if __name__ == '__main__':
     create_dummy_files()
     
     print("Running ingestion pipeline...")
-    run_ingestion_pipeline()
+    run_ingestion_pipeline(chunksize=CHUNK_SIZE)
     
     print("\nPipeline run complete.")
-    print("Check 'logs/pipeline.log' for actions and 'logs/data_errors.log' for skipped rows.")
+    print("Check 'logs/pipeline.log' for actions and 'logs/data_errors.log' for a summary of skipped rows.")
+    print("Rejected rows, with a reason code, are in 'data/quarantine/'.")
     print("Processed files have been moved to 'data/processed/'.")
-    print("Master data updated in 'data/master_orders.csv' and 'data/master_sessions.csv'.")
\ No newline at end of file
+    print("Master data updated in 'data/master_orders/' and 'data/master_sessions/' (partitioned by date).")
\ No newline at end of file
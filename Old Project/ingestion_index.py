@@ -0,0 +1,119 @@
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+# --- INGESTION INDEX ---
+# A small SQLite database next to the master tables that makes ingestion
+# idempotent without rescanning history:
+#   files         one row per ingested file, keyed by the SHA-256 of its content
+#   order_keys    (order_id, sku) of every committed order line
+#   session_keys  session_id of every committed session
+# The key tables are WITHOUT ROWID tables, i.e. stored as a single B-tree on the
+# primary key, so a membership check is one index probe.
+INDEX_PATH = Path("data/ingestion_index.sqlite")
+KEY_COLUMNS = {
+    'orders': ['order_id', 'sku'],
+    'sessions': ['session_id'],
+}
+_KEY_TABLES = {'orders': 'order_keys', 'sessions': 'session_keys'}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    sha256 TEXT PRIMARY KEY,
+    file_name TEXT NOT NULL,
+    file_type TEXT NOT NULL,
+    commit_id TEXT NOT NULL,
+    rows INTEGER NOT NULL,
+    ingested_at TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS order_keys (
+    order_id TEXT NOT NULL,
+    sku TEXT NOT NULL,
+    PRIMARY KEY (order_id, sku)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS session_keys (
+    session_id TEXT NOT NULL PRIMARY KEY
+) WITHOUT ROWID;
+"""
+
+
+class IngestionIndex:
+    """
+    File manifest and primary-key index. Open it with `read_only=True` from
+    worker processes; only the single writer should record ingested files.
+    """
+
+    def __init__(self, path=INDEX_PATH, read_only=False):
+        self.path = Path(path)
+        if read_only:
+            if not self.path.exists():
+                self.conn = None
+                return
+            self.conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+        else:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.conn = sqlite3.connect(self.path)
+            # WAL lets workers read while the writer commits.
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.executescript(_SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+
+    def is_ingested(self, sha256):
+        """True if a file with this content has already been committed."""
+        if self.conn is None:
+            return False
+        return self.conn.execute("SELECT 1 FROM files WHERE sha256 = ?", (sha256,)).fetchone() is not None
+
+    def known_keys(self, file_type, keys):
+        """
+        Boolean mask over the rows of `keys` (a dataframe of the key columns)
+        marking keys that are already committed. Rows with a null key are never
+        considered known.
+        """
+        known = np.zeros(len(keys), dtype=bool)
+        if self.conn is None or keys.empty:
+            return known
+        columns = KEY_COLUMNS[file_type]
+        indexable = keys[columns].notna().all(axis=1).to_numpy()
+        rows = keys.loc[indexable, columns].astype(str).itertuples(index=False, name=None)
+
+        probe = f"probe_{_KEY_TABLES[file_type]}"
+        self.conn.execute(f"CREATE TEMP TABLE IF NOT EXISTS {probe} (pos INTEGER, {', '.join(columns)})")
+        self.conn.execute(f"DELETE FROM {probe}")
+        positions = np.flatnonzero(indexable).tolist()
+        self.conn.executemany(
+            f"INSERT INTO {probe} VALUES (?, {', '.join('?' * len(columns))})",
+            ((pos, *row) for pos, row in zip(positions, rows)),
+        )
+        matches = self.conn.execute(
+            f"SELECT {probe}.pos FROM {probe} JOIN {_KEY_TABLES[file_type]} USING ({', '.join(columns)})"
+        ).fetchall()
+        self.conn.execute(f"DELETE FROM {probe}")
+        self.conn.commit()
+        known[[pos for (pos,) in matches]] = True
+        return known
+
+    def record(self, sha256, file_name, file_type, commit_id, rows, keys):
+        """Records a committed file and its keys in one transaction."""
+        columns = KEY_COLUMNS[file_type]
+        key_rows = keys[columns].dropna().astype(str).itertuples(index=False, name=None)
+        with self.conn:
+            self.conn.executemany(
+                f"INSERT OR IGNORE INTO {_KEY_TABLES[file_type]} VALUES ({', '.join('?' * len(columns))})",
+                key_rows,
+            )
+            self.conn.execute(
+                "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?)",
+                (sha256, file_name, file_type, commit_id, int(rows), datetime.now().isoformat(timespec='seconds')),
+            )
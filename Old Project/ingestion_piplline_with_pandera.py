@@ -1,11 +1,16 @@
 import os
 import pandas as pd
-import hashlib
 import logging
 import shutil
 from pathlib import Path
 import pandera as pa
-from pandera.errors import SchemaError
+from pandera.errors import SchemaError, SchemaErrors
+
+from master_store import MasterStore, file_content_id
+from schema_validation import compile_schema
+from file_router import INGESTIBLE_SUFFIXES, FileRouter
+from typed_csv import CsvSpec
+from user_hashing import HashCache, hash_user_ids
 
 # --- 1. LOGGING CONFIGURATION ---
 Path("logs").mkdir(exist_ok=True)
@@ -51,6 +56,17 @@ session_schema = pa.DataFrameSchema(
     ordered=False
 )
 
+# Routes files by their header (or Parquet schema) and reads them typed by the
+# schemas above: only schema columns are read, with their types and dates parsed
+# by the (multi-threaded) pyarrow CSV reader.
+FILE_ROUTER = FileRouter({'orders': CsvSpec.from_pandera(order_schema), 'sessions': CsvSpec.from_pandera(session_schema)})
+
+# Vectorized validators derived from the schemas above (see schema_validation.py).
+COMPILED_SCHEMAS = {id(schema): compile_schema(schema) for schema in (order_schema, session_schema)}
+# Also log pandera's row-by-row failure cases. Off by default: building them is
+# slow on large files, and the per-check counts are usually enough.
+DETAILED_FAILURE_REPORT = False
+
 # --- 3. CORE FUNCTIONS ---
 def setup_project_structure():
     """Creates the necessary directories for the pipeline."""
@@ -58,47 +74,37 @@ def setup_project_structure():
     Path("data/processed").mkdir(parents=True, exist_ok=True)
     pipeline_logger.info("Project directories ensured to exist.")
 
-def hash_user_id(email):
-    """Hashes an email using SHA-256 for privacy."""
-    if not isinstance(email, str):
-        return None
-    return hashlib.sha256(email.encode('utf-8')).hexdigest()
-
-def validate_and_process_data(df, schema, file_name, is_session_file=False):
+def validate_and_process_data(df, schema, file_name, is_session_file=False, hash_cache=None, detailed_report=DETAILED_FAILURE_REPORT):
     """
     Validates a dataframe using a Pandera schema, logs errors, and returns valid rows.
+    Rows are checked by the compiled validator; invalid rows are dropped with its
+    per-row mask and logged as per-check counts. With `detailed_report`, pandera's
+    (much slower) failure-case report is logged as well.
+    For session files, user_id is hashed once per distinct email, using `hash_cache`.
     """
     initial_rows = len(df)
-    try:
-        # Validate the dataframe, collecting all errors
-        validated_df = schema.validate(df, lazy=True)
+    compiled = COMPILED_SCHEMAS.get(id(schema)) or compile_schema(schema)
+    result = compiled.validate(df)
+    if result.all_valid:
         pipeline_logger.info(f"Validation successful for {file_name}. All {initial_rows} rows are valid.")
-        
-        if is_session_file:
-            validated_df['user_id'] = validated_df['user_id'].apply(hash_user_id)
-            pipeline_logger.info(f"Hashed user_id column for {file_name}.")
-        
-        return validated_df
+    else:
+        error_logger.warning(f"Schema validation failed for {file_name}: {result.summary()}.")
+        if detailed_report:
+            try:
+                schema.validate(df, lazy=True)
+            except (SchemaError, SchemaErrors) as err:
+                error_logger.warning(f"Failure cases for {file_name}:\n{err.failure_cases.to_string()}")
 
-    except SchemaError as err:
-        error_logger.warning(f"Schema validation failed for {file_name} with {len(err.failure_cases)} failure cases.")
-        
-        # Log the specific failures
-        error_logger.warning(f"Failure cases for {file_name}:\n{err.failure_cases.to_string()}")
-        
-        # Get the indexes of the rows that failed validation
-        failed_indexes = err.failure_cases['index']
+    # Keep only the rows that did NOT fail
+    validated_df = result.valid_rows()
+    if not result.all_valid:
+        pipeline_logger.info(f"Kept {len(validated_df)}/{initial_rows} valid rows from {file_name}.")
         
-        # Keep only the rows that did NOT fail
-        good_rows_df = df.drop(index=failed_indexes).copy()
+    if is_session_file and not validated_df.empty:
+        validated_df['user_id'] = hash_user_ids(validated_df['user_id'], hash_cache)
+        pipeline_logger.info(f"Hashed user_id column for {file_name}.")
         
-        pipeline_logger.info(f"Kept {len(good_rows_df)}/{initial_rows} valid rows from {file_name}.")
-        
-        if is_session_file and not good_rows_df.empty:
-            good_rows_df['user_id'] = good_rows_df['user_id'].apply(hash_user_id)
-            pipeline_logger.info(f"Hashed user_id column for valid rows in {file_name}.")
-            
-        return good_rows_df
+    return validated_df
 
 # --- 4. DUMMY DATA CREATION ---
 def create_dummy_files():
@@ -135,41 +141,53 @@ def run_ingestion_pipeline():
     
     new_files_path = Path("data/new")
     processed_files_path = Path("data/processed")
-    master_orders_file = Path("data/master_orders.csv")
-    master_sessions_file = Path("data/master_sessions.csv")
+    master_orders = MasterStore('orders')
+    master_sessions = MasterStore('sessions')
     
-    files_to_process = list(new_files_path.glob('*.csv'))
+    master_orders.recover()
+    master_sessions.recover()
+    # First run on an empty store: import the single-CSV master table from before partitioning.
+    for store in (master_orders, master_sessions):
+        legacy_df = store.read_legacy_csv() if not store.commit_records() else None
+        if legacy_df is not None:
+            store.write(legacy_df, file_content_id(store.legacy_csv), source=store.legacy_csv.name)
+            pipeline_logger.info(f"Imported {len(legacy_df)} rows of {store.legacy_csv} into {store.root}.")
+
+    files_to_process = sorted(path for path in new_files_path.iterdir() if path.suffix in INGESTIBLE_SUFFIXES)
     
     if not files_to_process:
         pipeline_logger.info("No new files found in data/new.")
         return
-
+    hash_cache = HashCache.load()
     for file_path in files_to_process:
         try:
-            df = pd.read_csv(file_path)
-            
-            # Identify file type based on columns
-            if 'order_id' in df.columns:
+            # Identify file type from the header or Parquet schema; unrecognized
+            # files are quarantined without being read.
+            file_type = FILE_ROUTER.classify(file_path)
+            if file_type is None:
+                target = FILE_ROUTER.quarantine(file_path)
+                error_logger.warning(f"Unrecognized schema for file {file_path.name}. Quarantined to {target}.")
+                continue
+
+            df = next(FILE_ROUTER.read(file_path, file_type))
+            if file_type == 'orders':
                 processed_df = validate_and_process_data(df, order_schema, file_path.name)
                 if not processed_df.empty:
-                    header = not master_orders_file.exists()
-                    processed_df.to_csv(master_orders_file, mode='a', header=header, index=False)
-                    pipeline_logger.info(f"Appended {len(processed_df)} rows to {master_orders_file}.")
-            elif 'session_id' in df.columns:
-                processed_df = validate_and_process_data(df, session_schema, file_path.name, is_session_file=True)
-                if not processed_df.empty:
-                    header = not master_sessions_file.exists()
-                    processed_df.to_csv(master_sessions_file, mode='a', header=header, index=False)
-                    pipeline_logger.info(f"Appended {len(processed_df)} rows to {master_sessions_file}.")
+                    master_orders.write(processed_df, file_content_id(file_path), source=file_path.name)
+                    pipeline_logger.info(f"Committed {len(processed_df)} rows to {master_orders.root}.")
             else:
-                error_logger.warning(f"Unrecognized schema for file {file_path.name}. Moving to processed without action.")
-            
+                processed_df = validate_and_process_data(df, session_schema, file_path.name, is_session_file=True, hash_cache=hash_cache)
+                if not processed_df.empty:
+                    master_sessions.write(processed_df, file_content_id(file_path), source=file_path.name)
+                    pipeline_logger.info(f"Committed {len(processed_df)} rows to {master_sessions.root}.")
+
             shutil.move(file_path, processed_files_path / file_path.name)
             pipeline_logger.info(f"Moved processed file to {processed_files_path / file_path.name}")
 
         except Exception as e:
             error_logger.error(f"Failed to process {file_path.name}: {e}")
 
+    hash_cache.save()
     pipeline_logger.info("--- Finished Ingestion Pipeline Run ---")
 
 if __name__ == '__main__':
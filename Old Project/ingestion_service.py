@@ -0,0 +1,227 @@
+import argparse
+import json
+import os
+import signal
+import time
+from collections import deque
+from pathlib import Path
+
+from file_router import INGESTIBLE_SUFFIXES
+from ingestion import CHUNK_SIZE, pipeline_logger, run_ingestion_pipeline, setup_project_structure
+
+# --- INGESTION SERVICE ---
+# Long-running alternative to running ingestion.py from cron. The service polls
+# the drop folder, waits until each file has stopped changing, and ingests ready
+# files in batches through run_ingestion_pipeline (one pipeline run per batch,
+# so small files share one worker pool, quarantine file and hash-cache save).
+#
+# Backpressure: at most MAX_QUEUED_FILES ready files are admitted at a time. While
+# the queue is full, the rest stay untouched in the drop folder and a
+# `.backpressure` marker file is written there, so producers can slow down.
+DROP_DIR = Path("data/new")
+METRICS_PATH = Path("logs/ingestion_metrics.json")
+BACKPRESSURE_MARKER = ".backpressure"
+POLL_INTERVAL = 1.0         # seconds between directory scans
+SETTLE_SECONDS = 2.0        # a file is ready once its size and mtime are unchanged this long
+BATCH_WAIT_SECONDS = 2.0    # how long the oldest ready file may wait for others to join its batch
+MAX_BATCH_FILES = 50
+MAX_BATCH_BYTES = 512 * 1024 * 1024
+MAX_QUEUED_FILES = 500
+LATENCY_WINDOW = 1000       # recent files used for the latency percentiles
+
+
+class IngestionService:
+    """Polls the drop folder and ingests settled files in batches."""
+
+    def __init__(self, drop_dir=DROP_DIR, metrics_path=METRICS_PATH, poll_interval=POLL_INTERVAL,
+                 settle_seconds=SETTLE_SECONDS, batch_wait_seconds=BATCH_WAIT_SECONDS,
+                 max_batch_files=MAX_BATCH_FILES, max_batch_bytes=MAX_BATCH_BYTES,
+                 max_queued_files=MAX_QUEUED_FILES, chunksize=CHUNK_SIZE, max_workers=None):
+        self.drop_dir = Path(drop_dir)
+        self.metrics_path = Path(metrics_path)
+        self.poll_interval = poll_interval
+        self.settle_seconds = settle_seconds
+        self.batch_wait_seconds = batch_wait_seconds
+        self.max_batch_files = max_batch_files
+        self.max_batch_bytes = max_batch_bytes
+        self.max_queued_files = max_queued_files
+        self.chunksize = chunksize
+        self.max_workers = max_workers
+
+        self.seen = {}      # path -> (size, mtime_ns, first_seen, last_change)
+        self.queue = {}     # path -> (size, first_seen, ready_at), in admission order
+        self.failed = {}    # path -> (size, mtime_ns) of files left in place by a failed run
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.totals = {'batches': 0, 'files_committed': 0, 'files_skipped': 0, 'files_failed': 0, 'rows_committed': 0}
+        self.last_batch = None
+        self.backpressure = False
+        self.stopping = False
+
+    def stop(self, *_):
+        """Finishes the current batch and exits the loop."""
+        self.stopping = True
+
+    def scan(self, now):
+        """Tracks size/mtime of every CSV/Parquet file in the drop folder and admits settled files to the queue."""
+        current = {}
+        with os.scandir(self.drop_dir) as entries:
+            for entry in entries:
+                if entry.is_file() and entry.name.endswith(INGESTIBLE_SUFFIXES):
+                    stat = entry.stat()
+                    current[Path(entry.path)] = (stat.st_size, stat.st_mtime_ns)
+
+        for path in list(self.seen):
+            if path not in current:
+                del self.seen[path]
+                self.queue.pop(path, None)
+                self.failed.pop(path, None)
+        for path, (size, mtime_ns) in current.items():
+            previous = self.seen.get(path)
+            if self.failed.get(path, (size, mtime_ns)) != (size, mtime_ns):
+                del self.failed[path]  # Replaced by the producer; try it again.
+            if previous is None:
+                self.seen[path] = (size, mtime_ns, now, now)
+            elif previous[:2] != (size, mtime_ns):
+                # Still being written; restart its settle timer.
+                self.seen[path] = (size, mtime_ns, previous[2], now)
+                self.queue.pop(path, None)
+
+        settled = sorted(
+            (path for path, (_, _, _, last_change) in self.seen.items()
+             if path not in self.queue and path not in self.failed and now - last_change >= self.settle_seconds),
+            key=lambda path: self.seen[path][2],
+        )
+        room = self.max_queued_files - len(self.queue)
+        for path in settled[:max(room, 0)]:
+            size, _, first_seen, _ = self.seen[path]
+            self.queue[path] = (size, first_seen, now)
+        self.set_backpressure(len(settled) > room)
+
+    def set_backpressure(self, active):
+        marker = self.drop_dir / BACKPRESSURE_MARKER
+        if active and not self.backpressure:
+            marker.write_text(f"queue full ({self.max_queued_files} files); pause uploads\n")
+            pipeline_logger.warning(f"Ingestion queue is full ({len(self.queue)} files); applying backpressure.")
+        elif not active and self.backpressure:
+            marker.unlink(missing_ok=True)
+            pipeline_logger.info("Ingestion queue has room again; backpressure released.")
+        self.backpressure = active
+
+    def next_batch(self, now):
+        """
+        The oldest queued files, up to the batch limits. A batch is released once
+        it is full or its oldest file has waited `batch_wait_seconds`.
+        """
+        if not self.queue:
+            return []
+        batch, batch_bytes, batch_full = [], 0, False
+        for path, (size, _, _) in self.queue.items():
+            if batch and batch_bytes + size > self.max_batch_bytes:
+                batch_full = True
+                break
+            batch.append(path)
+            batch_bytes += size
+            if len(batch) >= self.max_batch_files or batch_bytes >= self.max_batch_bytes:
+                batch_full = True
+                break
+        oldest_ready_at = self.queue[batch[0]][2]
+        return batch if batch_full or now - oldest_ready_at >= self.batch_wait_seconds else []
+
+    def ingest(self, batch):
+        started = time.monotonic()
+        outcomes = {}
+        try:
+            stats = run_ingestion_pipeline(chunksize=self.chunksize, max_workers=self.max_workers, files=batch,
+                                           outcomes=outcomes)
+        except Exception as e:
+            # Keep the service running; only the files the run reached count as handled.
+            pipeline_logger.exception(f"Service batch of {len(batch)} files failed: {e}")
+            stats = {'committed': 0, 'skipped': 0, 'failed': 0, 'rows': 0}
+            for outcome in outcomes.values():
+                stats[outcome] += 1
+        finished = time.monotonic()
+
+        for path in batch:
+            outcome = outcomes.get(path)
+            if outcome == 'failed':
+                # Left in place after an error; retried only once the file changes.
+                self.queue.pop(path)
+                self.failed[path] = self.seen[path][:2]
+            elif outcome is not None or not path.exists():
+                # Committed or skipped (moved out of the drop folder), or vanished
+                # before the run read it; only the former count towards latency.
+                _, first_seen, _ = self.queue.pop(path)
+                if outcome is not None:
+                    self.latencies.append(finished - first_seen)
+                self.seen.pop(path, None)
+            else:
+                # Never reached because the run stopped early; keep it queued for
+                # the next batch, which starts a fresh batch wait.
+                size, first_seen, _ = self.queue[path]
+                self.queue[path] = (size, first_seen, finished)
+        self.totals['batches'] += 1
+        self.totals['files_committed'] += stats['committed']
+        self.totals['files_skipped'] += stats['skipped']
+        self.totals['files_failed'] += stats['failed']
+        self.totals['rows_committed'] += stats['rows']
+        self.last_batch = {'files': len(batch), 'rows': stats['rows'], 'seconds': round(finished - started, 3)}
+        pipeline_logger.info(
+            f"Service batch: {len(batch)} files, {stats['rows']} rows in {finished - started:.2f}s; "
+            f"{len(self.queue)} files still queued."
+        )
+
+    def metrics(self):
+        latencies = sorted(self.latencies)
+        def percentile(q):
+            return round(latencies[min(int(q * len(latencies)), len(latencies) - 1)], 3) if latencies else None
+        return {
+            'updated_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'queue_depth': len(self.queue),
+            'files_settling': len(self.seen) - len(self.queue) - len(self.failed),
+            'files_failed_waiting': len(self.failed),
+            'backpressure': self.backpressure,
+            'latency_seconds': {'p50': percentile(0.5), 'p95': percentile(0.95), 'max': latencies[-1] if latencies else None},
+            'last_batch': self.last_batch,
+            **self.totals,
+        }
+
+    def write_metrics(self):
+        self.metrics_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.metrics_path.with_suffix('.json.tmp')
+        tmp_path.write_text(json.dumps(self.metrics(), indent=2))
+        tmp_path.replace(self.metrics_path)
+
+    def run(self):
+        pipeline_logger.info(f"Ingestion service watching {self.drop_dir} (poll every {self.poll_interval}s).")
+        while not self.stopping:
+            now = time.monotonic()
+            self.scan(now)
+            batch = self.next_batch(now)
+            if batch:
+                self.ingest(batch)
+            self.write_metrics()
+            if not batch:
+                time.sleep(self.poll_interval)
+        self.set_backpressure(False)
+        pipeline_logger.info("Ingestion service stopped.")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Watch data/new and ingest files as they arrive.")
+    parser.add_argument("--poll-interval", type=float, default=POLL_INTERVAL)
+    parser.add_argument("--settle-seconds", type=float, default=SETTLE_SECONDS)
+    parser.add_argument("--batch-wait", type=float, default=BATCH_WAIT_SECONDS)
+    parser.add_argument("--max-batch-files", type=int, default=MAX_BATCH_FILES)
+    parser.add_argument("--max-queued-files", type=int, default=MAX_QUEUED_FILES)
+    parser.add_argument("--max-workers", type=int, default=None)
+    args = parser.parse_args()
+
+    setup_project_structure()
+    service = IngestionService(
+        poll_interval=args.poll_interval, settle_seconds=args.settle_seconds, batch_wait_seconds=args.batch_wait,
+        max_batch_files=args.max_batch_files, max_queued_files=args.max_queued_files, max_workers=args.max_workers,
+    )
+    signal.signal(signal.SIGINT, service.stop)
+    signal.signal(signal.SIGTERM, service.stop)
+    print(f"Watching {DROP_DIR}/ for new files. Metrics: {METRICS_PATH}. Press Ctrl+C to stop.")
+    service.run()
@@ -0,0 +1,233 @@
+import hashlib
+import json
+import shutil
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+# --- MASTER TABLE STORE ---
+# The master tables are date-partitioned Parquet datasets:
+#
+#   data/master_sessions/date=2025-07-02/part-<commit_id>-00000.parquet
+#   data/master_sessions/_commits/<commit_id>.json
+#
+# Writers stage part files under _staging/<commit_id>/, rename them into their
+# partitions and then write the commit record. Readers only read parts listed in
+# a commit record, so a crash mid-commit never exposes partial data. Every part
+# is written with the dataset's fixed schema, so a feed whose columns drift
+# fails loudly instead of silently changing the table.
+#
+# Before partitioning, each master table was a single CSV (`legacy_csv`). The
+# ingestion scripts import it once, as an ordinary commit; see read_legacy_csv().
+MASTER_DATASETS = {
+    'orders': {
+        'path': Path("data/master_orders"),
+        'legacy_csv': Path("data/master_orders.csv"),
+        'date_column': 'order_datetime',
+        'schema': pa.schema([
+            ('order_id', pa.string()),
+            ('customer_id', pa.string()),
+            ('order_datetime', pa.timestamp('ns')),
+            ('sku', pa.string()),
+            ('qty', pa.int64()),
+            ('unit_price', pa.float64()),
+            ('discount', pa.float64()),
+        ]),
+    },
+    'sessions': {
+        'path': Path("data/master_sessions"),
+        'legacy_csv': Path("data/master_sessions.csv"),
+        'date_column': 'session_start',
+        'schema': pa.schema([
+            ('user_id', pa.string()),
+            ('session_id', pa.string()),
+            ('session_start', pa.timestamp('ns')),
+            ('source', pa.string()),
+            ('medium', pa.string()),
+            ('campaign', pa.string()),
+        ]),
+    },
+}
+# Partition for rows whose date could not be parsed (Hive's convention).
+NULL_PARTITION = "__HIVE_DEFAULT_PARTITION__"
+COMMITS_DIR = "_commits"
+STAGING_DIR = "_staging"
+HASH_BLOCK_SIZE = 1 << 20
+
+
+def file_sha256(file_path):
+    """SHA-256 hex digest of a file's content, read in blocks."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def file_content_id(file_path):
+    """First 16 hex digits of a file's SHA-256, used as the commit id for its rows."""
+    return file_sha256(file_path)[:16]
+
+
+class MasterStore:
+    """Writer and reader for one partitioned master dataset ('orders' or 'sessions')."""
+
+    def __init__(self, name, root=None):
+        spec = MASTER_DATASETS[name]
+        self.name = name
+        self.root = Path(root) if root is not None else spec['path']
+        # Only the default store has a pre-partitioning CSV to import.
+        self.legacy_csv = spec['legacy_csv'] if root is None else None
+        self.date_column = spec['date_column']
+        self.schema = spec['schema']
+
+    # --- Writing ---
+
+    def conform(self, df):
+        """
+        Casts a dataframe to the dataset schema. Extra columns are dropped;
+        missing columns or values that do not fit their type raise ValueError.
+        """
+        missing = [name for name in self.schema.names if name not in df.columns]
+        if missing:
+            raise ValueError(f"{self.name} data is missing columns {missing}")
+        df = df[self.schema.names].copy()
+        for field in self.schema:
+            if pa.types.is_timestamp(field.type):
+                df[field.name] = pd.to_datetime(df[field.name], errors='coerce')
+            elif pa.types.is_string(field.type):
+                df[field.name] = df[field.name].astype('string')
+        try:
+            return pa.Table.from_pandas(df, schema=self.schema, preserve_index=False)
+        except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+            raise ValueError(f"{self.name} data does not match the master schema: {e}") from e
+
+    def stage(self, df, commit_id, chunk_number=0):
+        """
+        Writes one chunk of a commit as staged part files, one per date. Safe to
+        call from worker processes; nothing is visible to readers until commit().
+        Returns the number of rows staged.
+        """
+        table = self.conform(df)
+        # Partition in one pass: a stable sort by day groups each date's rows
+        # (in their original order) into one contiguous slice. NaT sorts first.
+        days = pc.cast(table.column(self.date_column), pa.date32()).to_numpy(zero_copy_only=False).astype('datetime64[D]')
+        order = np.argsort(days.view('i8'), kind='stable')
+        days = days[order]
+        table = table.take(order)
+        _, starts = np.unique(days.view('i8'), return_index=True)
+        staging = self.root / STAGING_DIR / commit_id
+        for start, end in zip(starts, [*starts[1:], len(days)]):
+            date = NULL_PARTITION if np.isnat(days[start]) else str(days[start])
+            partition = staging / f"date={date}"
+            partition.mkdir(parents=True, exist_ok=True)
+            pq.write_table(table.slice(start, end - start), partition / f"part-{commit_id}-{chunk_number:05d}.parquet")
+        return table.num_rows
+
+    def commit(self, commit_id, source=None):
+        """
+        Moves a commit's staged parts into their partitions and then records
+        the commit. Returns the number of rows committed.
+        """
+        staging = self.root / STAGING_DIR / commit_id
+        parts, rows = [], 0
+        for staged_part in self.staged_parts(commit_id):
+            relative = staged_part.relative_to(staging)
+            (self.root / relative.parent).mkdir(parents=True, exist_ok=True)
+            rows += pq.ParquetFile(staged_part).metadata.num_rows
+            staged_part.replace(self.root / relative)
+            parts.append(relative.as_posix())
+
+        record = {'commit_id': commit_id, 'source': source, 'rows': rows, 'parts': parts,
+                  'committed_at': datetime.now().isoformat(timespec='seconds')}
+        commits = self.root / COMMITS_DIR
+        commits.mkdir(parents=True, exist_ok=True)
+        tmp_record = commits / f".{commit_id}.json.tmp"
+        tmp_record.write_text(json.dumps(record, indent=2))
+        tmp_record.replace(commits / f"{commit_id}.json")
+        shutil.rmtree(staging, ignore_errors=True)
+        return rows
+
+    def write(self, df, commit_id, source=None):
+        """Stages and commits a whole dataframe in one call."""
+        self.stage(df, commit_id)
+        return self.commit(commit_id, source)
+
+    def staged_parts(self, commit_id):
+        """Staged part files of a commit, in commit order."""
+        return sorted((self.root / STAGING_DIR / commit_id).glob("date=*/part-*.parquet"))
+
+    def filter_staged_part(self, part, keep):
+        """Rewrites a staged part with only the rows where the boolean mask `keep` is True."""
+        table = pq.read_table(part, partitioning=None).filter(pa.array(keep))
+        tmp_part = part.with_name(f".{part.name}.tmp")
+        pq.write_table(table, tmp_part)
+        tmp_part.replace(part)
+
+    def discard(self, commit_id):
+        """Drops a staged commit that will not be committed."""
+        shutil.rmtree(self.root / STAGING_DIR / commit_id, ignore_errors=True)
+
+    def recover(self):
+        """
+        Cleans up after an interrupted run: removes all staged commits and any
+        part file that was moved into a partition without a commit record.
+        Only call this while no other writer is running.
+        """
+        shutil.rmtree(self.root / STAGING_DIR, ignore_errors=True)
+        committed = {part for record in self.commit_records() for part in record['parts']}
+        for part in self.root.glob("date=*/part-*.parquet"):
+            if part.relative_to(self.root).as_posix() not in committed:
+                part.unlink()
+
+    def read_legacy_csv(self):
+        """The pre-partitioning master CSV as a dataframe, IDs read as strings; None if there is none."""
+        if self.legacy_csv is None or not self.legacy_csv.exists():
+            return None
+        strings = {field.name: str for field in self.schema if pa.types.is_string(field.type)}
+        return pd.read_csv(self.legacy_csv, dtype=strings)
+
+    # --- Reading ---
+
+    def commit_records(self):
+        commits = self.root / COMMITS_DIR
+        if not commits.exists():
+            return []
+        return [json.loads(path.read_text()) for path in sorted(commits.glob("*.json"))]
+
+    def committed_parts(self, start_date=None, end_date=None):
+        """Paths of committed parts whose partition date lies in [start_date, end_date]."""
+        start = None if start_date is None else pd.Timestamp(start_date).strftime('%Y-%m-%d')
+        end = None if end_date is None else pd.Timestamp(end_date).strftime('%Y-%m-%d')
+        paths = []
+        for record in self.commit_records():
+            for part in record['parts']:
+                date = part.split('/', 1)[0].removeprefix("date=")
+                if date == NULL_PARTITION:
+                    if start is None and end is None:
+                        paths.append(self.root / part)
+                elif (start is None or date >= start) and (end is None or date <= end):
+                    paths.append(self.root / part)
+        return sorted(paths)
+
+    def read(self, start_date=None, end_date=None, columns=None):
+        """
+        Loads the committed rows, reading only the partitions in the date range
+        and only the requested columns. Rows with an unparseable date are only
+        included when no date range is given.
+        """
+        paths = self.committed_parts(start_date, end_date)
+        if not paths:
+            return self.schema.empty_table().select(columns or self.schema.names).to_pandas()
+        tables = [pq.read_table(path, columns=columns, partitioning=None) for path in paths]
+        return pa.concat_tables(tables).to_pandas()
+
+
+def read_master(name, start_date=None, end_date=None, columns=None, root=None):
+    """Convenience reader: read_master('sessions', '2025-07-01', '2025-07-31', ['user_id'])."""
+    return MasterStore(name, root).read(start_date, end_date, columns)
@@ -0,0 +1,240 @@
+import argparse
+import hashlib
+import importlib
+import json
+import logging
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+
+from analysis_artifacts import artifact_paths
+from master_store import file_sha256
+
+# --- PIPELINE RUNNER ---
+# Runs the Old Project scripts as stages of one DAG instead of by hand:
+#
+#   python pipeline_runner.py                  # every stage that is out of date
+#   python pipeline_runner.py personas email   # just these (and nothing upstream)
+#   python pipeline_runner.py --force          # ignore the stage cache
+#
+# Each stage declares the files and directories it reads and writes. A stage
+# runs after the stages that write its inputs, and stages with no dependency
+# between them run concurrently in separate processes. A stage is skipped when
+# the content hash of its inputs and of its script matches the last successful
+# run and its outputs still exist (data/cache/pipeline_stages.json).
+# A timing report is printed at the end of every run.
+STAGE_CACHE_PATH = Path("data/cache/pipeline_stages.json")
+REPORT_PATH = Path("logs/pipeline_runner_report.csv")
+
+
+class File:
+    """A single file read or written by a stage."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+
+    def exists(self):
+        return self.path.is_file()
+
+    def fingerprint(self):
+        return file_sha256(self.path) if self.path.is_file() else None
+
+
+class Directory:
+    """The files matching `pattern` in a directory, read or written by a stage."""
+
+    def __init__(self, path, pattern='*'):
+        self.path = Path(path)
+        self.pattern = pattern
+
+    def exists(self):
+        return self.path.is_dir()
+
+    def fingerprint(self):
+        files = sorted(p for p in self.path.rglob(self.pattern) if p.is_file()) if self.path.is_dir() else []
+        return [(p.relative_to(self.path).as_posix(), file_sha256(p)) for p in files]
+
+
+def _overlaps(a, b):
+    return a.path == b.path or a.path in b.path.parents or b.path in a.path.parents
+
+
+class Stage:
+    """
+    One step of the pipeline: `target` ('module:function') is called without
+    arguments in a worker process and must raise if it fails. `sources` are
+    the scripts whose content is part of the stage's cache key (by default
+    the target's module); list the local modules it imports too.
+    """
+
+    def __init__(self, name, target, inputs=(), outputs=(), sources=None):
+        self.name = name
+        self.target = target
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        module = target.split(':')[0]
+        self.sources = [Path(source) for source in (sources or [f"{module}.py"])]
+
+    def depends_on(self, other):
+        return any(_overlaps(i, o) for i in self.inputs for o in other.outputs)
+
+    def cache_key(self):
+        """SHA-256 of the stage's scripts and current inputs."""
+        state = {
+            'target': self.target,
+            'sources': [file_sha256(source) for source in self.sources],
+            'inputs': [(str(i.path), i.fingerprint()) for i in self.inputs],
+        }
+        return hashlib.sha256(json.dumps(state).encode()).hexdigest()
+
+    def outputs_exist(self):
+        return all(output.exists() for output in self.outputs)
+
+
+def ingest_new_files():
+    from ingestion import CHUNK_SIZE, run_ingestion_pipeline, setup_project_structure
+    setup_project_structure()
+    run_ingestion_pipeline(chunksize=CHUNK_SIZE)
+
+
+STAGES = [
+    Stage('ingestion', 'pipeline_runner:ingest_new_files',
+          sources=['ingestion.py', 'file_router.py', 'ingestion_index.py', 'master_store.py', 'typed_csv.py',
+                   'user_hashing.py'],
+          inputs=[Directory("data/new")],
+          outputs=[Directory("data/master_orders"), Directory("data/master_sessions")]),
+    Stage('data_preparation', 'data_preparation_pipeline:prepare_final_data',
+          sources=['data_preparation_pipeline.py', 'analysis_artifacts.py', 'channel_metrics.py', 'imputation.py',
+                   'incremental_prep.py', 'master_store.py'],
+          inputs=[File("Cleaned_Marketing Channel Breakdown.csv"), File("cleaned_Media Spend by Channel.csv"),
+                  File("cleaned_TOPSHEET.csv"), File("cleaned_Cust By Channel-New.csv"),
+                  File("cleaned_Cust By Channel-Ext.csv"), File("spend_overrides.csv")],
+          outputs=[File(path) for path in artifact_paths().values()]),
+    Stage('personas', 'create_personas:create_persona_lookup_file',
+          inputs=[File("cleaned_Cust By Channel-New.csv")], outputs=[File("customer_personas.csv")]),
+    Stage('email', 'create_email:create_email_flow_performance_file',
+          outputs=[File("email_flow_performance.csv")]),
+    Stage('overrides', 'create_overrides:create_spend_overrides_file',
+          outputs=[File("spend_overrides.csv")]),
+    Stage('ltv_bootstrap', 'Bootstrap_ltv:demonstrate_ltv_bootstrapping', sources=['Bootstrap_ltv.py', 'bootstrap.py'],
+          outputs=[File("model_metrics.txt")]),
+]
+
+
+def run_stage(target):
+    """Worker entry point: imports and calls `target`, returning its wall time in seconds."""
+    module, function = target.split(':')
+    started = time.perf_counter()
+    getattr(importlib.import_module(module), function)()
+    return time.perf_counter() - started
+
+
+def upstream(stages, selected):
+    """Stage name -> names of the selected stages it waits for."""
+    return {s.name: {o.name for o in selected if o is not s and s.depends_on(o)} for s in stages if s in selected}
+
+
+def run_pipeline(names=None, force=False, max_workers=None, stages=STAGES, cache_path=STAGE_CACHE_PATH):
+    """
+    Runs the named stages (all by default) in dependency order, skipping those
+    that are up to date unless `force`. Returns one report row per stage:
+    {'stage', 'status', 'seconds'} with status 'ran', 'skipped', 'failed' or
+    'blocked' (an upstream stage failed).
+    """
+    selected = [s for s in stages if names is None or s.name in names]
+    unknown = set(names or ()) - {s.name for s in stages}
+    if unknown:
+        raise ValueError(f"Unknown stage(s): {sorted(unknown)}")
+    waits_for = upstream(stages, selected)
+    cache_path = Path(cache_path)
+    cache = json.loads(cache_path.read_text()) if cache_path.exists() else {}
+
+    by_name = {s.name: s for s in selected}
+    report = {s.name: {'stage': s.name, 'status': 'pending', 'seconds': 0.0} for s in selected}
+    pending = set(by_name)
+    running = {}
+    keys = {}
+
+    def settle(name, status, seconds=0.0):
+        report[name].update(status=status, seconds=round(seconds, 3))
+        logging.info(f"Stage {name}: {status} ({seconds:.2f}s)")
+        # Only a successful run is recorded. A failed run forgets the stage's
+        # last key, as its outputs may now be partly overwritten.
+        if status == 'ran':
+            cache[name] = keys[name]
+        elif status != 'failed' or cache.pop(name, None) is None:
+            return
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = cache_path.with_name(f".{cache_path.name}.tmp")
+        tmp_path.write_text(json.dumps(cache, indent=2))
+        tmp_path.replace(cache_path)
+
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        while pending or running:
+            settled_any = True
+            while settled_any:
+                settled_any = False
+                for name in sorted(pending):
+                    states = {report[u]['status'] for u in waits_for[name]}
+                    if states & {'failed', 'blocked'}:
+                        pending.discard(name)
+                        settle(name, 'blocked')
+                        settled_any = True
+                    elif states <= {'ran', 'skipped'}:
+                        # Inputs are hashed only now, after any upstream stage wrote them.
+                        pending.discard(name)
+                        stage = by_name[name]
+                        keys[name] = stage.cache_key()
+                        if not force and cache.get(name) == keys[name] and stage.outputs_exist():
+                            settle(name, 'skipped')
+                            settled_any = True
+                        else:
+                            logging.info(f"Stage {name}: starting")
+                            running[pool.submit(run_stage, stage.target)] = name
+            if not running:
+                if pending:
+                    raise ValueError(f"Stages depend on each other in a cycle: {sorted(pending)}")
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    seconds = future.result()
+                except Exception as e:
+                    logging.error(f"Stage {name} raised: {e}")
+                    settle(name, 'failed')
+                    continue
+                if not by_name[name].outputs_exist():
+                    logging.error(f"Stage {name} finished without writing all of its outputs.")
+                    settle(name, 'failed', seconds)
+                    continue
+                settle(name, 'ran', seconds)
+
+    return [report[s.name] for s in selected]
+
+
+def format_report(rows, wall_seconds):
+    lines = [f"{'stage':<18}{'status':<10}{'seconds':>9}"]
+    lines += [f"{row['stage']:<18}{row['status']:<10}{row['seconds']:>9.2f}" for row in rows]
+    lines.append(f"{'total (wall)':<28}{wall_seconds:>9.2f}")
+    return "\n".join(lines)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Run the Old Project pipeline stages, skipping up-to-date ones.")
+    parser.add_argument("stages", nargs="*", help=f"Stages to run (default: all): {', '.join(s.name for s in STAGES)}")
+    parser.add_argument("--force", action="store_true", help="Run the stages even if their inputs are unchanged.")
+    parser.add_argument("--workers", type=int, default=None, help="Stages run at once (default: CPU count).")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    rows = run_pipeline(args.stages or None, force=args.force, max_workers=args.workers)
+    wall_seconds = time.perf_counter() - started
+    print(format_report(rows, wall_seconds))
+    REPORT_PATH.parent.mkdir(parents=True, exist_ok=True)
+    with open(REPORT_PATH, "a") as f:
+        if f.tell() == 0:
+            f.write("finished_at,stage,status,seconds\n")
+        finished_at = time.strftime('%Y-%m-%dT%H:%M:%S')
+        f.writelines(f"{finished_at},{row['stage']},{row['status']},{row['seconds']}\n" for row in rows)
@@ -0,0 +1,164 @@
+import numpy as np
+import pandas as pd
+from pandera.engines import pandas_engine
+
+# --- COMPILED SCHEMA VALIDATION ---
+# Pandera's lazy validation builds a failure-case report for every check, which
+# dominates ingestion time on large files even when every row is valid.
+# compile_schema() turns a pandera DataFrameSchema into a validator that runs
+# coercion, nullability, uniqueness and all checks as vectorized pandas/numpy
+# operations combined into one boolean mask. Built-in checks are translated
+# from their statistics; any other check is evaluated through pandera itself.
+
+_BUILTIN_CHECKS = {
+    'greater_than': lambda s, min_value: s > min_value,
+    'greater_than_or_equal_to': lambda s, min_value: s >= min_value,
+    'less_than': lambda s, max_value: s < max_value,
+    'less_than_or_equal_to': lambda s, max_value: s <= max_value,
+    'equal_to': lambda s, value: s == value,
+    'not_equal_to': lambda s, value: s != value,
+    'in_range': lambda s, min_value, max_value, include_min=True, include_max=True: (
+        (s >= min_value if include_min else s > min_value) & (s <= max_value if include_max else s < max_value)
+    ),
+    'isin': lambda s, allowed_values: s.isin(allowed_values),
+    'notin': lambda s, forbidden_values: ~s.isin(forbidden_values),
+    'str_matches': lambda s, pattern: s.str.match(getattr(pattern, 'pattern', pattern)).fillna(False).astype(bool),
+    'str_contains': lambda s, pattern: s.str.contains(getattr(pattern, 'pattern', pattern)).fillna(False).astype(bool),
+    'str_startswith': lambda s, string: s.str.startswith(string).fillna(False).astype(bool),
+    'str_endswith': lambda s, string: s.str.endswith(string).fillna(False).astype(bool),
+    'str_length': lambda s, min_value=None, max_value=None: (
+        (s.str.len() >= (min_value if min_value is not None else 0))
+        & (s.str.len() <= (max_value if max_value is not None else np.inf))
+    ),
+}
+
+
+def _check_mask(check, series):
+    """Boolean mask of rows that pass `check`; nulls pass when the check ignores them."""
+    builtin = _BUILTIN_CHECKS.get(check.name)
+    if builtin is not None and check.statistics is not None:
+        passed = pd.Series(builtin(series, **check.statistics), index=series.index).fillna(False).astype(bool)
+    else:
+        # Custom checks: let pandera evaluate them; it drops nulls first when
+        # ignore_na is set, so reindex back to the full column.
+        passed = check(series).check_output.reindex(series.index, fill_value=True).astype(bool)
+    if check.ignore_na:
+        passed |= series.isna()
+    return passed.to_numpy()
+
+
+def _coerce(series, dtype):
+    """Coerces a column element by element; returns (coerced, failed_mask)."""
+    if pd.api.types.is_datetime64_any_dtype(dtype.type):
+        coerced = pd.to_datetime(series, errors='coerce')
+    elif pd.api.types.is_numeric_dtype(dtype.type) and not pd.api.types.is_bool_dtype(dtype.type):
+        coerced = pd.to_numeric(series, errors='coerce')
+        if pd.api.types.is_integer_dtype(dtype.type):
+            coerced = coerced.where(coerced % 1 == 0)
+    else:
+        coerced = series.where(series.isna(), series.astype(str))
+    return coerced, (coerced.isna() & series.notna()).to_numpy()
+
+
+class ValidationResult:
+    """
+    Outcome of a compiled validation.
+
+    `valid_mask` has one entry per input row. `check_counts` maps each failing
+    check, e.g. 'qty:greater_than_or_equal_to' or 'order_datetime:coerce_dtype',
+    to the number of rows it rejected. A row can fail several checks, so the
+    counts may add up to more than `n_invalid`.
+    """
+
+    def __init__(self, data, valid_mask, check_counts, final_dtypes):
+        self.data = data
+        self.valid_mask = valid_mask
+        self.check_counts = check_counts
+        self._final_dtypes = final_dtypes
+
+    @property
+    def n_invalid(self):
+        return int(len(self.valid_mask) - np.count_nonzero(self.valid_mask))
+
+    @property
+    def all_valid(self):
+        return bool(self.valid_mask.all())
+
+    def valid_rows(self):
+        """The valid rows, coerced to the schema dtypes, selected with one boolean index."""
+        rows = self.data if self.all_valid else self.data[self.valid_mask]
+        return rows.astype(self._final_dtypes)
+
+    def summary(self):
+        failing = ", ".join(f"{check}={count}" for check, count in self.check_counts.items())
+        return f"{self.n_invalid}/{len(self.valid_mask)} rows invalid ({failing or 'no failing checks'})"
+
+
+class CompiledSchema:
+    """
+    Vectorized validator for a pandera DataFrameSchema.
+
+    validate(df) returns a ValidationResult; its valid_rows() have the same
+    dtypes pandera's own validate() would return.
+    """
+
+    def __init__(self, schema):
+        self.schema = schema
+        # Pandera registers its pandas backends lazily on first validate();
+        # custom checks evaluated through pandera need them.
+        type(schema).register_default_backends(pd.DataFrame)
+
+    def validate(self, df):
+        schema = self.schema
+        n_rows = len(df)
+        valid = np.ones(n_rows, dtype=bool)
+        check_counts = {}
+
+        def apply(check_name, passed):
+            # A scalar False is a column-level failure: every row fails.
+            nonlocal valid
+            failures = n_rows if passed is False else int(n_rows - np.count_nonzero(passed))
+            if failures:
+                check_counts[check_name] = check_counts.get(check_name, 0) + failures
+                valid &= passed
+
+        # Columns are replaced, never modified in place, so a shallow copy is enough.
+        coerced_df = df.copy(deep=False)
+        final_dtypes = {}
+
+        extra = [c for c in df.columns if c not in schema.columns]
+        if schema.strict is True and extra:
+            apply('strict', False)
+        if schema.ordered and [c for c in df.columns if c in schema.columns] != [c for c in schema.columns if c in df.columns]:
+            apply('ordered', False)
+
+        for name, column in schema.columns.items():
+            if name not in df.columns:
+                if column.required:
+                    apply(f'{name}:column_in_dataframe', False)
+                continue
+            series = df[name]
+            has_dtype = column.dtype is None or column.dtype.check(pandas_engine.Engine.dtype(series.dtype))
+            if (column.coerce or schema.coerce) and not has_dtype:
+                series, failed = _coerce(series, column.dtype)
+                apply(f'{name}:coerce_dtype', ~failed)
+                final_dtypes[name] = column.dtype.type
+            elif not has_dtype:
+                # A wrong column dtype fails the whole column, as in pandera.
+                apply(f'{name}:dtype', False)
+            if not column.nullable:
+                apply(f'{name}:not_nullable', series.notna().to_numpy())
+            if column.unique:
+                apply(f'{name}:unique', ~series.duplicated(keep=False).to_numpy())
+            for check in column.checks:
+                apply(f'{name}:{check.name}', _check_mask(check, series))
+            coerced_df[name] = series
+
+        for check in schema.checks:
+            apply(check.name, check(coerced_df).check_output.reindex(df.index, fill_value=True).astype(bool).to_numpy())
+
+        return ValidationResult(coerced_df, valid, check_counts, final_dtypes)
+
+
+def compile_schema(schema):
+    return CompiledSchema(schema)
@@ -0,0 +1,141 @@
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pcsv
+import pyarrow.parquet as pq
+
+# --- SCHEMA-TYPED CSV READING ---
+# Reads only the schema's columns, parsed straight into their types (strings,
+# integers, floats, timestamps) by pyarrow's multi-threaded CSV reader, instead
+# of letting pandas infer every column and then coercing it a second time.
+#
+# If a value does not parse as its declared type (e.g. "abc" in a numeric
+# column), the remaining rows are read again as text and typed column by column;
+# a column that still does not parse is left as text for the validators to
+# coerce, so bad rows are still rejected row by row.
+#
+# Parquet drop files are read the same way with read_typed_parquet().
+
+# Bytes sampled from the top of a file to turn a chunk size in rows into
+# pyarrow's block size in bytes.
+_SAMPLE_BYTES = 1 << 16
+
+
+class CsvSpec:
+    """Column names and pyarrow types used to read one kind of CSV (or Parquet) file."""
+
+    def __init__(self, column_types):
+        self.column_types = dict(column_types)
+
+    @property
+    def columns(self):
+        return list(self.column_types)
+
+    @classmethod
+    def from_pandera(cls, schema):
+        """Types from a pandera DataFrameSchema; columns without a numeric or datetime dtype are read as text."""
+        column_types = {}
+        for name, column in schema.columns.items():
+            dtype = column.dtype.type if column.dtype is not None else None
+            if dtype is not None and pd.api.types.is_datetime64_any_dtype(dtype):
+                column_types[name] = pa.timestamp('ns')
+            elif dtype is not None and pd.api.types.is_integer_dtype(dtype):
+                column_types[name] = pa.int64()
+            elif dtype is not None and pd.api.types.is_float_dtype(dtype):
+                column_types[name] = pa.float64()
+            else:
+                column_types[name] = pa.string()
+        return cls(column_types)
+
+    @classmethod
+    def from_arrow(cls, schema):
+        """Types from a pyarrow schema (e.g. the master table schemas)."""
+        return cls({field.name: field.type for field in schema})
+
+
+def read_header(file_path):
+    """Column names of a CSV file, read from its first line only."""
+    return list(pd.read_csv(file_path, nrows=0).columns)
+
+
+def read_typed_csv(file_path, spec, chunksize=None, header=None):
+    """
+    Yields the file as dataframes of about `chunksize` rows (one dataframe if
+    None), reading only the spec's columns that are present in the file, with
+    their declared types. Integer columns are nullable Int64. The index counts
+    rows from the start of the file, as with pd.read_csv(chunksize=...).
+    """
+    header = read_header(file_path) if header is None else header
+    column_types = {c: t for c, t in spec.column_types.items() if c in header}
+    convert_options = pcsv.ConvertOptions(
+        column_types=column_types, include_columns=list(column_types), strings_can_be_null=True,
+    )
+
+    rows_read = 0
+    try:
+        if chunksize is None:
+            yield _to_pandas(pcsv.read_csv(file_path, convert_options=convert_options), rows_read)
+            return
+        read_options = pcsv.ReadOptions(block_size=_block_size(file_path, chunksize))
+        for batch in pcsv.open_csv(file_path, read_options=read_options, convert_options=convert_options):
+            chunk = _to_pandas(batch, rows_read)
+            rows_read += len(chunk)
+            yield chunk
+    except pa.ArrowInvalid:
+        # Continue after the rows already yielded, typing text column by column.
+        skiprows = range(1, rows_read + 1) if rows_read else None
+        chunks = pd.read_csv(file_path, usecols=list(column_types), dtype=str, skiprows=skiprows, chunksize=chunksize)
+        for chunk in [chunks] if chunksize is None else chunks:
+            chunk.index += rows_read
+            yield _type_columns(chunk, column_types)
+
+
+def read_typed_parquet(file_path, spec, chunksize=None):
+    """
+    Parquet counterpart of read_typed_csv(): reads the spec's columns, cast to
+    their declared types where the file's types allow it.
+    """
+    parquet_file = pq.ParquetFile(file_path)
+    columns = [c for c in spec.columns if c in parquet_file.schema_arrow.names]
+    target = pa.schema([(c, spec.column_types[c]) for c in columns])
+    if chunksize is None:
+        batches = [parquet_file.read(columns=columns)]
+    else:
+        batches = (pa.Table.from_batches([batch]) for batch in parquet_file.iter_batches(batch_size=chunksize, columns=columns))
+
+    rows_read = 0
+    for table in batches:
+        try:
+            table = table.cast(target)
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+            pass  # Left as stored; the validators coerce it.
+        chunk = _to_pandas(table, rows_read)
+        rows_read += len(chunk)
+        yield chunk
+
+
+def _block_size(file_path, chunksize):
+    with open(file_path, 'rb') as f:
+        sample = f.read(_SAMPLE_BYTES)
+    bytes_per_row = len(sample) / max(sample.count(b'\n'), 1)
+    return max(int(bytes_per_row * chunksize), _SAMPLE_BYTES)
+
+
+def _to_pandas(table, first_row):
+    df = table.to_pandas(types_mapper={pa.int64(): pd.Int64Dtype()}.get)
+    df.index = pd.RangeIndex(first_row, first_row + len(df))
+    return df
+
+
+def _type_columns(df, column_types):
+    """Applies the declared types to a text dataframe, skipping columns that do not parse."""
+    for column, arrow_type in column_types.items():
+        try:
+            if pa.types.is_timestamp(arrow_type) or pa.types.is_date(arrow_type):
+                df[column] = pd.to_datetime(df[column])
+            elif pa.types.is_integer(arrow_type):
+                df[column] = pd.to_numeric(df[column]).astype('Int64')
+            elif pa.types.is_floating(arrow_type):
+                df[column] = pd.to_numeric(df[column]).astype('float64')
+        except (ValueError, TypeError):
+            pass
+    return df
@@ -0,0 +1,151 @@
+import hashlib
+import uuid
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# --- USER ID HASHING ---
+# Shared by ingestion.py and ingestion_piplline_with_pandera.py.
+#
+# A column of emails is factorized first, so every distinct email is hashed
+# once per file. Distinct emails already seen in earlier runs are resolved from
+# a persistent cache instead of being hashed again.
+#
+# The cache never stores emails. It is keyed by two independent 64-bit SipHash
+# values per email (pandas' vectorized `hash_array`), which are computed in C for
+# a whole column at once. An entry is only used when both keys match.
+HASH_CACHE_DIR = Path("data/cache/user_id_hashes")
+# Part files are merged into one once there are more than this many.
+MAX_CACHE_PARTS = 64
+_KEY_SALTS = ("dtc-user-id-hi00", "dtc-user-id-lo00")
+
+
+def hash_user_id(email):
+    """Hashes an email using SHA-256 for privacy."""
+    if not isinstance(email, str):
+        return None
+    return hashlib.sha256(email.encode('utf-8')).hexdigest()
+
+
+def email_keys(emails):
+    """Two independent uint64 keys per email, computed without a Python loop."""
+    values = np.asarray(emails, dtype=object)
+    return tuple(pd.util.hash_array(values, hash_key=salt, categorize=False) for salt in _KEY_SALTS)
+
+
+class HashCache:
+    """
+    Persistent (key_hi, key_lo) -> SHA-256 digest mapping, stored as Parquet part
+    files under `cache_dir`. Every `save()` writes one new part file atomically, so
+    a crash never leaves a half-written cache behind.
+    """
+
+    def __init__(self, cache_dir=HASH_CACHE_DIR):
+        self.cache_dir = Path(cache_dir)
+        self._hi = np.empty(0, dtype=np.uint64)
+        self._lo = np.empty(0, dtype=np.uint64)
+        self._digests = np.empty(0, dtype=object)
+        self._index = pd.Index(self._hi)
+        self._saved = 0
+
+    @classmethod
+    def load(cls, cache_dir=HASH_CACHE_DIR):
+        cache = cls(cache_dir)
+        parts = sorted(cache.cache_dir.glob("part-*.parquet"))
+        if parts:
+            table = pd.concat((pd.read_parquet(part) for part in parts), ignore_index=True)
+            cache.add(table['key_hi'].to_numpy(np.uint64), table['key_lo'].to_numpy(np.uint64), table['sha256'].to_numpy(object))
+            cache._saved = len(cache)
+            if len(parts) > MAX_CACHE_PARTS:
+                cache._compact(parts)
+        return cache
+
+    def __len__(self):
+        return len(self._hi)
+
+    def lookup(self, hi, lo):
+        """Digests for the given keys; None where the cache has no entry."""
+        positions = self._index.get_indexer(hi)
+        found = positions >= 0
+        found[found] = self._lo[positions[found]] == lo[found]
+        digests = np.full(len(hi), None, dtype=object)
+        digests[found] = self._digests[positions[found]]
+        return digests
+
+    def add(self, hi, lo, digests):
+        """Adds entries whose first key is not cached yet."""
+        new = ~pd.Index(hi).isin(self._index)
+        hi, lo, digests = hi[new], lo[new], digests[new]
+        # Keep the first key unique, so lookups stay a single indexer pass.
+        _, first = np.unique(hi, return_index=True)
+        first.sort()
+        if not len(first):
+            return
+        self._hi = np.concatenate([self._hi, hi[first]])
+        self._lo = np.concatenate([self._lo, lo[first]])
+        self._digests = np.concatenate([self._digests, digests[first]])
+        self._index = pd.Index(self._hi)
+
+    def entries_since(self, start):
+        """Entries added after the cache held `start` entries, as (hi, lo, digests)."""
+        return self._hi[start:], self._lo[start:], self._digests[start:]
+
+    def save(self, entries=None):
+        """
+        Merges `entries` (e.g. returned by a worker process) and writes every
+        entry that is not on disk yet as a new part file.
+        """
+        if entries is not None:
+            self.add(*entries)
+        if self._saved == len(self):
+            return
+        self._write_part(*self.entries_since(self._saved))
+        self._saved = len(self)
+
+    def _write_part(self, hi, lo, digests):
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        name = f"part-{pd.Timestamp.now():%Y%m%d%H%M%S}-{uuid.uuid4().hex[:8]}.parquet"
+        tmp_path = self.cache_dir / f".{name}.tmp"
+        pd.DataFrame({'key_hi': hi, 'key_lo': lo, 'sha256': digests}).to_parquet(tmp_path, index=False)
+        tmp_path.replace(self.cache_dir / name)
+
+    def _compact(self, parts):
+        self._write_part(self._hi, self._lo, self._digests)
+        for part in parts:
+            part.unlink()
+
+
+def _hash_all(emails):
+    return [hashlib.sha256(email.encode('utf-8')).hexdigest() for email in emails]
+
+
+def hash_user_ids(user_ids, cache=None):
+    """
+    SHA-256 hashes a column of emails. Returns a Series aligned with `user_ids`,
+    with None for values that are not strings.
+
+    Each distinct email is hashed at most once, and not at all when `cache` (a
+    HashCache) already holds it; newly hashed emails are added to the cache,
+    which is left to the caller to save.
+    """
+    codes, uniques = pd.factorize(user_ids)
+    uniques = np.asarray(uniques, dtype=object)
+    is_str = np.fromiter((isinstance(u, str) for u in uniques), dtype=bool, count=len(uniques))
+    digests = np.full(len(uniques), None, dtype=object)
+
+    emails = uniques[is_str]
+    if len(emails):
+        hi, lo = email_keys(emails)
+        found = cache.lookup(hi, lo) if cache is not None else np.full(len(emails), None, dtype=object)
+        missing = np.flatnonzero(pd.isna(found))
+        if len(missing):
+            found[missing] = _hash_all(emails[missing])
+            if cache is not None:
+                cache.add(hi[missing], lo[missing], found[missing])
+        digests[is_str] = found
+
+    result = np.full(len(codes), None, dtype=object)
+    valid = codes >= 0
+    result[valid] = digests[codes[valid]]
+    return pd.Series(result, index=getattr(user_ids, 'index', None), name=getattr(user_ids, 'name', None))
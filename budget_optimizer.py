@@ -0,0 +1,89 @@
+import numpy as np
+import pandas as pd
+
+# --- Budget Optimizer ---
+# Reallocates a fixed budget across campaigns to maximize predicted revenue,
+# using the precomputed response curves (see response_curves.py). Each
+# campaign's spend -> revenue curve is replaced by its upper concave envelope,
+# whose segments have decreasing marginal returns. Taking segments from all
+# campaigns in order of marginal return until the budget runs out is then the
+# exact greedy solution, and it is one sort over a few thousand segments.
+
+
+def concave_envelope(x, y):
+    """Indices of the upper concave envelope of points sorted by x, starting at the first point."""
+    hull = []
+    for i in range(len(x)):
+        while len(hull) >= 2:
+            a, b = hull[-2], hull[-1]
+            # Drop b if it lies on or below the chord from a to i.
+            if (y[b] - y[a]) * (x[i] - x[a]) <= (y[i] - y[a]) * (x[b] - x[a]):
+                hull.pop()
+            else:
+                break
+        hull.append(i)
+    return hull
+
+
+def optimize_budget(curves, total_budget, sessions_by_campaign=None, avg_order_value=1.0, min_multiplier=0.0, max_multiplier=None):
+    """
+    Returns the revenue-maximizing spend per campaign for `total_budget`.
+
+    Every campaign keeps at least `min_multiplier` x its current spend and gets
+    at most `max_multiplier` x (bounded by the curve grid). Campaigns without
+    spend or without sessions are left out. Raises ValueError when the budget
+    cannot cover the minimum spends.
+    """
+    sessions = curves.campaign_sessions if sessions_by_campaign is None else curves.sessions_vector(sessions_by_campaign)
+    max_multiplier = curves.multipliers[-1] if max_multiplier is None else max_multiplier
+    in_scope = (sessions > 0) & (curves.campaign_spend > 0)
+    grid = (curves.multipliers >= min_multiplier) & (curves.multipliers <= max_multiplier)
+    if not in_scope.any() or grid.sum() < 2:
+        raise ValueError("No campaigns with spend and sessions in the selected scope.")
+
+    multipliers = curves.multipliers[grid]
+    spend = curves.campaign_spend[in_scope]
+    scope_sessions = sessions[in_scope]
+    revenue_per_session = curves.campaign_curves[in_scope][:, grid] * avg_order_value
+
+    x = spend[:, None] * multipliers[None, :]
+    y = scope_sessions[:, None] * revenue_per_session
+    committed = x[:, 0].sum()
+    if total_budget < committed:
+        raise ValueError(f"Budget ${total_budget:,.0f} is below the minimum committed spend of ${committed:,.0f}.")
+
+    # Envelope segments of every campaign, flattened.
+    campaign_idx, dx, dy = [], [], []
+    for c in range(len(spend)):
+        hull = concave_envelope(x[c], y[c])
+        campaign_idx.extend([c] * (len(hull) - 1))
+        dx.extend(np.diff(x[c, hull]))
+        dy.extend(np.diff(y[c, hull]))
+    campaign_idx, dx, dy = np.asarray(campaign_idx, dtype=int), np.asarray(dx), np.asarray(dy)
+
+    # Greedy fill in order of marginal return; only segments that add revenue.
+    slopes = np.divide(dy, dx, out=np.zeros_like(dy), where=dx > 0)
+    order = np.argsort(-slopes, kind="stable")
+    order = order[slopes[order] > 0]
+    remaining = total_budget - committed
+    cumulative = np.cumsum(dx[order])
+    previous = cumulative - dx[order]
+    fraction = np.clip((remaining - previous) / dx[order], 0.0, 1.0)
+    extra_spend = np.bincount(campaign_idx[order], weights=dx[order] * fraction, minlength=len(spend))
+
+    optimized_spend = x[:, 0] + extra_spend
+    optimized_multiplier = optimized_spend / spend
+    current_rates = curves.conversion_rates(1.0)[in_scope]
+    optimized_rates = curves.rates_at(optimized_multiplier, rows=np.flatnonzero(in_scope))
+
+    result = pd.DataFrame({
+        'campaign_id': curves.campaign_ids[in_scope],
+        'current_spend': spend,
+        'optimized_spend': optimized_spend,
+        'spend_change_pct': (optimized_multiplier - 1) * 100,
+        'current_conversions': scope_sessions * current_rates,
+        'optimized_conversions': scope_sessions * optimized_rates,
+    })
+    result['current_revenue'] = result['current_conversions'] * avg_order_value
+    result['optimized_revenue'] = result['optimized_conversions'] * avg_order_value
+    return result.sort_values('optimized_spend', ascending=False).reset_index(drop=True)
@@ -5,7 +5,13 @@ import plotly.express as px
 import plotly.graph_objects as go
 import xgboost as xgb
 import joblib
+import threading
 from pathlib import Path
+from model_artifacts import MANIFEST_FILE, DEFAULT_ENCODER, load_model_artifact, prepare_features
+from model_registry import ActiveModel
+from response_curves import ResponseCurves, build_response_curves, curves_path
+from budget_optimizer import optimize_budget
+from model_insights import SEGMENT_COLUMNS, build_contribution_cache, contributions_path, load_contribution_cache, model_fingerprint
 
 # --- App Configuration ---
 st.set_page_config(
@@ -56,11 +62,22 @@ def load_data():
         return None, None, None
 
 @st.cache_resource
-def load_model_and_features():
+def load_packaged_model():
     """
-    Loads the pre-trained XGBoost model and feature list from disk.
+    Loads the pre-trained XGBoost model and its manifest (feature list, encoder,
+    checksum) shipped in the project root (used when the model registry has no active version).
+    Prefers the native UBJSON artifact (checksum-verified) and falls back to the
+    joblib pickles. Cached once per server process and shared across sessions.
     These files are created by the Jupyter Notebook.
     """
+    manifest_path = Path(MANIFEST_FILE)
+    if manifest_path.exists():
+        try:
+            return load_model_artifact(manifest_path.parent)
+        except (OSError, KeyError, ValueError) as e:
+            # Missing or unreadable .ubj file, incomplete manifest, or checksum mismatch.
+            st.warning(f"⚠️ Could not load the native model artifact ({e}). Falling back to the joblib files.")
+
     model_path = Path("conversion_model.joblib")
     features_path = Path("model_features.joblib")
 
@@ -70,7 +87,68 @@ def load_model_and_features():
 
     model = joblib.load(model_path)
     features = joblib.load(features_path)
-    return model, features
+    manifest = {"features": features, "encoder": DEFAULT_ENCODER, "sha256": model_fingerprint(model)}
+    return model, manifest
+
+@st.cache_resource
+def get_active_model():
+    """
+    One registry watcher per server process. Retrained models promoted with
+    `python model_registry.py promote <version>` are loaded in the background
+    and swapped in atomically, without a restart and without dropping sessions.
+    """
+    active_model = ActiveModel()
+    active_model.refresh()
+    active_model.start_watching()
+    return active_model
+
+def load_model_and_features():
+    """Returns the model and manifest (features, encoder, sha256) to serve for this script run."""
+    # Never loads on the request path: the watcher thread swaps new versions in.
+    snapshot = get_active_model().snapshot()
+    if snapshot is not None:
+        version, model, manifest = snapshot
+        return model, manifest
+    return load_packaged_model()
+
+class BackgroundJob:
+    """A daemon thread running `target(*args, **kwargs)`; keeps the exception it raised in `error`."""
+
+    def __init__(self, name, target, *args, **kwargs):
+        self.error = None
+        self.thread = threading.Thread(target=self._run, args=(target, args, kwargs), name=name, daemon=True)
+        self.thread.start()
+
+    def _run(self, target, args, kwargs):
+        try:
+            target(*args, **kwargs)
+        except Exception as e:
+            self.error = e
+
+    def failed(self):
+        return not self.thread.is_alive() and self.error is not None
+
+@st.cache_resource
+def start_contribution_job(model_key, _model, _manifest, _data_df):
+    """Computes per-segment contributions for a model once, in a background thread."""
+    return BackgroundJob(f"contributions-{model_key[:16]}", build_contribution_cache,
+                         _model, _manifest["features"], _manifest["encoder"], _data_df, fingerprint=model_key)
+
+@st.cache_resource
+def start_response_curve_job(model_key, _model, _manifest, _data_df):
+    """Precomputes spend response curves for a model once, in a background thread."""
+    return BackgroundJob(f"response-curves-{model_key[:16]}", build_response_curves,
+                         _model, _manifest["features"], _manifest["encoder"], _data_df, model_key)
+
+@st.cache_resource
+def load_response_curves(model_key):
+    """Loads the precomputed response curves for a model, shared across sessions."""
+    return ResponseCurves.load(curves_path(model_key))
+
+@st.cache_data
+def load_segment_contributions(model_key):
+    """Reads the precomputed contribution cache for a model."""
+    return load_contribution_cache(model_key)
 
 # --- Main Dashboard UI ---
 st.title("💡 Truffle Pig | Creative Performance Dashboard")
@@ -209,23 +287,82 @@ if data_df is not None:
 
     with tab3:
         st.header("Lift Forecast")
-        st.markdown("Use our conversion model to predict the incremental lift from a budget increase.")
+        st.markdown("Use our conversion model to predict the incremental lift from a budget change.")
 
-        model, features = load_model_and_features()
+        model, manifest = load_model_and_features()
         
-        if model and features:
-            # Use a representative sample from the filtered data for forecasting
-            if not filtered_df.empty:
+        if model and manifest:
+            features, encoder = manifest["features"], manifest["encoder"]
+            model_key = manifest["sha256"]
+            avg_order_value = orders_df['gross_revenue'].mean()
+
+            if filtered_df.empty:
+                st.warning("No data in the selected filter range to create a forecast.")
+            elif curves_path(model_key).exists():
+                # Precomputed response curves: any budget change is a lookup, not an inference run
+                curves = load_response_curves(model_key)
+                sessions_by_campaign = filtered_df['campaign_id'].value_counts()
+
+                budget_change = st.slider("Select Budget Change %", min_value=-100, max_value=200, value=25, step=1)
+                lift_conversions = curves.incremental_conversions(sessions_by_campaign, 1 + budget_change / 100)
+                lift_revenue = lift_conversions * avg_order_value
+
+                col1, col2 = st.columns(2)
+                col1.metric("Predicted Incremental Conversions", f"{lift_conversions:,.1f}", help="The number of additional conversions predicted if spend were changed for the sessions in the current filters.")
+                col2.metric("Predicted Incremental Revenue", f"${lift_revenue:,.2f}", help="Based on the average order value.")
+
+                response_df = pd.DataFrame({
+                    'budget_change_pct': (curves.multipliers - 1) * 100,
+                    'predicted_conversions': curves.total_curve(sessions_by_campaign)
+                })
+                fig_response = px.line(response_df, x='budget_change_pct', y='predicted_conversions', title="Predicted Conversions vs. Budget Change", labels={'budget_change_pct': 'Budget Change (%)', 'predicted_conversions': 'Predicted Conversions'})
+                fig_response.add_vline(x=budget_change, line_dash="dash", line_color="red")
+                st.plotly_chart(fig_response, use_container_width=True)
+
+                st.subheader("Budget Reallocation")
+                st.markdown("Find the revenue-maximizing split of a fixed budget across the campaigns in the current filters.")
+                current_budget = float(campaigns_df.loc[campaigns_df['campaign_id'].isin(sessions_by_campaign.index), 'spend'].sum())
+                col1, col2 = st.columns(2)
+                total_budget = col1.number_input("Total Budget ($)", min_value=0.0, value=current_budget, step=1000.0)
+                max_change = col2.slider("Max Spend Change per Campaign (%)", min_value=0, max_value=200, value=100, step=5)
+
+                try:
+                    allocation = optimize_budget(
+                        curves,
+                        total_budget,
+                        sessions_by_campaign=sessions_by_campaign,
+                        avg_order_value=avg_order_value,
+                        min_multiplier=max(0.0, 1 - max_change / 100),
+                        max_multiplier=1 + max_change / 100
+                    )
+                except ValueError as e:
+                    st.warning(f"Cannot optimize this budget: {e}")
+                else:
+                    allocation = allocation.merge(campaigns_df[['campaign_id', 'campaign_name']], on='campaign_id', how='left')
+                    revenue_gain = allocation['optimized_revenue'].sum() - allocation['current_revenue'].sum()
+                    col1, col2 = st.columns(2)
+                    col1.metric("Predicted Revenue (Optimized)", f"${allocation['optimized_revenue'].sum():,.2f}", f"${revenue_gain:,.2f} vs. current allocation")
+                    col2.metric("Predicted Conversions (Optimized)", f"{allocation['optimized_conversions'].sum():,.1f}", f"{allocation['optimized_conversions'].sum() - allocation['current_conversions'].sum():,.1f}")
+
+                    allocation_chart = allocation.melt(id_vars='campaign_name', value_vars=['current_spend', 'optimized_spend'], var_name='allocation', value_name='spend')
+                    fig_allocation = px.bar(allocation_chart, x='campaign_name', y='spend', color='allocation', barmode='group', title="Current vs. Optimized Spend by Campaign", labels={'campaign_name': 'Campaign', 'spend': 'Spend ($)'})
+                    st.plotly_chart(fig_allocation, use_container_width=True)
+                    st.dataframe(allocation[['campaign_name', 'current_spend', 'optimized_spend', 'spend_change_pct', 'current_revenue', 'optimized_revenue']])
+            else:
+                job = start_response_curve_job(model_key, model, manifest, data_df)
+                if job.failed():
+                    # Forget this model's dead job so the next rerun starts a new one;
+                    # jobs for other models keep running.
+                    start_response_curve_job.clear(model_key, model, manifest, data_df)
+                    st.warning(f"⚠️ Precomputing response curves failed ({job.error}); using live model inference. It is retried on the next rerun.")
+                else:
+                    st.caption("⏳ Response curves for this model version are being precomputed in the background; using live model inference meanwhile.")
+
+                # Use a representative sample from the filtered data for forecasting
                 forecast_sample = filtered_df.sample(min(len(filtered_df), 10000), random_state=1)
                 
-                # Feature Engineering on the sample
-                forecast_sample['hour_of_day'] = forecast_sample['session_start'].dt.hour
-                forecast_sample['day_of_week'] = forecast_sample['session_start'].dt.dayofweek
-                forecast_sample['month'] = forecast_sample['session_start'].dt.month
-                
-                # One-hot encode and align columns with the model's features
-                forecast_sample_encoded = pd.get_dummies(forecast_sample, columns=['utm_source', 'utm_medium', 'creative_format', 'creative_theme', 'effectiveness_tier'], dummy_na=True)
-                forecast_sample_encoded = forecast_sample_encoded.reindex(columns=features, fill_value=0)
+                # Feature engineering and one-hot encoding, aligned with the model's features
+                forecast_sample_encoded = prepare_features(forecast_sample, features, encoder)
 
                 # Baseline prediction
                 baseline_pred_proba = model.predict_proba(forecast_sample_encoded[features])[:, 1]
@@ -239,24 +376,21 @@ if data_df is not None:
                 # Prediction with increased spend
                 new_pred_proba = model.predict_proba(forecast_sample_lift[features])[:, 1]
                 
-                # Calculate lift
-                lift_conversions = (new_pred_proba - baseline_pred_proba).sum()
-                
-                avg_order_value = orders_df['gross_revenue'].mean()
+                # Calculate lift, scaled from the sample up to all filtered sessions
+                lift_conversions = (new_pred_proba - baseline_pred_proba).sum() * len(filtered_df) / len(forecast_sample)
                 lift_revenue = lift_conversions * avg_order_value
                 
                 col1, col2 = st.columns(2)
-                col1.metric("Predicted Incremental Conversions", f"{lift_conversions:,.1f}", help="The number of additional conversions predicted if spend were increased for sessions like these.")
+                col1.metric("Predicted Incremental Conversions", f"{lift_conversions:,.1f}", help="The number of additional conversions predicted if spend were increased for the sessions in the current filters.")
                 col2.metric("Predicted Incremental Revenue", f"${lift_revenue:,.2f}", help="Based on the average order value.")
-            else:
-                st.warning("No data in the selected filter range to create a forecast.")
 
     with tab4:
         st.header("Model Insights: What Drives Conversion?")
         st.markdown("This chart shows the features the model found most predictive. This helps answer *how* we are winning or losing.")
         
-        model, features = load_model_and_features()
-        if model and features:
+        model, manifest = load_model_and_features()
+        if model and manifest:
+            features = manifest["features"]
             feature_importances = pd.DataFrame({
                 'feature': features,
                 'importance': model.feature_importances_
@@ -272,3 +406,41 @@ if data_df is not None:
             fig_imp.update_layout(yaxis={'categoryorder':'total ascending'})
             st.plotly_chart(fig_imp, use_container_width=True)
 
+            st.subheader("Why? Feature Contributions by Segment")
+            st.markdown("Average contribution of each feature to the predicted conversion log-odds for sessions in a segment. Positive values push conversion up, negative values pull it down.")
+
+            model_key = manifest["sha256"]
+            if contributions_path(model_key).exists():
+                contributions = load_segment_contributions(model_key)
+
+                col1, col2 = st.columns(2)
+                dimension = col1.selectbox("Segment by", SEGMENT_COLUMNS)
+                dimension_df = contributions[contributions['dimension'] == dimension]
+                segment = col2.selectbox("Segment", sorted(dimension_df['segment'].astype(str).unique()))
+
+                segment_df = dimension_df[(dimension_df['segment'].astype(str) == segment) & (dimension_df['feature'] != 'bias')]
+                top_drivers = segment_df.loc[segment_df['mean_contribution'].abs().sort_values(ascending=False).index].head(15)
+
+                fig_contrib = px.bar(
+                    top_drivers,
+                    x='mean_contribution',
+                    y='feature',
+                    orientation='h',
+                    color='mean_contribution',
+                    color_continuous_scale='RdYlGn',
+                    color_continuous_midpoint=0,
+                    title=f"Top 15 Conversion Drivers for {dimension} = {segment}",
+                    labels={'mean_contribution': 'Mean Contribution (log-odds)'}
+                )
+                fig_contrib.update_layout(yaxis={'categoryorder':'total ascending'})
+                st.plotly_chart(fig_contrib, use_container_width=True)
+            else:
+                job = start_contribution_job(model_key, model, manifest, data_df)
+                if job.failed():
+                    # Forget this model's dead job so the next rerun starts a new one;
+                    # jobs for other models keep running.
+                    start_contribution_job.clear(model_key, model, manifest, data_df)
+                    st.error(f"❌ Computing per-segment contributions failed: {job.error}. Refresh the page to retry.")
+                else:
+                    st.info("⏳ Per-segment contributions for this model version are being computed in the background. Refresh the page in a minute to see them.")
+
@@ -0,0 +1,122 @@
+import hashlib
+import json
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pandas as pd
+import xgboost as xgb
+
+# --- Artifact Configuration ---
+# The native artifact is the booster in XGBoost's UBJSON format plus a small JSON
+# manifest. Unlike the joblib pickles, it loads without unpickling Python objects
+# and stays readable across XGBoost/scikit-learn upgrades.
+MODEL_FILE = "conversion_model.ubj"
+MANIFEST_FILE = "conversion_model.json"
+ARTIFACT_FORMAT = "xgboost-ubj/1"
+
+# Feature engineering used by the notebook when the model was trained.
+CATEGORICAL_COLS = ['utm_source', 'utm_medium', 'creative_format', 'creative_theme', 'effectiveness_tier']
+DEFAULT_ENCODER = {
+    "type": "one_hot",
+    "columns": CATEGORICAL_COLS,
+    "dummy_na": True,
+    "time_column": "session_start",
+    "time_features": ["hour_of_day", "day_of_week", "month"],
+}
+
+
+def file_sha256(data):
+    """Returns the SHA-256 hex digest of a bytes-like object."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def export_model_artifact(model, features, out_dir=".", test_auc=None, training_metadata=None, encoder=None):
+    """
+    Saves a trained XGBClassifier as a native UBJSON booster plus a JSON manifest
+    (feature list, encoder, training metadata, AUC and checksum of the booster).
+    Returns the path of the written manifest.
+    """
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    model_path = out_dir / MODEL_FILE
+    manifest_path = out_dir / MANIFEST_FILE
+
+    raw = model.get_booster().save_raw(raw_format="ubj")
+    tmp_model_path = model_path.with_suffix(model_path.suffix + ".tmp")
+    tmp_model_path.write_bytes(raw)
+
+    manifest = {
+        "format": ARTIFACT_FORMAT,
+        "model_file": MODEL_FILE,
+        "sha256": file_sha256(raw),
+        "features": list(features),
+        "encoder": encoder or DEFAULT_ENCODER,
+        "training": {
+            "exported_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "xgboost_version": xgb.__version__,
+            "params": {k: v for k, v in model.get_params().items() if isinstance(v, (int, float, str, bool)) and v == v},
+            **(training_metadata or {}),
+        },
+        "metrics": {"test_auc": None if test_auc is None else float(test_auc)},
+    }
+    tmp_manifest_path = manifest_path.with_suffix(manifest_path.suffix + ".tmp")
+    tmp_manifest_path.write_text(json.dumps(manifest, indent=2))
+
+    # Replace the booster first and the manifest last, so a reader never sees a
+    # manifest pointing at a booster with a different checksum for long.
+    tmp_model_path.replace(model_path)
+    tmp_manifest_path.replace(manifest_path)
+    return manifest_path
+
+
+def read_manifest(artifact_dir="."):
+    """Reads the JSON manifest of a native model artifact."""
+    return json.loads((Path(artifact_dir) / MANIFEST_FILE).read_text())
+
+
+def load_model_artifact(artifact_dir="."):
+    """
+    Loads a native model artifact and verifies the booster checksum.
+    Returns the XGBClassifier and its manifest; raises ValueError on a checksum mismatch.
+    """
+    artifact_dir = Path(artifact_dir)
+    manifest = read_manifest(artifact_dir)
+    if manifest.get("format") != ARTIFACT_FORMAT:
+        raise ValueError(f"Unsupported model artifact format: {manifest.get('format')}")
+
+    raw = (artifact_dir / manifest["model_file"]).read_bytes()
+    if file_sha256(raw) != manifest["sha256"]:
+        raise ValueError(f"Checksum mismatch for {artifact_dir / manifest['model_file']}; the artifact is corrupt or incomplete.")
+
+    model = xgb.XGBClassifier()
+    model.load_model(bytearray(raw))
+    return model, manifest
+
+
+def prepare_features(df, features, encoder=None):
+    """
+    Applies the training-time feature engineering to a sessions dataframe and
+    aligns the result with the model's feature list.
+    """
+    encoder = encoder or DEFAULT_ENCODER
+    df = df.copy()
+    timestamps = df[encoder["time_column"]]
+    if "hour_of_day" in encoder["time_features"]:
+        df['hour_of_day'] = timestamps.dt.hour
+    if "day_of_week" in encoder["time_features"]:
+        df['day_of_week'] = timestamps.dt.dayofweek
+    if "month" in encoder["time_features"]:
+        df['month'] = timestamps.dt.month
+
+    encoded = pd.get_dummies(df, columns=encoder["columns"], dummy_na=encoder["dummy_na"])
+    return encoded.reindex(columns=features, fill_value=0)
+
+
+if __name__ == '__main__':
+    # Converts the existing joblib artifacts into the native format.
+    import joblib
+
+    model = joblib.load("conversion_model.joblib")
+    features = joblib.load("model_features.joblib")
+    manifest_path = export_model_artifact(model, features, training_metadata={"source": "conversion_model.joblib"})
+    print(f"✅ Native model artifact written to: {manifest_path}")
@@ -0,0 +1,127 @@
+import argparse
+import logging
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+
+from model_artifacts import file_sha256, prepare_features
+
+# --- Insights Configuration ---
+# Per-segment contributions are computed once per model (keyed by the booster's
+# SHA-256) and cached on disk, so the dashboard never runs pred_contribs itself.
+INSIGHTS_DIR = Path("models/insights")
+SEGMENT_COLUMNS = ['creative_format', 'creative_theme', 'utm_source']
+SAMPLE_PER_STRATUM = 2000
+BATCH_SIZE = 50_000
+
+logger = logging.getLogger("ModelInsights")
+
+
+def model_fingerprint(model):
+    """SHA-256 of the booster in UBJSON form; identifies a model across formats."""
+    return file_sha256(model.get_booster().save_raw(raw_format="ubj"))
+
+
+def contributions_path(fingerprint, insights_dir=INSIGHTS_DIR):
+    return Path(insights_dir) / f"segment_contributions_{fingerprint[:16]}.csv"
+
+
+def load_session_data():
+    """Loads sessions merged with campaign attributes, as used for training."""
+    sessions_df = pd.read_csv('sessions.csv', parse_dates=['session_start'])
+    campaigns_df = pd.read_csv('campaigns.csv', parse_dates=['start_date'])
+    return pd.merge(sessions_df, campaigns_df, on='campaign_id', how='left')
+
+
+def stratified_sample(df, strata=SEGMENT_COLUMNS, per_stratum=SAMPLE_PER_STRATUM, random_state=0):
+    """
+    Samples up to `per_stratum` sessions from every combination of the segment
+    columns and adds a `sample_weight` that re-weights each row back to its
+    stratum's share of the full data.
+    """
+    shuffled = df.sample(frac=1, random_state=random_state)
+    sample = shuffled.groupby(strata, dropna=False, sort=False).head(per_stratum).copy()
+
+    population_counts = df.groupby(strata, dropna=False).size().rename('population')
+    sample_counts = sample.groupby(strata, dropna=False).size().rename('sampled')
+    weights = (population_counts / sample_counts).rename('sample_weight')
+    return sample.join(weights, on=strata)
+
+
+def batched_contributions(model, X, batch_size=BATCH_SIZE):
+    """Runs XGBoost pred_contribs in fixed-size batches. The last column is the bias term."""
+    booster = model.get_booster()
+    parts = []
+    for start in range(0, len(X), batch_size):
+        batch = xgb.DMatrix(X.iloc[start:start + batch_size])
+        parts.append(booster.predict(batch, pred_contribs=True))
+    return np.vstack(parts) if parts else np.empty((0, X.shape[1] + 1))
+
+
+def compute_segment_contributions(model, features, encoder, data_df, per_stratum=SAMPLE_PER_STRATUM, batch_size=BATCH_SIZE):
+    """
+    Computes weighted mean feature contributions (log-odds) for every value of
+    each segment column. Returns a long dataframe with one row per
+    (dimension, segment, feature).
+    """
+    sample = stratified_sample(data_df, per_stratum=per_stratum)
+    X = prepare_features(sample, features, encoder)
+    contribs = batched_contributions(model, X, batch_size)
+
+    weights = sample['sample_weight'].to_numpy()
+    weighted = pd.DataFrame(contribs * weights[:, None], columns=list(features) + ['bias'], index=sample.index)
+    weighted['_weight'] = weights
+
+    frames = []
+    for dimension in SEGMENT_COLUMNS:
+        keys = sample[dimension].fillna('(none)')
+        sums = weighted.groupby(keys).sum()
+        means = sums.drop(columns='_weight').div(sums['_weight'], axis=0)
+        long = means.stack().rename('mean_contribution').reset_index()
+        long.columns = ['segment', 'feature', 'mean_contribution']
+        long.insert(0, 'dimension', dimension)
+        long['sessions'] = long['segment'].map(sums['_weight']).round().astype(int)
+        frames.append(long)
+    return pd.concat(frames, ignore_index=True)
+
+
+def build_contribution_cache(model, features, encoder, data_df, fingerprint=None, insights_dir=INSIGHTS_DIR):
+    """Computes and atomically writes the contribution cache for a model. Returns its path."""
+    fingerprint = fingerprint or model_fingerprint(model)
+    output_path = contributions_path(fingerprint, insights_dir)
+    if output_path.exists():
+        return output_path
+
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    logger.info(f"Computing segment contributions for model {fingerprint[:16]}...")
+    result = compute_segment_contributions(model, features, encoder, data_df)
+    tmp_path = output_path.with_suffix(".csv.tmp")
+    result.to_csv(tmp_path, index=False)
+    tmp_path.replace(output_path)
+    logger.info(f"Saved {len(result)} segment contribution rows to {output_path}.")
+    return output_path
+
+
+def load_contribution_cache(fingerprint, insights_dir=INSIGHTS_DIR):
+    """Returns the cached contributions for a model, or None if not computed yet."""
+    path = contributions_path(fingerprint, insights_dir)
+    if not path.exists():
+        return None
+    return pd.read_csv(path)
+
+
+if __name__ == '__main__':
+    from model_registry import get_active_version, load_version
+    from model_artifacts import load_model_artifact
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Precompute per-segment feature contributions for a model.")
+    parser.add_argument("--version", help="Registry version (defaults to the active one, then the packaged model).")
+    args = parser.parse_args()
+
+    version = args.version or get_active_version()
+    model, manifest = load_version(version) if version else load_model_artifact(".")
+    path = build_contribution_cache(model, manifest["features"], manifest["encoder"], load_session_data(), fingerprint=manifest["sha256"])
+    print(f"✅ Segment contributions available at: {path}")
@@ -0,0 +1,182 @@
+import argparse
+import logging
+import os
+import re
+import shutil
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+from model_artifacts import export_model_artifact, load_model_artifact, read_manifest
+
+# --- Registry Configuration ---
+# Layout of the local, file-based registry:
+#   models/v0001/conversion_model.ubj   native booster
+#   models/v0001/conversion_model.json  manifest (features, encoder, metadata, AUC)
+#   models/ACTIVE                       name of the version the dashboard serves
+REGISTRY_DIR = Path("models")
+ACTIVE_POINTER = "ACTIVE"
+VERSION_PATTERN = re.compile(r"^v(\d{4,})$")
+
+logger = logging.getLogger("ModelRegistry")
+
+
+def list_versions(registry_dir=REGISTRY_DIR):
+    """Returns the registered model versions, oldest first."""
+    registry_dir = Path(registry_dir)
+    if not registry_dir.exists():
+        return []
+    versions = [p.name for p in registry_dir.iterdir() if p.is_dir() and VERSION_PATTERN.match(p.name)]
+    return sorted(versions, key=lambda v: int(VERSION_PATTERN.match(v).group(1)))
+
+
+def get_active_version(registry_dir=REGISTRY_DIR):
+    """Reads the active pointer. Returns None when no version has been activated."""
+    pointer = Path(registry_dir) / ACTIVE_POINTER
+    try:
+        version = pointer.read_text().strip()
+    except FileNotFoundError:
+        return None
+    return version or None
+
+
+def set_active_version(version, registry_dir=REGISTRY_DIR):
+    """
+    Points the registry at `version`. The artifact is loaded (and its checksum
+    verified) before the pointer is swapped, and the swap itself is an atomic rename.
+    """
+    registry_dir = Path(registry_dir)
+    if version not in list_versions(registry_dir):
+        raise ValueError(f"Unknown model version: {version}")
+    load_model_artifact(registry_dir / version)
+
+    tmp_pointer = registry_dir / f".{ACTIVE_POINTER}.tmp"
+    tmp_pointer.write_text(version + "\n")
+    os.replace(tmp_pointer, registry_dir / ACTIVE_POINTER)
+    logger.info(f"Activated model version {version}.")
+
+
+def register_model(model, features, test_auc=None, training_metadata=None, activate=False, registry_dir=REGISTRY_DIR):
+    """
+    Stores a trained model as a new, immutable version directory and optionally
+    activates it. Returns the new version name.
+    """
+    registry_dir = Path(registry_dir)
+    registry_dir.mkdir(parents=True, exist_ok=True)
+    existing = list_versions(registry_dir)
+    next_number = int(VERSION_PATTERN.match(existing[-1]).group(1)) + 1 if existing else 1
+    version = f"v{next_number:04d}"
+
+    # Write into a hidden staging directory and rename it into place, so readers
+    # never observe a half-written version.
+    staging_dir = registry_dir / f".staging-{version}"
+    if staging_dir.exists():
+        shutil.rmtree(staging_dir)
+    metadata = {"version": version, "registered_at": datetime.now(timezone.utc).isoformat(timespec="seconds")}
+    metadata.update(training_metadata or {})
+    export_model_artifact(model, features, out_dir=staging_dir, test_auc=test_auc, training_metadata=metadata)
+    staging_dir.rename(registry_dir / version)
+    logger.info(f"Registered model version {version}.")
+
+    if activate:
+        set_active_version(version, registry_dir)
+    return version
+
+
+def load_version(version, registry_dir=REGISTRY_DIR):
+    """Loads the model and manifest of a registered version."""
+    return load_model_artifact(Path(registry_dir) / version)
+
+
+class ActiveModel:
+    """
+    Process-wide handle on the registry's active model.
+
+    `snapshot()` returns an immutable (version, model, manifest) tuple. When the
+    active pointer changes, the new version is loaded off to the side and the
+    snapshot reference is swapped in one assignment, so in-flight sessions keep
+    using the model they started with and no request ever sees a partial load.
+    A watcher thread polls the pointer so new versions are warm before users ask.
+    """
+
+    def __init__(self, registry_dir=REGISTRY_DIR, poll_interval=5.0):
+        self.registry_dir = Path(registry_dir)
+        self.poll_interval = poll_interval
+        self.last_error = None
+        self._snapshot = None
+        self._load_lock = threading.Lock()
+        self._watcher = None
+
+    def snapshot(self):
+        """Returns the currently loaded (version, model, manifest), or None."""
+        return self._snapshot
+
+    def refresh(self):
+        """Loads the active version if it differs from the one being served."""
+        version = get_active_version(self.registry_dir)
+        current = self._snapshot
+        if version is None or (current is not None and current[0] == version):
+            return current
+
+        with self._load_lock:
+            current = self._snapshot
+            if current is not None and current[0] == version:
+                return current  # Another thread finished the swap first.
+            try:
+                model, manifest = load_version(version, self.registry_dir)
+            except Exception as e:
+                # Keep serving the previous version if the new one is unreadable
+                # (missing file, malformed manifest, XGBoostError, ...).
+                self.last_error = f"Could not load model version {version}: {e}"
+                logger.error(self.last_error)
+                return current
+            self._snapshot = (version, model, manifest)
+            self.last_error = None
+            logger.info(f"Hot-swapped model to version {version}.")
+        return self._snapshot
+
+    def start_watching(self):
+        """Starts a daemon thread that keeps the snapshot in sync with the pointer."""
+        if self._watcher is not None:
+            return
+        self._watcher = threading.Thread(target=self._watch, name="active-model-watcher", daemon=True)
+        self._watcher.start()
+
+    def _watch(self):
+        while True:
+            try:
+                self.refresh()
+            except Exception as e:
+                # An unexpected error must not end hot-swapping; report it and keep polling.
+                self.last_error = f"Model watcher error: {e}"
+                logger.exception(self.last_error)
+            time.sleep(self.poll_interval)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Manage the local conversion-model registry.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("list", help="List registered versions.")
+    promote_parser = subparsers.add_parser("promote", help="Make a version the active one.")
+    promote_parser.add_argument("version")
+    import_parser = subparsers.add_parser("import-joblib", help="Register the joblib model from the project root.")
+    import_parser.add_argument("--activate", action="store_true")
+    args = parser.parse_args()
+
+    if args.command == "list":
+        active = get_active_version()
+        for version in list_versions():
+            auc = read_manifest(REGISTRY_DIR / version)["metrics"]["test_auc"]
+            marker = "*" if version == active else " "
+            print(f"{marker} {version}  test_auc={auc}")
+    elif args.command == "promote":
+        set_active_version(args.version)
+        print(f"✅ Active model version is now {args.version}")
+    elif args.command == "import-joblib":
+        import joblib
+
+        model = joblib.load("conversion_model.joblib")
+        features = joblib.load("model_features.joblib")
+        version = register_model(model, features, training_metadata={"source": "conversion_model.joblib"}, activate=args.activate)
+        print(f"✅ Registered {version}")
@@ -0,0 +1,185 @@
+import argparse
+import logging
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from model_artifacts import prepare_features
+
+# --- Response Curve Configuration ---
+# Spend multipliers from 0x (campaign switched off) to 3x (+200%), in 2.5% steps.
+# The dashboard interpolates between grid points, so any budget change in this
+# range is answered without running the model.
+CURVES_DIR = Path("models/curves")
+SPEND_MULTIPLIERS = np.round(np.arange(0.0, 3.0 + 1e-9, 0.025), 4)
+SEGMENT_COLUMNS = ['creative_format', 'creative_theme']
+SAMPLE_PER_CAMPAIGN = 1000
+MAX_BATCH_ROWS = 500_000
+
+logger = logging.getLogger("ResponseCurves")
+
+
+def curves_path(fingerprint, curves_dir=CURVES_DIR):
+    return Path(curves_dir) / f"response_curves_{fingerprint[:16]}.npz"
+
+
+class ResponseCurves:
+    """
+    Mean predicted conversion probability per session for every campaign (rows)
+    at every spend multiplier (columns), plus the same curves aggregated per
+    creative segment.
+    """
+
+    def __init__(self, multipliers, campaign_ids, campaign_curves, campaign_sessions, campaign_spend, segment_keys, segment_curves):
+        self.multipliers = np.asarray(multipliers, dtype=float)
+        self.campaign_ids = np.asarray(campaign_ids)
+        self.campaign_curves = np.asarray(campaign_curves, dtype=float)
+        self.campaign_sessions = np.asarray(campaign_sessions, dtype=float)
+        self.campaign_spend = np.asarray(campaign_spend, dtype=float)
+        self.segment_keys = np.asarray(segment_keys)
+        self.segment_curves = np.asarray(segment_curves, dtype=float)
+        self._campaign_index = pd.Index(self.campaign_ids)
+
+    def save(self, path):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.stem + ".tmp.npz")
+        np.savez_compressed(
+            tmp_path,
+            multipliers=self.multipliers,
+            campaign_ids=self.campaign_ids.astype(str),
+            campaign_curves=self.campaign_curves,
+            campaign_sessions=self.campaign_sessions,
+            campaign_spend=self.campaign_spend,
+            segment_keys=self.segment_keys.astype(str),
+            segment_curves=self.segment_curves,
+        )
+        tmp_path.replace(path)
+        return path
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(**{name: data[name] for name in data.files})
+
+    def _interpolation_weights(self, multiplier):
+        """Grid column and weight for linear interpolation, clamped to the grid."""
+        m = float(np.clip(multiplier, self.multipliers[0], self.multipliers[-1]))
+        upper = int(np.searchsorted(self.multipliers, m))
+        if upper == 0:
+            return 0, 0, 0.0
+        lower = upper - 1
+        span = self.multipliers[upper] - self.multipliers[lower]
+        return lower, upper, (m - self.multipliers[lower]) / span
+
+    def conversion_rates(self, multiplier, curves=None):
+        """Interpolated conversion probability per row of `curves` (campaigns by default)."""
+        curves = self.campaign_curves if curves is None else curves
+        lower, upper, weight = self._interpolation_weights(multiplier)
+        return curves[:, lower] * (1 - weight) + curves[:, upper] * weight
+
+    def rates_at(self, multipliers, rows=None):
+        """Interpolated conversion probability with a different multiplier per campaign row."""
+        curves = self.campaign_curves if rows is None else self.campaign_curves[rows]
+        m = np.clip(np.asarray(multipliers, dtype=float), self.multipliers[0], self.multipliers[-1])
+        upper = np.clip(np.searchsorted(self.multipliers, m), 1, len(self.multipliers) - 1)
+        lower = upper - 1
+        weight = (m - self.multipliers[lower]) / (self.multipliers[upper] - self.multipliers[lower])
+        row_idx = np.arange(len(curves))
+        return curves[row_idx, lower] * (1 - weight) + curves[row_idx, upper] * weight
+
+    def sessions_vector(self, sessions_by_campaign):
+        """Aligns a campaign_id -> session count mapping with the curve rows."""
+        counts = pd.Series(sessions_by_campaign, dtype=float)
+        return counts.reindex(self._campaign_index, fill_value=0.0).to_numpy()
+
+    def expected_conversions(self, sessions_by_campaign, multiplier):
+        """Expected conversions for the given sessions when every campaign's spend is scaled."""
+        return float(self.sessions_vector(sessions_by_campaign) @ self.conversion_rates(multiplier))
+
+    def incremental_conversions(self, sessions_by_campaign, multiplier):
+        """Predicted conversions gained (or lost) versus current spend."""
+        sessions = self.sessions_vector(sessions_by_campaign)
+        return float(sessions @ (self.conversion_rates(multiplier) - self.conversion_rates(1.0)))
+
+    def total_curve(self, sessions_by_campaign):
+        """Expected conversions at every grid multiplier for the given sessions."""
+        return self.sessions_vector(sessions_by_campaign) @ self.campaign_curves
+
+
+def compute_response_curves(model, features, encoder, data_df, multipliers=SPEND_MULTIPLIERS, per_campaign=SAMPLE_PER_CAMPAIGN, max_batch_rows=MAX_BATCH_ROWS):
+    """
+    Evaluates the model over the spend grid for a per-campaign sample of
+    sessions. All multipliers for a block of rows are scored in one
+    `inplace_predict` call on a stacked matrix, and per-campaign means are
+    accumulated with `np.bincount`.
+    """
+    data_df = data_df.dropna(subset=['campaign_id'])
+    sample = data_df.sample(frac=1, random_state=0).groupby('campaign_id', sort=False).head(per_campaign)
+    X = prepare_features(sample, features, encoder).to_numpy(dtype=np.float32)
+    spend_col = list(features).index('spend')
+    base_spend = X[:, spend_col].copy()
+
+    campaign_codes, campaign_ids = pd.factorize(sample['campaign_id'], sort=True)
+    n_campaigns = len(campaign_ids)
+    rows_per_campaign = np.bincount(campaign_codes, minlength=n_campaigns)
+
+    booster = model.get_booster()
+    multipliers = np.asarray(multipliers, dtype=float)
+    mean_probs = np.empty((n_campaigns, len(multipliers)))
+    grid_block = max(1, max_batch_rows // max(len(X), 1))
+    for start in range(0, len(multipliers), grid_block):
+        block = multipliers[start:start + grid_block]
+        stacked = np.tile(X, (len(block), 1))
+        stacked[:, spend_col] = np.outer(block, base_spend).ravel()
+        probs = booster.inplace_predict(stacked).reshape(len(block), len(X))
+        for offset, row_probs in enumerate(probs):
+            mean_probs[:, start + offset] = np.bincount(campaign_codes, weights=row_probs, minlength=n_campaigns) / rows_per_campaign
+
+    campaign_sessions = data_df['campaign_id'].value_counts().reindex(campaign_ids).to_numpy(dtype=float)
+    campaign_attrs = data_df.drop_duplicates('campaign_id').set_index('campaign_id').reindex(campaign_ids)
+
+    segment_labels = campaign_attrs[SEGMENT_COLUMNS].fillna('(none)').astype(str).agg(' | '.join, axis=1)
+    segment_codes, segment_keys = pd.factorize(segment_labels, sort=True)
+    segment_curves = np.zeros((len(segment_keys), len(multipliers)))
+    np.add.at(segment_curves, segment_codes, mean_probs * campaign_sessions[:, None])
+    segment_curves /= np.bincount(segment_codes, weights=campaign_sessions)[:, None]
+
+    return ResponseCurves(
+        multipliers=multipliers,
+        campaign_ids=np.asarray(campaign_ids, dtype=str),
+        campaign_curves=mean_probs,
+        campaign_sessions=campaign_sessions,
+        campaign_spend=campaign_attrs['spend'].fillna(0).to_numpy(dtype=float),
+        segment_keys=np.asarray(segment_keys, dtype=str),
+        segment_curves=segment_curves,
+    )
+
+
+def build_response_curves(model, features, encoder, data_df, fingerprint, curves_dir=CURVES_DIR):
+    """Computes and atomically writes the response curves for a model. Returns their path."""
+    output_path = curves_path(fingerprint, curves_dir)
+    if output_path.exists():
+        return output_path
+    logger.info(f"Computing response curves for model {fingerprint[:16]}...")
+    curves = compute_response_curves(model, features, encoder, data_df)
+    curves.save(output_path)
+    logger.info(f"Saved response curves for {len(curves.campaign_ids)} campaigns to {output_path}.")
+    return output_path
+
+
+if __name__ == '__main__':
+    from model_artifacts import load_model_artifact
+    from model_insights import load_session_data
+    from model_registry import get_active_version, load_version
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Precompute spend response curves for a model.")
+    parser.add_argument("--version", help="Registry version (defaults to the active one, then the packaged model).")
+    args = parser.parse_args()
+
+    version = args.version or get_active_version()
+    model, manifest = load_version(version) if version else load_model_artifact(".")
+    path = build_response_curves(model, manifest["features"], manifest["encoder"], load_session_data(), manifest["sha256"])
+    print(f"✅ Response curves available at: {path}")